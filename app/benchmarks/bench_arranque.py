@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+"""
+    Benchmark del tiempo de arranque de la aplicación.
+    Mide por separado, en un intérprete nuevo por repetición:
+    - importacion: tiempo de importar main.py (hasta poder mostrar el menú).
+    - precalentamiento: tiempo de cargar los modelos (solo con --precalentar).
+    - primera_consulta: tiempo de la primera búsqueda (opción 3) sobre la base existente.
+    La primera consulta requiere Ollama y la base de datos vectorial; si no están disponibles
+    se reporta el error y solo se mide la importación.
+
+    Uso: python app/benchmarks/bench_arranque.py --repeticiones 3 --consulta "recurso de amparo"
+"""
+
+# Ruta de la carpeta app
+RUTA_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Script que se ejecuta en cada intérprete nuevo
+_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {ruta_app!r})
+resultado = {{}}
+inicio = time.perf_counter()
+import main
+from utils.ingerir import buscar_nodos, get_index, precalentar
+resultado["importacion"] = time.perf_counter() - inicio
+try:
+    if {precalentar!r}:
+        inicio = time.perf_counter()
+        precalentar()
+        resultado["precalentamiento"] = time.perf_counter() - inicio
+    if {consulta!r}:
+        inicio = time.perf_counter()
+        index = get_index()
+        buscar_nodos({consulta!r}, index, vector_top_k=10, reranker_top_n=3,
+                     with_reranker_sbert=True, lexico_top_k=10)
+        resultado["primera_consulta"] = time.perf_counter() - inicio
+except Exception as e:
+    resultado["error"] = repr(e)
+print("RESULTADO" + json.dumps(resultado))
+"""
+
+
+# Función para ejecutar una medición en un proceso nuevo
+def medir(consulta, precalentar):
+    script = _SCRIPT.format(ruta_app=RUTA_APP, consulta=consulta, precalentar=precalentar)
+    salida = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, cwd=os.getcwd()
+    ).stdout
+    for linea in salida.splitlines():
+        if linea.startswith("RESULTADO"):
+            return json.loads(linea[len("RESULTADO"):])
+    return {"error": "el proceso no reportó resultados"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de NexusPJLLM")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--consulta", default="")
+    parser.add_argument("--precalentar", action="store_true")
+    args = parser.parse_args()
+
+    for repeticion in range(1, args.repeticiones + 1):
+        resultado = medir(args.consulta, args.precalentar)
+        metricas = " ".join(
+            f"{nombre}={valor:.3f}s" for nombre, valor in resultado.items() if nombre != "error"
+        )
+        print(f"repetición {repeticion}: {metricas}")
+        if "error" in resultado:
+            print(f"  error: {resultado['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.servidor_stub import ServidorStubNexus
+from utils.consulta_nexus import cosechar_nexus
+
+"""
+    Benchmark de la cosecha de NEXUS PJ contra el servidor local, sin red.
+    Compara la consulta secuencial de páginas con la consulta concurrente.
+
+    Uso: python app/benchmarks/bench_cosecha.py --paginas 20 --latencia 0.1
+"""
+
+
+# Función para medir cuántos hits por segundo se obtienen con una concurrencia dada
+def medir(url, paginas, tamano, concurrencia):
+    inicio = time.perf_counter()
+    hits = list(
+        cosechar_nexus(
+            "recurso de amparo",
+            paginas=paginas,
+            tamano=tamano,
+            max_concurrencia=concurrencia,
+            url=url,
+            usar_cache=False,
+        )
+    )
+    duracion = time.perf_counter() - inicio
+    return len(hits), duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de cosecha de NEXUS PJ")
+    parser.add_argument("--paginas", type=int, default=20)
+    parser.add_argument("--tamano", type=int, default=10)
+    parser.add_argument("--latencia", type=float, default=0.1)
+    parser.add_argument("--concurrencias", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with ServidorStubNexus(
+        latencia=args.latencia, total_hits=args.paginas * args.tamano
+    ) as servidor:
+        for concurrencia in args.concurrencias:
+            total, duracion = medir(servidor.url, args.paginas, args.tamano, concurrencia)
+            print(
+                f"concurrencia={concurrencia:<3} hits={total:<6} "
+                f"tiempo={duracion:.2f}s hits/s={total / duracion:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.indice_cuantizado import TIPOS, IndiceCuantizado, normalizar_filas, recall_en_k
+
+"""
+    Benchmark del índice de vectores comprimidos frente a la búsqueda exacta en float32.
+    Para cada tipo (float32 exacto, float16, int8) reporta el tamaño de los vectores que se
+    recorren, el pico de memoria del proceso, la latencia por consulta y el recall@k de la
+    primera búsqueda aproximada y tras repuntuar con la copia float32 en disco.
+    Los índices se construyen en un directorio temporal y cada tipo se mide en un proceso nuevo,
+    para que el pico de memoria de uno no se sume al de los demás.
+    Por defecto usa vectores sintéticos agrupados; con --coleccion usa los de la base de Chroma.
+
+    Uso: python app/benchmarks/bench_cuantizacion.py --vectores 200000 --dimension 768 --k 10
+         python app/benchmarks/bench_cuantizacion.py --coleccion --consultas 100
+"""
+
+
+# Función para generar vectores sintéticos agrupados (parecidos a embeddings de textos)
+def generar_vectores(cantidad, dimension, grupos=256, semilla=0):
+    aleatorio = np.random.default_rng(semilla)
+    centros = aleatorio.standard_normal((grupos, dimension)).astype(np.float32)
+    asignacion = aleatorio.integers(0, grupos, cantidad)
+    ruido = aleatorio.standard_normal((cantidad, dimension)).astype(np.float32)
+    return centros[asignacion] + 0.6 * ruido
+
+
+# Función para leer los IDs y embeddings de la colección de Chroma
+def leer_coleccion(lote=1000):
+    from utils.ingerir import obtener_coleccion
+
+    coleccion = obtener_coleccion()
+    ids, vectores = [], []
+    for desplazamiento in range(0, coleccion.count(), lote):
+        resultado = coleccion.get(include=["embeddings"], limit=lote, offset=desplazamiento)
+        ids.extend(resultado["ids"])
+        vectores.extend(resultado["embeddings"])
+    return ids, np.asarray(vectores, dtype=np.float32)
+
+
+# Función para obtener el pico de memoria del proceso en MB (None si no está disponible)
+def memoria_pico_mb():
+    # En Linux ru_maxrss se hereda del proceso padre, así que se prefiere VmHWM, que empieza de
+    # cero en cada ejecución
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # En Linux ru_maxrss está en KB y en macOS en bytes
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+# Función para preparar en un directorio los vectores float32, los índices comprimidos, las
+# consultas y los resultados exactos que usan los procesos de medición
+def preparar(directorio, ids, vectores, consultas, k):
+    normalizados = normalizar_filas(vectores)
+    normalizados.tofile(os.path.join(directorio, "exactos.f32"))
+    np.save(os.path.join(directorio, "consultas.npy"), consultas)
+
+    exactos = []
+    for consulta in consultas:
+        puntajes = normalizados @ normalizar_filas(consulta)
+        exactos.append([ids[i] for i in np.argsort(-puntajes)[:k]])
+    with open(os.path.join(directorio, "exactos.json"), "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "dimension": vectores.shape[1], "exactos": exactos}, f)
+
+    for tipo in TIPOS:
+        indice = IndiceCuantizado(os.path.join(directorio, tipo), tipo)
+        for i in range(0, len(ids), 10_000):
+            indice.agregar(ids[i:i + 10_000], vectores[i:i + 10_000])
+
+
+# Función para medir un tipo dentro del proceso actual (se ejecuta en un proceso nuevo)
+def medir(directorio, tipo, k, sobremuestreo):
+    with open(os.path.join(directorio, "exactos.json"), encoding="utf-8") as f:
+        datos = json.load(f)
+    consultas = np.load(os.path.join(directorio, "consultas.npy"))
+
+    recall_aproximado = []
+    recall_repuntuado = []
+    if tipo == "float32":
+        # Búsqueda exacta recorriendo todos los vectores float32, como el segmento de Chroma
+        ids = datos["ids"]
+        vectores = np.memmap(
+            os.path.join(directorio, "exactos.f32"), dtype=np.float32, mode="r",
+            shape=(len(ids), datos["dimension"]),
+        )
+        inicio = time.perf_counter()
+        for consulta, exacto in zip(consultas, datos["exactos"]):
+            puntajes = vectores @ normalizar_filas(consulta)
+            encontrados = [ids[i] for i in np.argsort(-puntajes)[:k]]
+            recall_repuntuado.append(recall_en_k(exacto, encontrados, k))
+        latencia = (time.perf_counter() - inicio) / len(consultas)
+        recall_aproximado = recall_repuntuado
+        tamano = vectores.nbytes
+    else:
+        indice = IndiceCuantizado(os.path.join(directorio, tipo), tipo)
+        inicio = time.perf_counter()
+        for consulta, exacto in zip(consultas, datos["exactos"]):
+            repuntuados = indice.buscar_repuntuado(consulta, k * sobremuestreo)
+            recall_repuntuado.append(recall_en_k(exacto, [id_ for id_, _ in repuntuados], k))
+        latencia = (time.perf_counter() - inicio) / len(consultas)
+        # El recall de la primera búsqueda se calcula fuera de la medición de latencia
+        for consulta, exacto in zip(consultas, datos["exactos"]):
+            aproximados = indice.buscar(consulta, k)
+            recall_aproximado.append(recall_en_k(exacto, [id_ for id_, _ in aproximados], k))
+        tamano = indice.bytes_vectores()
+    return {
+        "tamano_mb": tamano / 2 ** 20,
+        "memoria_pico_mb": memoria_pico_mb(),
+        "latencia_ms": 1000 * latencia,
+        "recall_aproximado": float(np.mean(recall_aproximado)),
+        "recall_repuntuado": float(np.mean(recall_repuntuado)),
+    }
+
+
+# Función para medir un tipo en un proceso nuevo
+def medir_en_proceso(directorio, tipo, k, sobremuestreo):
+    salida = subprocess.run(
+        [
+            sys.executable, os.path.abspath(__file__), "--medir", tipo, "--directorio", directorio,
+            "--k", str(k), "--sobremuestreo", str(sobremuestreo),
+        ],
+        capture_output=True, text=True,
+    )
+    for linea in salida.stdout.splitlines():
+        if linea.startswith("RESULTADO"):
+            return json.loads(linea[len("RESULTADO"):])
+    raise RuntimeError("La medición de " + tipo + " falló:\n" + salida.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del índice de vectores comprimidos")
+    parser.add_argument("--vectores", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--consultas", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--sobremuestreo", type=int, default=4)
+    parser.add_argument("--coleccion", action="store_true", help="Usar los vectores de Chroma")
+    # Uso interno: mide un tipo sobre un directorio ya preparado
+    parser.add_argument("--medir", choices=("float32",) + TIPOS, help=argparse.SUPPRESS)
+    parser.add_argument("--directorio", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        resultado = medir(args.directorio, args.medir, args.k, args.sobremuestreo)
+        print("RESULTADO" + json.dumps(resultado))
+        return
+
+    if args.coleccion:
+        ids, vectores = leer_coleccion()
+    else:
+        vectores = generar_vectores(args.vectores, args.dimension)
+        ids = [str(i) for i in range(len(vectores))]
+
+    # Las consultas son vectores del corpus con ruido, para que tengan vecinos cercanos
+    aleatorio = np.random.default_rng(1)
+    elegidos = aleatorio.integers(0, len(vectores), args.consultas)
+    consultas = vectores[elegidos] + 0.3 * aleatorio.standard_normal(
+        (args.consultas, vectores.shape[1])
+    ).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        preparar(directorio, ids, vectores, consultas, args.k)
+        del vectores
+        for tipo in ("float32",) + TIPOS:
+            resultado = medir_en_proceso(directorio, tipo, args.k, args.sobremuestreo)
+            pico = resultado["memoria_pico_mb"]
+            print(
+                f"{tipo:<8} vectores={resultado['tamano_mb']:9.1f} MB "
+                f"pico={pico if pico is None else f'{pico:9.1f}'} MB "
+                f"latencia={resultado['latencia_ms']:8.2f} ms "
+                f"recall@{args.k}={resultado['recall_aproximado']:.3f} "
+                f"(repuntuado: {resultado['recall_repuntuado']:.3f})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+"""
+    Benchmark reproducible del pipeline completo (extractor, indexar, buscar_nodos y
+    sintetizador_respuesta) sin NEXUS PJ ni Ollama: usa hits determinísticos, un modelo de
+    embeddings falso y un LLM falso (ver modelos_falsos.py). Todo se escribe en un directorio
+    temporal, por lo que no toca la base de datos ni las cachés de la aplicación.
+    Registra el rendimiento de cada etapa, el pico de memoria y el tamaño del índice, y los
+    compara con la línea base guardada: si alguna métrica empeora más que la tolerancia,
+    termina con código de salida 1.
+
+    Uso: python app/benchmarks/bench_pipeline.py --chunks 10000
+         python app/benchmarks/bench_pipeline.py --chunks 10000 --guardar-linea-base
+"""
+
+# Ruta por defecto de la línea base, junto a este script
+RUTA_LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "linea_base.json")
+
+# Métricas comparadas con la línea base y si un valor mayor es mejor
+METRICAS = {
+    "extractor_chunks_s": True,
+    "indexar_chunks_s": True,
+    "buscar_p50_s": False,
+    "buscar_p95_s": False,
+    "sintetizar_p50_s": False,
+    "memoria_pico_mb": False,
+    "indice_mb": False,
+}
+
+
+# Función para obtener el pico de memoria del proceso en MB (None si no está disponible)
+def memoria_pico_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # En Linux ru_maxrss está en KB y en macOS en bytes
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+# Función para calcular el tamaño en MB de un directorio
+def tamano_mb(ruta):
+    total = 0
+    for carpeta, _, archivos in os.walk(ruta):
+        for archivo in archivos:
+            total += os.path.getsize(os.path.join(carpeta, archivo))
+    return total / (1024 * 1024)
+
+
+# Función para obtener un percentil de una lista de latencias
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, max(0, round(p * len(valores)) - 1))] if valores else 0.0
+
+
+# Función para ejecutar el pipeline completo sobre un corpus de n chunks
+def ejecutar(chunks, lote_hits, consultas, sintesis):
+    from benchmarks.servidor_stub import generar_hit
+    from utils import ingerir
+    from utils.metricas import metricas
+
+    # Se ingiere el corpus por rondas para no tener todos los nodos en memoria a la vez
+    indexados = 0
+    duracion_extractor = 0.0
+    duracion_indexar = 0.0
+    index = None
+    while indexados < chunks:
+        inicio = time.perf_counter()
+        nodes = ingerir.extractor("recurso de amparo", None, max_hits=lote_hits)
+        duracion_extractor += time.perf_counter() - inicio
+        nodes = nodes[:chunks - indexados]
+        inicio = time.perf_counter()
+        index = ingerir.indexar(nodes)
+        duracion_indexar += time.perf_counter() - inicio
+        indexados += len(nodes)
+        print(f"  chunks indexados: {indexados}/{chunks}", flush=True)
+
+    # Consultas determinísticas tomadas del inicio de sentencias del corpus
+    textos = [" ".join(generar_hit(i)["content"].split()[:6]) for i in range(consultas)]
+    latencias_busqueda = []
+    resultados = []
+    for texto in textos:
+        inicio = time.perf_counter()
+        resultados.append(ingerir.buscar_nodos(texto, index, vector_top_k=10, lexico_top_k=10))
+        latencias_busqueda.append(time.perf_counter() - inicio)
+
+    latencias_sintesis = []
+    for texto, nodes in list(zip(textos, resultados))[:sintesis]:
+        inicio = time.perf_counter()
+        str(ingerir.sintetizador_respuesta(texto, nodes))
+        latencias_sintesis.append(time.perf_counter() - inicio)
+
+    return {
+        "chunks": indexados,
+        "extractor_chunks_s": indexados / duracion_extractor,
+        "indexar_chunks_s": indexados / duracion_indexar,
+        "buscar_p50_s": percentil(latencias_busqueda, 0.5),
+        "buscar_p95_s": percentil(latencias_busqueda, 0.95),
+        "sintetizar_p50_s": percentil(latencias_sintesis, 0.5),
+        "memoria_pico_mb": memoria_pico_mb(),
+        "indice_mb": tamano_mb(ingerir.RUTA_CHROMA),
+        # Percentiles por etapa de la instrumentación de la aplicación (solo informativos)
+        "etapas": {
+            nombre: {f"p{int(p * 100)}": valor for p, valor in metricas.percentiles(nombre).items()}
+            for nombre in ("split", "embed", "upsert", "retrieve", "synthesize")
+        },
+    }
+
+
+# Función para comparar los resultados con la línea base; retorna las métricas que empeoraron
+def comparar(resultados, linea_base, tolerancia):
+    regresiones = []
+    for nombre, mayor_es_mejor in METRICAS.items():
+        actual = resultados.get(nombre)
+        base = linea_base.get(nombre)
+        if actual is None or not base:
+            continue
+        cambio = (actual - base) / base
+        empeoro = cambio < -tolerancia if mayor_es_mejor else cambio > tolerancia
+        print(
+            f"{nombre:<20} base={base:<12.4f} actual={actual:<12.4f} "
+            f"cambio={100 * cambio:+.1f}%{'  REGRESIÓN' if empeoro else ''}"
+        )
+        if empeoro:
+            regresiones.append(nombre)
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline del pipeline de NexusPJLLM")
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--lote-hits", type=int, default=500)
+    parser.add_argument("--consultas", type=int, default=50)
+    parser.add_argument("--sintesis", type=int, default=10)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--linea-base", default=RUTA_LINEA_BASE)
+    parser.add_argument("--guardar-linea-base", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    parser.add_argument("--conservar", action="store_true", help="No borrar el directorio temporal")
+    args = parser.parse_args()
+
+    ruta_linea_base = os.path.abspath(args.linea_base)
+    directorio = tempfile.mkdtemp(prefix="bench_nexuspjllm_")
+    directorio_original = os.getcwd()
+    # Las rutas relativas de la aplicación (base vectorial, cachés, logs) quedan en el temporal
+    os.chdir(directorio)
+    try:
+        from benchmarks.modelos_falsos import instalar_modelos_falsos
+        from utils.logs import logger
+
+        # Solo se muestran advertencias y errores en consola durante el benchmark
+        logger.console_handler.setLevel(logging.WARNING)
+        instalar_modelos_falsos(args.dimension, args.max_tokens)
+        resultados = ejecutar(args.chunks, args.lote_hits, args.consultas, args.sintesis)
+    finally:
+        os.chdir(directorio_original)
+        if args.conservar:
+            print(f"Directorio del benchmark: {directorio}")
+        else:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+
+    lineas_base = {}
+    if os.path.exists(ruta_linea_base):
+        with open(ruta_linea_base, encoding="utf-8") as f:
+            lineas_base = json.load(f)
+    # La línea base se guarda por tamaño de corpus
+    clave = str(args.chunks)
+
+    if args.guardar_linea_base:
+        lineas_base[clave] = resultados
+        with open(ruta_linea_base, "w", encoding="utf-8") as f:
+            json.dump(lineas_base, f, indent=2, ensure_ascii=False)
+        print(f"Línea base guardada para {clave} chunks en {ruta_linea_base}")
+        return 0
+
+    if clave not in lineas_base:
+        print(f"No hay línea base para {clave} chunks; use --guardar-linea-base para crearla")
+        return 0
+
+    regresiones = comparar(resultados, lineas_base[clave], args.tolerancia)
+    if regresiones:
+        print("Regresiones de rendimiento: " + ", ".join(regresiones))
+        return 1
+    print("Sin regresiones de rendimiento")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
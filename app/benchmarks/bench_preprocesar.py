@@ -0,0 +1,104 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from benchmarks.servidor_stub import generar_hit
+from utils.preprocesar import split, split_varios
+
+"""
+    Micro-benchmark de preprocesar.split.
+    Verifica que la salida sea idéntica a la implementación original (varias pasadas
+    y un splitter por documento) sobre un corpus de prueba, y compara los tiempos.
+
+    Uso: python app/benchmarks/bench_preprocesar.py --documentos 200
+"""
+
+# Fragmentos con los casos especiales que la limpieza debe tratar igual que antes
+_FRAGMENTOS_ESPECIALES = [
+    "\n, inicio con coma",
+    ".inicio con punto",
+    "correo: juzgado.civil@poder-judicial.go.cr.",
+    "• viñeta • otra viñeta",
+    "tab\tintermedio",
+    "salto\r\nde línea Windows",
+    "separadores unicode raros",
+    "espacio\xa0duro y ancho​cero",
+    "control\x07\x1b caracteres",
+    "a•@b.com correo pegado a viñeta",
+]
+
+
+# Implementación original de split, usada como referencia de salida
+def split_original(content):
+    splitter = RecursiveCharacterTextSplitter(
+        separators=[", ", ". ", " (", ") ", ": ", " - ", "\n"],
+        chunk_size=1024,
+        chunk_overlap=15,
+        length_function=len,
+        is_separator_regex=False,
+    )
+    chunks = splitter.split_text(content)
+    chunks = ["".join(chunk.splitlines()) for chunk in chunks]
+    chunks = [re.sub(r"^[,.]", "", chunk) for chunk in chunks]
+    chunks = [re.sub(r"[\w\.-]+@[\w\.-]+", "[Correo]", chunk) for chunk in chunks]
+    chunks = [re.sub(r"•", "", chunk) for chunk in chunks]
+    chunks = [
+        "".join([char for char in chunk if char.isprintable()]) for chunk in chunks
+    ]
+    chunks = [chunk for chunk in chunks if len(chunk) > 100]
+    chunks = [chunk.strip() for chunk in chunks]
+    return chunks
+
+
+# Función para generar el corpus de prueba con casos especiales intercalados
+def generar_corpus(documentos):
+    aleatorio = random.Random(0)
+    corpus = []
+    for i in range(documentos):
+        palabras = generar_hit(i, parrafos=16)["content"].split(" ")
+        for _ in range(20):
+            posicion = aleatorio.randrange(len(palabras))
+            palabras.insert(posicion, aleatorio.choice(_FRAGMENTOS_ESPECIALES))
+        corpus.append(" ".join(palabras))
+    return corpus
+
+
+# Función para medir el tiempo de una función sobre el corpus
+def medir(funcion, corpus):
+    inicio = time.perf_counter()
+    resultado = funcion(corpus)
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de preprocesar.split")
+    parser.add_argument("--documentos", type=int, default=200)
+    parser.add_argument("--procesos", type=int, default=None)
+    args = parser.parse_args()
+
+    corpus = generar_corpus(args.documentos)
+
+    original, t_original = medir(lambda c: [split_original(d) for d in c], corpus)
+    nuevo, t_nuevo = medir(lambda c: [split(d) for d in c], corpus)
+    paralelo, t_paralelo = medir(lambda c: split_varios(c, procesos=args.procesos), corpus)
+
+    if original != nuevo or original != paralelo:
+        print("ERROR: la salida difiere de la implementación original")
+        sys.exit(1)
+
+    chunks = sum(len(chunks) for chunks in original)
+    print(f"documentos={len(corpus)} chunks={chunks} salida idéntica")
+    print(f"original:  {t_original:.3f}s")
+    print(f"split:     {t_nuevo:.3f}s ({t_original / t_nuevo:.2f}x)")
+    print(f"paralelo:  {t_paralelo:.3f}s ({t_original / t_paralelo:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
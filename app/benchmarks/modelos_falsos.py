@@ -0,0 +1,69 @@
+import zlib
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms.mock import MockLLM
+from llama_index.core.settings import Settings
+
+from benchmarks.servidor_stub import generar_hit
+from utils import ingerir
+from utils.indice_lexico import tokenizar
+
+"""
+    Modelos locales que reemplazan a Ollama y a NEXUS PJ en los benchmarks, sin red.
+    - EmbeddingFalso: embeddings determinísticos (bolsa de palabras con hashing, normalizada),
+      de modo que textos parecidos producen vectores parecidos.
+    - CosechaFalsa: reemplaza a cosechar_nexus con los hits determinísticos de servidor_stub.
+    - instalar_modelos_falsos: registra los modelos falsos en ingerir y en Settings.
+"""
+
+
+class EmbeddingFalso(BaseEmbedding):
+    dimension: int = 256
+
+    @classmethod
+    def class_name(cls):
+        return "EmbeddingFalso"
+
+    # Proyecta las palabras del texto en un vector con hashing estable entre procesos
+    def _embeber(self, texto):
+        posiciones = [zlib.crc32(palabra.encode("utf-8")) % self.dimension for palabra in tokenizar(texto)]
+        vector = np.bincount(posiciones, minlength=self.dimension).astype(np.float32)
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def _get_query_embedding(self, query):
+        return self._embeber(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._embeber(query)
+
+    def _get_text_embedding(self, text):
+        return self._embeber(text)
+
+    def _get_text_embeddings(self, texts):
+        return [self._embeber(texto) for texto in texts]
+
+
+class CosechaFalsa:
+    def __init__(self, inicio=0):
+        self.siguiente = inicio
+
+    # Misma firma que cosechar_nexus; cada llamada continúa donde terminó la anterior
+    def __call__(self, palabras_clave, paginas=1, max_hits=None, tamano=10, **kwargs):
+        total = max_hits if max_hits is not None else paginas * tamano
+        for indice in range(self.siguiente, self.siguiente + total):
+            yield generar_hit(indice)
+        self.siguiente += total
+
+
+# Función para reemplazar los modelos y la cosecha de la aplicación por los falsos
+def instalar_modelos_falsos(dimension=256, max_tokens=256):
+    embedding = EmbeddingFalso(dimension=dimension, embed_batch_size=ingerir.TAMANO_LOTE_EMBEDDINGS)
+    llm = MockLLM(max_tokens=max_tokens)
+    with ingerir._lock_modelos:
+        ingerir._embedding_model = embedding
+        ingerir._llm = llm
+    Settings.embed_model = embedding
+    Settings.llm = llm
+    ingerir.cosechar_nexus = CosechaFalsa()
+    return embedding, llm
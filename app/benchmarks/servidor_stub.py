@@ -0,0 +1,100 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+    Servidor local que imita la API de búsqueda de NEXUS PJ para pruebas y benchmarks sin red.
+    - generar_hit: genera un hit determinístico con la misma estructura que NEXUS PJ.
+    - ServidorStubNexus: servidor HTTP en un hilo, usable como context manager.
+"""
+
+# Vocabulario usado para generar el contenido de las sentencias ficticias
+_VOCABULARIO = [
+    "recurso", "amparo", "sala", "constitucional", "expediente", "artículo", "ley",
+    "derecho", "tribunal", "sentencia", "casación", "prueba", "contrato", "laboral",
+    "penal", "civil", "familia", "pensión", "alimentaria", "despido", "indemnización",
+    "propiedad", "posesión", "usucapión", "notificación", "plazo", "apelación",
+    "resolución", "juzgado", "demanda", "audiencia", "fundamento", "considerando",
+]
+
+_DESPACHOS = [
+    "Sala Constitucional",
+    "Sala Primera de la Corte",
+    "Sala Segunda de la Corte",
+    "Sala Tercera de la Corte",
+    "Tribunal de Apelación de Sentencia Penal",
+]
+
+_TIPOS = ["Sentencia", "Voto salvado", "Nota de magistrado"]
+
+
+# Función para generar un hit determinístico a partir de su posición
+def generar_hit(indice, parrafos=8):
+    aleatorio = random.Random(indice)
+    oraciones = []
+    for _ in range(parrafos * 6):
+        palabras = aleatorio.choices(_VOCABULARIO, k=aleatorio.randint(8, 20))
+        oraciones.append(" ".join(palabras).capitalize() + ".")
+    anio = 2000 + indice % 24
+    return {
+        "idDocument": "SENT-" + str(indice).zfill(7),
+        "despacho": _DESPACHOS[indice % len(_DESPACHOS)],
+        "expediente": str(anio % 100).zfill(2) + "-" + str(indice).zfill(6) + "-0007-CO",
+        "tipoInformacion": _TIPOS[indice % len(_TIPOS)],
+        "date": str(anio) + "-" + str(indice % 12 + 1).zfill(2) + "-15",
+        "content": " ".join(oraciones),
+    }
+
+
+# Manejador que responde las búsquedas con hits paginados
+class _ManejadorStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        longitud = int(self.headers.get("Content-Length", 0))
+        params = json.loads(self.rfile.read(longitud) or b"{}")
+        tamano = int(params.get("size", 10))
+        pagina = int(params.get("page", 1))
+
+        # Simula la latencia de la API real
+        time.sleep(self.server.latencia)
+
+        inicio = (pagina - 1) * tamano
+        fin = min(inicio + tamano, self.server.total_hits)
+        hits = [generar_hit(i) for i in range(inicio, fin)]
+        cuerpo = json.dumps({"hits": hits, "total": self.server.total_hits}).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        # Se silencian los logs de acceso
+        pass
+
+
+# Servidor de NEXUS PJ local que corre en un hilo en segundo plano
+class ServidorStubNexus:
+    def __init__(self, latencia=0.05, total_hits=1000):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ManejadorStub)
+        self.servidor.daemon_threads = True
+        self.servidor.latencia = latencia
+        self.servidor.total_hits = total_hits
+        self.hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f"http://{host}:{puerto}/api/search"
+
+    def __enter__(self):
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
@@ -0,0 +1,41 @@
+import argparse
+
+from utils.resultados import RUTA_RESULTADOS, AlmacenResultados, exportar_texto
+
+"""
+    Exporta resultados guardados al formato de texto de los antiguos archivos chunks<id>.txt.
+    Se puede exportar un registro por su ID, los de una consulta, los de una sentencia o todos.
+
+    Uso: python app/exportar_resultados.py --consulta "recurso de amparo" --salida chunks
+         python app/exportar_resultados.py --sentencia SENT-0000042
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportación de resultados de NexusPJLLM a texto")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--id", type=int, help="ID del registro")
+    grupo.add_argument("--consulta", help="Consulta exacta (sin distinguir mayúsculas)")
+    grupo.add_argument("--sentencia", help="ID_Sentencia que aparece en los resultados")
+    grupo.add_argument("--todos", action="store_true")
+    parser.add_argument("--limite", type=int, default=None)
+    parser.add_argument("--almacen", default=RUTA_RESULTADOS)
+    parser.add_argument("--salida", default="chunks")
+    args = parser.parse_args()
+
+    almacen = AlmacenResultados(args.almacen)
+    if args.id is not None:
+        registros = [registro for registro in [almacen.obtener(args.id)] if registro]
+    elif args.consulta:
+        registros = almacen.buscar_por_consulta(args.consulta, args.limite)
+    elif args.sentencia:
+        registros = almacen.buscar_por_sentencia(args.sentencia, args.limite)
+    else:
+        registros = almacen.recorrer()
+
+    rutas = exportar_texto(registros, args.salida)
+    print(f"Registros exportados: {len(rutas)} en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+
+from utils.ingerir import USAR_PALABRAS_CLAVE
+from utils.ingesta_masiva import RUTA_CHECKPOINT, ingerir_temas
+from utils.logs import logger
+
+"""
+    Ingesta masiva no interactiva: lee un archivo con un tema por línea y los ingiere
+    en la base de datos vectorial. Si se interrumpe, al volver a ejecutarlo continúa
+    con los temas que faltaban según el archivo de checkpoint.
+
+    Uso: python app/ingesta.py temas.txt --paginas 3 --trabajadores-embeddings 4
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta masiva de jurisprudencia de NexusPJ")
+    parser.add_argument("archivo", help="Archivo de texto con un tema por línea")
+    parser.add_argument("--checkpoint", default=RUTA_CHECKPOINT)
+    parser.add_argument("--paginas", type=int, default=3)
+    parser.add_argument("--tamano-lote", type=int, default=32)
+    parser.add_argument("--trabajadores-consulta", type=int, default=2)
+    parser.add_argument("--trabajadores-split", type=int, default=2)
+    parser.add_argument("--trabajadores-embeddings", type=int, default=4)
+    parser.add_argument("--tamano-cola", type=int, default=8)
+    parser.add_argument("--intervalo-reporte", type=float, default=30.0)
+    parser.add_argument(
+        "--palabras-clave", action="store_true", default=USAR_PALABRAS_CLAVE,
+        help="Consultar NexusPJ con subconsultas de palabras clave de cada tema",
+    )
+    args = parser.parse_args()
+
+    with open(args.archivo, encoding="utf-8") as f:
+        temas = f.readlines()
+
+    logger.info("Ingesta masiva iniciada")
+    ingerir_temas(
+        temas,
+        ruta_checkpoint=args.checkpoint,
+        paginas=args.paginas,
+        tamano_lote=args.tamano_lote,
+        trabajadores_consulta=args.trabajadores_consulta,
+        trabajadores_split=args.trabajadores_split,
+        trabajadores_embeddings=args.trabajadores_embeddings,
+        tamano_cola=args.tamano_cola,
+        intervalo_reporte=args.intervalo_reporte,
+        palabras_clave=args.palabras_clave,
+    )
+
+
+if __name__ == "__main__":
+    main()
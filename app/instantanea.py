@@ -0,0 +1,45 @@
+import argparse
+import time
+
+from utils.ingerir import RUTA_INSTANTANEA, obtener_coleccion, obtener_particiones
+from utils.instantanea import Instantanea, exportar_instantanea
+
+"""
+    Exporta la colección de sentencias a una instantánea de solo lectura (vectores mapeados en
+    memoria y tabla SQLite de textos y metadatos). Con NEXUSPJLLM_PARTICION se exportan todas
+    las particiones, incluidas las de desborde. Con NEXUSPJLLM_INSTANTANEA=1, las opciones 2
+    y 3 y el servidor de consultas buscan en ella sin abrir Chroma ni cargar el índice.
+    Se debe volver a exportar después de ingerir jurisprudencia nueva.
+
+    Uso: python app/instantanea.py
+         python app/instantanea.py --salida ./app/chroma_db/instantanea
+"""
+
+
+# Función para obtener las colecciones a exportar: todas las particiones si el particionado está
+# habilitado (los chunks nuevos no llegan a la colección única), o la colección única
+def colecciones_a_exportar():
+    particiones = obtener_particiones()
+    if particiones is None:
+        return [obtener_coleccion()]
+    if not particiones.nombres():
+        raise SystemExit("El particionado está habilitado pero no hay particiones en " + particiones.ruta)
+    return [particiones.coleccion(nombre) for nombre in particiones.nombres()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportación de la colección a una instantánea")
+    parser.add_argument("--salida", default=RUTA_INSTANTANEA)
+    args = parser.parse_args()
+
+    cantidad = exportar_instantanea(colecciones_a_exportar(), args.salida)
+    inicio = time.perf_counter()
+    Instantanea(args.salida)
+    print(
+        f"Instantánea exportada: {cantidad} chunks en {args.salida} "
+        f"(apertura: {1000 * (time.perf_counter() - inicio):.1f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
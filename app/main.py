@@ -1,12 +1,16 @@
 import os
 from utils.ingerir import *
+from utils.filtros import parsear_filtros
 from utils.logs import logger
+from utils.metricas import metricas
 import time
 
+# Número de páginas de NexusPJ a consultar por cada ingesta (10 sentencias por página)
+PAGINAS_NEXUS = 3
+
 class NexusPJLLM:
     def __init__(self):
         self.index = None
-        self.timing_data = []
         logger.info("NexusPJLLM app iniciada")
 
     def imprimir_opciones(self):
@@ -22,26 +26,42 @@ class NexusPJLLM:
         print()
 
     def verificar_base_datos(self):
-        if not os.path.exists("./app/chroma_db"):
+        if not os.path.exists(RUTA_CHROMA):
             print("Debe ingerir la jurisprudencia primero. Seleccione la opción 1.")
             return False
         return True
 
-    def procesar_consulta(self, consulta, reranker=False):
-        try:
-            start_time = time.time()
-            if not self.index:
-                self.index = get_index()
-            
-            retrieved_nodes = buscar_nodos(
-                consulta,
-                self.index,
-                vector_top_k=20,
-                reranker_top_n=3,
-                with_reranker_sbert=reranker
+    def pedir_filtros(self):
+        while True:
+            texto = input(
+                "Filtros opcionales (ej. despacho=Sala Constitucional; desde=2015; hasta=2020; "
+                "tipo=Sentencia), Enter para omitir: "
             )
-            elapsed_time = time.time() - start_time
-            self.timing_data.append({"operation": "procesar_consulta", "time": elapsed_time})
+            try:
+                return parsear_filtros(texto)
+            except ValueError as e:
+                print(f"{str(e)}. Intente nuevamente.")
+
+    def procesar_consulta(self, consulta, reranker=False, filtros=None, usar_instantanea=False):
+        try:
+            with metricas.span("procesar_consulta", reranker=reranker):
+                # La instantánea de solo lectura evita abrir Chroma y cargar el índice
+                instantanea = obtener_instantanea() if usar_instantanea else None
+                if not self.index and instantanea is None:
+                    self.index = get_index()
+                
+                retrieved_nodes = buscar_nodos(
+                    consulta,
+                    self.index,
+                    vector_top_k=10,
+                    reranker_top_n=3,
+                    with_reranker_sbert=reranker,
+                    lexico_top_k=10,
+                    filtros=filtros,
+                    documentos_top_k=DOCUMENTOS_TOP_K,
+                    max_por_documento=MAX_CHUNKS_POR_DOCUMENTO,
+                    instantanea=instantanea
+                )
             return retrieved_nodes
         except Exception as e:
             logger.error(f"Error al procesar consulta: {str(e)}")
@@ -53,15 +73,18 @@ class NexusPJLLM:
                 consulta = input("\nIngrese su consulta sobre un tema jurídico particular: ")
                 start_time = time.time()
                 
-                nodes = extractor(consulta, embedding_model)
-                self.index = indexar(nodes)
-                retrieved_nodes = self.procesar_consulta(consulta)
-                
-                imprimir_nodos(retrieved_nodes)
-                guardar_nodos(retrieved_nodes)
+                with metricas.span("opcion_1"):
+                    nodes = extractor(
+                        consulta, obtener_embedding_model(), use_keybert=USAR_PALABRAS_CLAVE,
+                        paginas=PAGINAS_NEXUS
+                    )
+                    self.index = indexar(nodes)
+                    retrieved_nodes = self.procesar_consulta(consulta)
+                    
+                    imprimir_nodos(retrieved_nodes)
+                    guardar_nodos(retrieved_nodes, consulta)
                 
                 elapsed_time = time.time() - start_time
-                self.timing_data.append({"operation": "opcion_1", "time": elapsed_time})
                 logger.info(f"Indexación y guardado de nodos finalizado en {elapsed_time:.2f} segundos")
                 
                 if not self.continuar_consulta():
@@ -77,19 +100,21 @@ class NexusPJLLM:
         while True:
             try:
                 consulta = input("\nIngrese su consulta: ")
+                filtros = self.pedir_filtros()
                 start_time = time.time()
                 
-                retrieved_nodes = self.procesar_consulta(consulta, reranker=True)
-                imprimir_nodos(retrieved_nodes)
-                logger.info("Iniciando síntesis de respuesta...")
-                
-                respuesta = sintetizador_respuesta(consulta, retrieved_nodes)
-                
-                elapsed_time = time.time() - start_time
-                self.timing_data.append({"operation": "opcion_2", "time": elapsed_time})
-                logger.info(f"Respuesta generada en {elapsed_time:.2f} segundos")
-                
-                self.mostrar_resultado(consulta, respuesta)
+                with metricas.span("opcion_2") as span:
+                    retrieved_nodes = self.procesar_consulta(consulta, reranker=True, filtros=filtros, usar_instantanea=True)
+                    imprimir_nodos(retrieved_nodes)
+                    logger.info("Iniciando síntesis de respuesta...")
+
+                    # Si una consulta similar ya se respondió con los mismos nodos, se reutiliza
+                    respuesta = buscar_respuesta_cacheada(consulta, retrieved_nodes)
+                    span["cache"] = respuesta is not None
+                    if respuesta is not None:
+                        self.mostrar_respuesta_cacheada(consulta, respuesta, start_time)
+                    else:
+                        self.generar_respuesta(consulta, retrieved_nodes, start_time)
                 
                 if not self.continuar_consulta():
                     break
@@ -97,6 +122,36 @@ class NexusPJLLM:
                 logger.error(f"Error en opción 2: {str(e)}")
                 print(f"Ocurrió un error: {str(e)}")
 
+    def mostrar_respuesta_cacheada(self, consulta, respuesta, start_time):
+        elapsed_time = time.time() - start_time
+        logger.info(f"Respuesta obtenida de la caché en {elapsed_time:.2f} segundos")
+        self.mostrar_resultado(consulta, "(Respuesta obtenida de la caché)\n" + respuesta)
+
+    def generar_respuesta(self, consulta, retrieved_nodes, start_time):
+        self.mostrar_encabezado(consulta)
+        print("Respuesta generada (Ctrl+C para cancelar):")
+
+        # La respuesta se imprime conforme el modelo genera los tokens
+        inicio_sintesis = time.perf_counter()
+        respuesta = sintetizador_respuesta(consulta, retrieved_nodes, streaming=True)
+        resultado = transmitir_respuesta(respuesta, inicio_sintesis)
+        print("\n" + "-" * 50 + "\n")
+
+        # Solo se guardan en caché las respuestas completas
+        if not resultado["cancelada"] and resultado["texto"]:
+            guardar_respuesta_cacheada(consulta, retrieved_nodes, resultado["texto"])
+
+        elapsed_time = time.time() - start_time
+        if resultado["cancelada"]:
+            print("Generación cancelada.")
+            logger.info(f"Respuesta cancelada tras {elapsed_time:.2f} segundos")
+        else:
+            logger.info(
+                f"Respuesta generada en {elapsed_time:.2f} segundos "
+                f"(primer token: {resultado['ttft'] or 0:.2f} s, "
+                f"{resultado['tokens_por_segundo']:.1f} tokens/s)"
+            )
+
     def opcion_3(self):
         if not self.verificar_base_datos():
             return
@@ -104,16 +159,17 @@ class NexusPJLLM:
         while True:
             try:
                 consulta = input("\nIngrese su consulta: ")
+                filtros = self.pedir_filtros()
                 start_time = time.time()
                 
-                retrieved_nodes = self.procesar_consulta(consulta, reranker=True)
+                with metricas.span("opcion_3"):
+                    retrieved_nodes = self.procesar_consulta(consulta, reranker=True, filtros=filtros, usar_instantanea=True)
                 
                 elapsed_time = time.time() - start_time
-                self.timing_data.append({"operation": "opcion_3", "time": elapsed_time})
                 logger.info(f"Búsqueda completada en {elapsed_time:.2f} segundos")
                 
                 self.mostrar_resultado(consulta, None, retrieved_nodes)
-                guardar_nodos(retrieved_nodes)
+                guardar_nodos(retrieved_nodes, consulta)
                 
                 if not self.continuar_consulta():
                     break
@@ -128,10 +184,13 @@ class NexusPJLLM:
                 return opcion == 's'
             print("Opción inválida. Responda S o N.")
 
-    def mostrar_resultado(self, consulta, respuesta=None, nodes=None):
+    def mostrar_encabezado(self, consulta):
         print("\n" + "-" * 50)
         print(f"Su consulta fue:\n{consulta}")
         print("-" * 50)
+
+    def mostrar_resultado(self, consulta, respuesta=None, nodes=None):
+        self.mostrar_encabezado(consulta)
         
         if respuesta:
             print(f"Respuesta generada:\n{respuesta}")
@@ -143,6 +202,8 @@ class NexusPJLLM:
     def ejecutar(self):
         try:
             print("Bienvenido a NexusPJLLM\n")
+            # Los modelos se cargan en segundo plano mientras el usuario elige una opción
+            iniciar_precalentamiento()
             opciones = {"1": self.opcion_1, "2": self.opcion_2, "3": self.opcion_3}
             
             while True:
@@ -161,7 +222,8 @@ class NexusPJLLM:
             print(f"Error inesperado: {str(e)}")
         finally:
             logger.info("NexusPJLLM app finalizada")
-            logger.info(f"Timing data: {self.timing_data}")
+            logger.info("Métricas por etapa:\n" + metricas.resumen())
+            metricas.exportar_prometheus()
 
 if __name__ == "__main__":
     app = NexusPJLLM()
@@ -0,0 +1,64 @@
+import argparse
+
+from utils.ingerir import CRITERIO_PARTICION, NOMBRE_COLECCION, nodo_desde_chroma, obtener_coleccion
+from utils.particiones import RUTA_PARTICIONES, Particiones
+
+"""
+    Administración de las particiones de la base vectorial (por año o por despacho).
+    - listar: muestra las particiones, su número de chunks y si están selladas.
+    - repartir: copia los chunks de la colección única a sus particiones.
+    - compactar: reescribe una partición y la sella (solo lectura; sus chunks nuevos van a la
+      partición de desborde <partición>_nuevas, que se compacta con --sin-sellar).
+
+    Uso: python app/particiones.py listar
+         python app/particiones.py repartir --criterio anio
+         python app/particiones.py compactar anio_2015 anio_2016
+"""
+
+
+# Función para copiar los chunks de la colección única a las particiones
+def repartir(particiones, lote=1000):
+    coleccion = obtener_coleccion()
+    copiados = 0
+    for desplazamiento in range(0, coleccion.count(), lote):
+        resultado = coleccion.get(
+            include=["embeddings", "documents", "metadatas"], limit=lote, offset=desplazamiento
+        )
+        nodes = []
+        for node_id, embedding, texto, metadatos in zip(
+            resultado["ids"], resultado["embeddings"], resultado["documents"], resultado["metadatas"]
+        ):
+            node = nodo_desde_chroma(node_id, texto, metadatos)
+            node.embedding = list(embedding)
+            nodes.append(node)
+        existentes = particiones.existentes(nodes)
+        nuevos = [node for node in nodes if node.node_id not in existentes]
+        if nuevos:
+            copiados += particiones.agregar(nuevos)
+    return copiados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Administración de las particiones de NexusPJLLM")
+    parser.add_argument("accion", choices=["listar", "repartir", "compactar"])
+    parser.add_argument("nombres", nargs="*", help="Particiones a compactar")
+    parser.add_argument("--criterio", default=CRITERIO_PARTICION or "anio", choices=["anio", "despacho"])
+    parser.add_argument("--sin-sellar", action="store_true", help="Compactar sin sellar la partición")
+    parser.add_argument("--ruta", default=RUTA_PARTICIONES)
+    args = parser.parse_args()
+
+    particiones = Particiones(args.ruta, args.criterio, NOMBRE_COLECCION)
+    if args.accion == "listar":
+        for nombre in particiones.nombres():
+            estado = "sellada" if particiones.sellada(nombre) else "abierta"
+            print(f"{nombre:<40} {particiones.coleccion(nombre).count():>9} chunks  {estado}")
+    elif args.accion == "repartir":
+        print(f"Chunks copiados a las particiones: {repartir(particiones)}")
+    else:
+        for nombre in args.nombres:
+            total = particiones.compactar(nombre, sellar=not args.sin_sellar)
+            print(f"Partición {nombre} compactada: {total} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import argparse
+
+from utils.ingerir import precalentar
+from utils.logs import logger
+from utils.servicio import MAX_PENDIENTES, TRABAJADORES, crear_aplicacion
+
+"""
+    Servidor HTTP de consultas: mantiene el índice, el reranker y el modelo de lenguaje
+    cargados en un solo proceso y los comparte entre todos los usuarios.
+    - POST /buscar {"consulta": "...", "filtros": "despacho=...; anio=2018"}: top 3 de
+      jurisprudencia (opción 3).
+    - POST /responder {"consulta": "...", "filtros": "despacho=...; anio=2018"}: respuesta
+      generada (opción 2).
+    Los filtros son opcionales y también se aceptan como diccionario {"despacho": "...", "anio": "2018"};
+    un filtro inválido responde 400.
+    - GET /salud y GET /metricas (formato de Prometheus).
+
+    Uso: python app/servidor.py --puerto 8080 --trabajadores 2
+"""
+
+
+def main():
+    from aiohttp import web
+
+    parser = argparse.ArgumentParser(description="Servidor HTTP de consultas de NexusPJLLM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--trabajadores", type=int, default=TRABAJADORES)
+    parser.add_argument("--max-pendientes", type=int, default=MAX_PENDIENTES)
+    args = parser.parse_args()
+
+    # Los modelos se cargan antes de aceptar consultas
+    precalentar()
+    logger.info(f"Servidor de consultas iniciado en http://{args.host}:{args.puerto}")
+    web.run_app(
+        crear_aplicacion(args.trabajadores, args.max_pendientes),
+        host=args.host,
+        port=args.puerto,
+        print=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from .logs import logger
+from .metricas import metricas
+
+"""
+    Caché persistente de embeddings compartida por la indexación y las consultas.
+    - CacheEmbeddings: guarda los vectores en un arreglo float32 mapeado en memoria y
+      un índice SQLite pequeño (llave -> posición), con desalojo LRU al llenarse.
+    - EmbeddingCacheado: envuelve un modelo de embeddings de LlamaIndex para que
+      los textos y consultas repetidas no se vuelvan a calcular.
+"""
+
+# Define la ruta por defecto de la caché de embeddings
+RUTA_CACHE_EMBEDDINGS = "./app/cache/embeddings"
+
+
+class CacheEmbeddings:
+    def __init__(self, ruta=RUTA_CACHE_EMBEDDINGS, capacidad=200_000):
+        self.ruta = ruta
+        self.capacidad = capacidad
+        self.dimension = None
+        self.aciertos = 0
+        self.fallos = 0
+        self._vectores = None
+        self._lock = threading.Lock()
+
+        os.makedirs(ruta, exist_ok=True)
+        self._indice = sqlite3.connect(
+            os.path.join(ruta, "indice.db"), check_same_thread=False
+        )
+        self._indice.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entradas (
+                clave TEXT PRIMARY KEY,
+                posicion INTEGER NOT NULL UNIQUE,
+                usado REAL NOT NULL
+            )
+            """
+        )
+        self._indice.execute("CREATE INDEX IF NOT EXISTS idx_usado ON entradas (usado)")
+        self._indice.execute(
+            "CREATE TABLE IF NOT EXISTS meta (nombre TEXT PRIMARY KEY, valor INTEGER)"
+        )
+        self._indice.commit()
+
+        # Si la caché ya existe se respetan su dimensión y capacidad
+        meta = dict(self._indice.execute("SELECT nombre, valor FROM meta").fetchall())
+        if "dimension" in meta:
+            self.dimension = meta["dimension"]
+            self.capacidad = meta["capacidad"]
+            self._abrir_vectores()
+
+    # Genera la llave a partir del modelo, el tipo de embedding y el hash del texto
+    @staticmethod
+    def clave(modelo, texto, tipo="texto"):
+        return hashlib.sha256(f"{modelo}\0{tipo}\0{texto}".encode("utf-8")).hexdigest()
+
+    # Abre (o crea) el archivo de vectores mapeado en memoria
+    def _abrir_vectores(self):
+        ruta_vectores = os.path.join(self.ruta, "vectores.f32")
+        modo = "r+" if os.path.exists(ruta_vectores) else "w+"
+        self._vectores = np.memmap(
+            ruta_vectores,
+            dtype=np.float32,
+            mode=modo,
+            shape=(self.capacidad, self.dimension),
+        )
+
+    # Obtiene los embeddings existentes para una lista de llaves
+    def obtener_varios(self, claves):
+        encontrados = {}
+        if not claves:
+            return encontrados
+        with self._lock:
+            if self._vectores is not None:
+                for i in range(0, len(claves), 500):
+                    lote = claves[i:i + 500]
+                    filas = self._indice.execute(
+                        "SELECT clave, posicion FROM entradas WHERE clave IN ("
+                        + ",".join("?" * len(lote)) + ")",
+                        lote,
+                    ).fetchall()
+                    for clave, posicion in filas:
+                        encontrados[clave] = self._vectores[posicion].tolist()
+                if encontrados:
+                    ahora = time.time()
+                    self._indice.executemany(
+                        "UPDATE entradas SET usado = ? WHERE clave = ?",
+                        [(ahora, clave) for clave in encontrados],
+                    )
+                    self._indice.commit()
+            self.aciertos += len(encontrados)
+            self.fallos += len(set(claves)) - len(encontrados)
+        return encontrados
+
+    # Guarda los embeddings nuevos, reutilizando las posiciones menos usadas si está llena
+    def guardar_varios(self, pares):
+        if not pares:
+            return
+        with self._lock:
+            if self._vectores is None:
+                self.dimension = len(pares[0][1])
+                self._indice.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [("dimension", self.dimension), ("capacidad", self.capacidad)],
+                )
+                self._abrir_vectores()
+
+            ahora = time.time()
+            ocupadas = self._indice.execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+            desalojadas = 0
+            for clave, vector in pares:
+                fila = self._indice.execute(
+                    "SELECT posicion FROM entradas WHERE clave = ?", (clave,)
+                ).fetchone()
+                if fila is not None:
+                    posicion = fila[0]
+                elif ocupadas < self.capacidad:
+                    posicion = ocupadas
+                    ocupadas += 1
+                else:
+                    # Se desaloja la entrada usada hace más tiempo y se reutiliza su posición
+                    antigua, posicion = self._indice.execute(
+                        "SELECT clave, posicion FROM entradas ORDER BY usado ASC LIMIT 1"
+                    ).fetchone()
+                    self._indice.execute("DELETE FROM entradas WHERE clave = ?", (antigua,))
+                    desalojadas += 1
+                self._vectores[posicion] = vector
+                self._indice.execute(
+                    "INSERT OR REPLACE INTO entradas VALUES (?, ?, ?)", (clave, posicion, ahora)
+                )
+            self._vectores.flush()
+            self._indice.commit()
+        if desalojadas:
+            logger.info("Caché de embeddings: " + str(desalojadas) + " entradas desalojadas")
+
+
+class EmbeddingCacheado(BaseEmbedding):
+    _modelo: BaseEmbedding = PrivateAttr()
+    _cache: CacheEmbeddings = PrivateAttr()
+
+    def __init__(self, modelo, cache, **kwargs):
+        super().__init__(
+            model_name=modelo.model_name,
+            embed_batch_size=modelo.embed_batch_size,
+            **kwargs,
+        )
+        self._modelo = modelo
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls):
+        return "EmbeddingCacheado"
+
+    # Modelo de embeddings envuelto, sin pasar por la caché
+    @property
+    def modelo_base(self):
+        return self._modelo
+
+    # Calcula solo los embeddings que no están en caché y conserva el orden de los textos
+    def _con_cache(self, textos, tipo, calcular):
+        claves = [CacheEmbeddings.clave(self.model_name, texto, tipo) for texto in textos]
+        encontrados = self._cache.obtener_varios(claves)
+        faltantes = {}
+        for clave, texto in zip(claves, textos):
+            if clave not in encontrados:
+                faltantes.setdefault(clave, texto)
+        if faltantes:
+            nuevos = calcular(list(faltantes.values()))
+            pares = list(zip(faltantes.keys(), nuevos))
+            self._cache.guardar_varios(pares)
+            encontrados.update(pares)
+        metricas.incrementar("cache_embeddings_aciertos", len(textos) - len(faltantes))
+        metricas.incrementar("cache_embeddings_fallos", len(faltantes))
+        logger.debug(
+            "Caché de embeddings: %d aciertos, %d calculados", len(textos) - len(faltantes), len(faltantes)
+        )
+        return [encontrados[clave] for clave in claves]
+
+    def _get_query_embedding(self, query):
+        return self._con_cache(
+            [query], "consulta",
+            lambda textos: [self._modelo.get_query_embedding(t) for t in textos],
+        )[0]
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text):
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts):
+        return self._con_cache(texts, "texto", self._modelo._get_text_embeddings)
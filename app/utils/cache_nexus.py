@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from .logs import logger
+
+"""
+    Caché persistente en disco para las respuestas de la API de NEXUS PJ.
+    Las respuestas se guardan comprimidas en una base SQLite, con vencimiento (TTL)
+    y desalojo de las entradas menos usadas recientemente (LRU) al superar el tamaño máximo.
+"""
+
+# Define la ruta por defecto de la caché
+RUTA_CACHE_NEXUS = "./app/cache/nexus.db"
+
+
+class CacheNexus:
+    def __init__(self, ruta=RUTA_CACHE_NEXUS, ttl=7 * 24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute(
+            """
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                creado REAL NOT NULL,
+                usado REAL NOT NULL,
+                tamano INTEGER NOT NULL,
+                datos BLOB NOT NULL
+            )
+            """
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_usado ON respuestas (usado)")
+        self._conexion.commit()
+
+    # Genera la llave a partir de la consulta normalizada y los parámetros de la petición
+    @staticmethod
+    def clave(consulta, params):
+        consulta = " ".join(consulta.split())
+        params = {k: v for k, v in params.items() if k != "q"}
+        texto = json.dumps({"q": consulta, "params": params}, sort_keys=True)
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    # Obtiene una respuesta de la caché o None si no existe o está vencida
+    def obtener(self, clave):
+        ahora = time.time()
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT creado, datos FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None or ahora - fila[0] > self.ttl:
+                if fila is not None:
+                    self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                    self._conexion.commit()
+                self.fallos += 1
+                respuesta = None
+            else:
+                self._conexion.execute(
+                    "UPDATE respuestas SET usado = ? WHERE clave = ?", (ahora, clave)
+                )
+                self._conexion.commit()
+                self.aciertos += 1
+                respuesta = json.loads(zlib.decompress(fila[1]))
+        logger.debug(
+            "Caché NEXUS PJ: %s (aciertos=%d, fallos=%d)",
+            "acierto" if respuesta is not None else "fallo", self.aciertos, self.fallos,
+        )
+        return respuesta
+
+    # Guarda los hits de una respuesta comprimidos y desaloja las entradas más antiguas
+    def guardar(self, clave, respuesta):
+        datos = zlib.compress(json.dumps({"hits": respuesta["hits"]}).encode("utf-8"))
+        ahora = time.time()
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?)",
+                (clave, ahora, ahora, len(datos), sqlite3.Binary(datos)),
+            )
+            self._desalojar()
+            self._conexion.commit()
+
+    # Elimina las entradas menos usadas hasta respetar el tamaño máximo
+    def _desalojar(self):
+        total = self._conexion.execute(
+            "SELECT COALESCE(SUM(tamano), 0) FROM respuestas"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        filas = self._conexion.execute(
+            "SELECT clave, tamano FROM respuestas ORDER BY usado ASC"
+        ).fetchall()
+        eliminar = []
+        for clave, tamano in filas:
+            if total <= self.max_bytes:
+                break
+            eliminar.append((clave,))
+            total -= tamano
+        self._conexion.executemany("DELETE FROM respuestas WHERE clave = ?", eliminar)
+        logger.info("Caché NEXUS PJ: " + str(len(eliminar)) + " entradas desalojadas")
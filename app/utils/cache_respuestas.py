@@ -0,0 +1,105 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .logs import logger
+
+"""
+    Caché semántica de respuestas generadas por el LLM.
+    Una respuesta se reutiliza cuando la consulta es suficientemente similar (similitud coseno
+    de sus embeddings), los nodos recuperados son exactamente los mismos y el prompt no cambió.
+"""
+
+# Define la ruta por defecto de la caché de respuestas
+RUTA_CACHE_RESPUESTAS = "./app/cache/respuestas.db"
+
+
+class CacheRespuestas:
+    def __init__(
+            self,
+            ruta=RUTA_CACHE_RESPUESTAS,
+            umbral=0.95,
+            ttl=24 * 3600,
+            max_entradas=1000,
+    ):
+        self.ruta = ruta
+        self.umbral = umbral
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute(
+            """
+            CREATE TABLE IF NOT EXISTS respuestas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                firma TEXT NOT NULL,
+                consulta TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                respuesta TEXT NOT NULL,
+                creado REAL NOT NULL,
+                usado REAL NOT NULL
+            )
+            """
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_firma ON respuestas (firma)")
+        self._conexion.commit()
+
+    # Genera la firma con los IDs de los nodos recuperados y la versión del prompt
+    @staticmethod
+    def firma(node_ids, version_prompt):
+        texto = version_prompt + "\n" + "\n".join(sorted(node_ids))
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    # Busca una respuesta con la misma firma y una consulta semánticamente similar
+    def obtener(self, firma, embedding):
+        consulta = np.asarray(embedding, dtype=np.float32)
+        consulta = consulta / (np.linalg.norm(consulta) or 1.0)
+        ahora = time.time()
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT id, consulta, embedding, respuesta FROM respuestas "
+                "WHERE firma = ? AND creado >= ?",
+                (firma, ahora - self.ttl),
+            ).fetchall()
+            mejor = None
+            for id_, texto, blob, respuesta in filas:
+                similitud = float(np.dot(consulta, np.frombuffer(blob, dtype=np.float32)))
+                if similitud >= self.umbral and (mejor is None or similitud > mejor[0]):
+                    mejor = (similitud, id_, texto, respuesta)
+            if mejor is None:
+                return None
+            self._conexion.execute(
+                "UPDATE respuestas SET usado = ? WHERE id = ?", (ahora, mejor[1])
+            )
+            self._conexion.commit()
+        logger.info(
+            f"Caché de respuestas: acierto (similitud {mejor[0]:.3f} con \"{mejor[2]}\")"
+        )
+        return mejor[3]
+
+    # Guarda una respuesta y desaloja las vencidas y las menos usadas
+    def guardar(self, firma, consulta, embedding, respuesta):
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        ahora = time.time()
+        with self._lock:
+            self._conexion.execute(
+                "INSERT INTO respuestas (firma, consulta, embedding, respuesta, creado, usado) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (firma, consulta, vector.tobytes(), respuesta, ahora, ahora),
+            )
+            self._conexion.execute(
+                "DELETE FROM respuestas WHERE creado < ?", (ahora - self.ttl,)
+            )
+            self._conexion.execute(
+                "DELETE FROM respuestas WHERE id NOT IN "
+                "(SELECT id FROM respuestas ORDER BY usado DESC LIMIT ?)",
+                (self.max_entradas,),
+            )
+            self._conexion.commit()
@@ -1,41 +1,103 @@
 import json
+import math
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from .cache_nexus import CacheNexus
 from .logs import logger
+from .metricas import metricas
 
 """
-    Este módulo contiene la función para consultar la API de NEXUS PJ
+    Este módulo contiene las funciones para consultar la API de NEXUS PJ
+    - consulta_nexus: consulta una página de resultados de NEXUS PJ (con caché en disco).
+    - cosechar_nexus: consulta varias páginas de forma concurrente y retorna los hits en orden.
+    - cosechar_subconsultas: consulta varias subconsultas a la vez y une sus hits sin repetir sentencias.
 """
 
+# Define el URL de la API de NEXUS PJ
+URL_NEXUS = "https://nexuspj.poder-judicial.go.cr/api/search"
+
+# Define el número máximo de consultas simultáneas a la API
+MAX_CONCURRENCIA = 4
+
+# Define la sesión y la caché compartidas (se crean en el primer uso)
+_sesion = None
+_cache = None
+_lock = threading.Lock()
+
+
+# Función para obtener la sesión HTTP con conexiones reutilizables y reintentos
+def obtener_sesion():
+    global _sesion
+    with _lock:
+        if _sesion is None:
+            # Reintenta ante errores transitorios con espera exponencial (0.5s, 1s, 2s)
+            reintentos = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["POST"],
+            )
+            # El pool de conexiones se dimensiona según la concurrencia máxima
+            adaptador = HTTPAdapter(
+                pool_connections=1, pool_maxsize=MAX_CONCURRENCIA, max_retries=reintentos
+            )
+            sesion = requests.Session()
+            sesion.mount("https://", adaptador)
+            sesion.mount("http://", adaptador)
+            sesion.headers.update({"Content-Type": "application/json"})
+            sesion.verify = False
+            _sesion = sesion
+    return _sesion
+
+
+# Función para obtener la caché de respuestas de NEXUS PJ
+def obtener_cache():
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = CacheNexus()
+    return _cache
+
 
 # Función para consulta de NEXUS PJ
-def consulta_nexus(palabras_clave):
+def consulta_nexus(palabras_clave, tamano=10, pagina=1, url=URL_NEXUS, usar_cache=True):
     try:
-        # Define el URL de la API de NEXUS PJ
-        url = "https://nexuspj.poder-judicial.go.cr/api/search"
-
         # Define los parámetros de la consulta
         params = {
             "q": palabras_clave,
             "nq": "",
             "advanced": False,
             "facets": [],
-            "size": 10,
-            "page": 1,
+            "size": tamano,
+            "page": pagina,
             "sort": {"field": "_score", "order": "desc"},
             "exp": "",
         }
 
-        # Define los headers de la consulta
-        headers = {"Content-Type": "application/json"}
+        # Si la respuesta está en caché, se evita la consulta a la API
+        if usar_cache:
+            clave = CacheNexus.clave(palabras_clave, dict(params, url=url))
+            response = obtener_cache().obtener(clave)
+            metricas.incrementar("cache_nexus_" + ("aciertos" if response is not None else "fallos"))
+            if response is not None:
+                return response
 
-        # Realiza la consulta a la API de NEXUS PJ
-        response = requests.post(url, headers=headers, data=json.dumps(params), verify=False)
+        with metricas.span("fetch", pagina=pagina):
+            # Realiza la consulta a la API de NEXUS PJ
+            response = obtener_sesion().post(url, data=json.dumps(params))
 
-        # Convierte la respuesta de la API de NEXUS PJ en un diccionario
-        response = response.json()
+            # Convierte la respuesta de la API de NEXUS PJ en un diccionario
+            response = response.json()
+
+        # Guarda la respuesta en caché
+        if usar_cache:
+            obtener_cache().guardar(clave, response)
     except:
         # Informa del error
         logger.error(
@@ -46,3 +108,101 @@ def consulta_nexus(palabras_clave):
     finally:
         # Retorna la respuesta
         return response
+
+
+# Función para consultar varias páginas de NEXUS PJ de forma concurrente
+def cosechar_nexus(
+        palabras_clave,
+        paginas=1,
+        max_hits=None,
+        tamano=10,
+        max_concurrencia=MAX_CONCURRENCIA,
+        url=URL_NEXUS,
+        usar_cache=True,
+):
+    # Si se indica un número objetivo de hits, se calcula el número de páginas
+    if max_hits is not None:
+        paginas = math.ceil(max_hits / tamano)
+
+    entregados = 0
+    with ThreadPoolExecutor(max_workers=max_concurrencia) as executor:
+        # Se envían todas las páginas; el executor limita cuántas corren a la vez
+        futuros = [
+            executor.submit(
+                consulta_nexus, palabras_clave, tamano, pagina, url, usar_cache
+            )
+            for pagina in range(1, paginas + 1)
+        ]
+        try:
+            # Se esperan las páginas en orden para retornar los hits en el orden de NEXUS PJ
+            for pagina, futuro in enumerate(futuros, start=1):
+                response = futuro.result()
+                if response is None:
+                    raise ConnectionError(
+                        "No se pudo obtener la página " + str(pagina) + " de NEXUS PJ"
+                    )
+                hits = response["hits"]
+                for hit in hits:
+                    if max_hits is not None and entregados >= max_hits:
+                        return
+                    entregados += 1
+                    yield hit
+                # Una página incompleta indica que no hay más resultados
+                if len(hits) < tamano:
+                    return
+        finally:
+            # Se cancelan las páginas pendientes si se detuvo la cosecha
+            for futuro in futuros:
+                futuro.cancel()
+            logger.info("Hits obtenidos de NEXUS PJ: " + str(entregados))
+
+
+# Función para consultar varias subconsultas de forma concurrente y unir sus hits,
+# sin repetir sentencias (por "idDocument")
+def cosechar_subconsultas(
+        subconsultas,
+        paginas=1,
+        max_hits=None,
+        max_concurrencia=MAX_CONCURRENCIA,
+        url=URL_NEXUS,
+        usar_cache=True,
+):
+    if not subconsultas:
+        return
+    # La concurrencia se reparte entre las subconsultas para no superar max_concurrencia
+    # consultas simultáneas a la API en total
+    trabajadores = min(max_concurrencia, len(subconsultas))
+    concurrencia_por_subconsulta = max(1, max_concurrencia // trabajadores)
+    with ThreadPoolExecutor(max_workers=trabajadores) as executor:
+        resultados = list(
+            executor.map(
+                lambda subconsulta: list(
+                    cosechar_nexus(
+                        subconsulta, paginas, max_hits,
+                        max_concurrencia=concurrencia_por_subconsulta, url=url, usar_cache=usar_cache,
+                    )
+                ),
+                subconsultas,
+            )
+        )
+
+    # Se intercalan los hits por posición para que los primeros de cada subconsulta vayan antes
+    hits = []
+    vistos = set()
+    duplicados = 0
+    for posicion in range(max(len(resultado) for resultado in resultados)):
+        for resultado in resultados:
+            if max_hits is not None and len(hits) >= max_hits:
+                break
+            if posicion < len(resultado):
+                if resultado[posicion]["idDocument"] in vistos:
+                    duplicados += 1
+                else:
+                    vistos.add(resultado[posicion]["idDocument"])
+                    hits.append(resultado[posicion])
+    metricas.incrementar("hits_duplicados", duplicados)
+    logger.info(
+        "Subconsultas a NEXUS PJ: %d, hits únicos: %d, duplicados: %d",
+        len(subconsultas), len(hits), duplicados,
+    )
+    yield from hits
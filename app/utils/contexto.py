@@ -0,0 +1,166 @@
+import math
+import re
+from collections import Counter
+
+from .indice_lexico import tokenizar
+from .logs import logger
+
+"""
+    Empaquetado del contexto que se envía al LLM dentro de un presupuesto de tokens.
+    - contar_tokens: cuenta tokens con el tokenizador de LlamaIndex (o una aproximación).
+    - empaquetar_contexto: poda cada nodo por oraciones, conservando las más relevantes para la
+      consulta (BM25 sobre las oraciones de los nodos recuperados), elimina los pasajes repetidos
+      entre nodos y deja como metadatos para el LLM solo la cita (ID_Sentencia y Expediente).
+      Si la oración más relevante no cabe en el presupuesto se recorta en lugar de descartarla,
+      de modo que el contexto nunca queda vacío.
+"""
+
+# Metadatos que se mantienen en el contexto del LLM para citar la sentencia
+METADATOS_CITA = ("ID_Sentencia", "Expediente")
+
+# Fin de oración: punto, signo de cierre o punto y coma seguido de espacio o salto de línea
+_PATRON_ORACION = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+# Palabras vacías que no aportan a la relevancia de una oración (solo para el puntaje; una
+# oración se considera repetida únicamente si todo su texto coincide, incluida la negación)
+_PALABRAS_VACIAS = frozenset(
+    "a al con de del el en es la las lo los no o para por que se su sus un una y".split()
+)
+
+# Mínimo de tokens que se conservan al recortar la oración más relevante
+MIN_TOKENS_RECORTE = 32
+
+_tokenizador = None
+
+
+# Función para contar los tokens de un texto
+def contar_tokens(texto):
+    global _tokenizador
+    if _tokenizador is None:
+        try:
+            from llama_index.core.utils import get_tokenizer
+
+            _tokenizador = get_tokenizer()
+        except Exception as e:
+            # Sin tokenizador se aproxima con cuatro caracteres por token
+            logger.warning("No se pudo cargar el tokenizador, se usará una aproximación: " + str(e))
+            _tokenizador = lambda texto: range(len(texto) // 4 + 1)
+    return len(_tokenizador(texto))
+
+
+# Función para partir un texto en oraciones no vacías
+def partir_oraciones(texto):
+    return [oracion.strip() for oracion in _PATRON_ORACION.split(texto) if oracion.strip()]
+
+
+# Función para obtener los términos de una oración que cuentan para la relevancia
+def _terminos(texto):
+    return [token for token in tokenizar(texto) if token not in _PALABRAS_VACIAS]
+
+
+# Función para recortar un texto por palabras a un máximo de tokens
+def _recortar(texto, max_tokens):
+    palabras = texto.split()
+    inferior, superior = 0, len(palabras)
+    while inferior < superior:
+        medio = (inferior + superior + 1) // 2
+        if contar_tokens(" ".join(palabras[:medio])) <= max_tokens:
+            inferior = medio
+        else:
+            superior = medio - 1
+    return " ".join(palabras[:inferior])
+
+
+# Función para podar los nodos recuperados a un presupuesto de tokens
+def empaquetar_contexto(consulta, retrieved_nodes, presupuesto_tokens=1024, k1=1.2, b=0.75):
+    from llama_index.core.schema import MetadataMode, NodeWithScore, TextNode
+
+    tokens_antes = sum(
+        contar_tokens(node.node.get_content(metadata_mode=MetadataMode.LLM)) for node in retrieved_nodes
+    )
+
+    # Oraciones de todos los nodos, sin repetir pasajes ya vistos en un nodo anterior
+    oraciones = []
+    vistas = set()
+    repetidas = 0
+    for posicion, node in enumerate(retrieved_nodes):
+        for orden, oracion in enumerate(partir_oraciones(node.node.get_content())):
+            terminos = _terminos(oracion)
+            clave = " ".join(tokenizar(oracion))
+            if not clave:
+                continue
+            if clave in vistas:
+                repetidas += 1
+                continue
+            vistas.add(clave)
+            oraciones.append({"nodo": posicion, "orden": orden, "texto": oracion, "terminos": terminos})
+
+    # Puntaje BM25 de cada oración frente a la consulta, con las oraciones como colección
+    consulta_terminos = set(_terminos(consulta))
+    frecuencia_documental = Counter()
+    for oracion in oraciones:
+        frecuencia_documental.update(set(oracion["terminos"]) & consulta_terminos)
+    longitud_media = sum(len(o["terminos"]) for o in oraciones) / (len(oraciones) or 1)
+    for oracion in oraciones:
+        frecuencias = Counter(oracion["terminos"])
+        puntaje = 0.0
+        for termino in consulta_terminos:
+            tf = frecuencias.get(termino, 0)
+            if tf:
+                df = frecuencia_documental[termino]
+                idf = math.log(1 + (len(oraciones) - df + 0.5) / (df + 0.5))
+                puntaje += idf * tf * (k1 + 1) / (
+                    tf + k1 * (1 - b + b * len(oracion["terminos"]) / longitud_media)
+                )
+        # A igual relevancia se prefieren las oraciones de los nodos mejor rankeados
+        oracion["puntaje"] = puntaje - 1e-3 * oracion["nodo"]
+        oracion["tokens"] = contar_tokens(oracion["texto"])
+
+    # Se reservan los tokens de la cita de cada nodo y se eligen las mejores oraciones
+    citas = [
+        {clave: node.node.metadata[clave] for clave in METADATOS_CITA if clave in node.node.metadata}
+        for node in retrieved_nodes
+    ]
+    disponibles = presupuesto_tokens - sum(contar_tokens(str(cita)) for cita in citas)
+    elegidas = []
+    recortada = False
+    for oracion in sorted(oraciones, key=lambda o: -o["puntaje"]):
+        if oracion["tokens"] <= disponibles:
+            elegidas.append(oracion)
+            disponibles -= oracion["tokens"]
+        elif not recortada and (not elegidas or disponibles >= MIN_TOKENS_RECORTE):
+            # La oración que no cabe se recorta a lo que queda del presupuesto (si no se eligió
+            # ninguna, se conserva al menos MIN_TOKENS_RECORTE aunque las citas lo excedan)
+            texto = _recortar(oracion["texto"], max(disponibles, MIN_TOKENS_RECORTE))
+            if texto:
+                elegidas.append(dict(oracion, texto=texto))
+                disponibles -= contar_tokens(texto)
+                recortada = True
+
+    # Se rearma cada nodo con sus oraciones elegidas en el orden original
+    empaquetados = []
+    for posicion, node in enumerate(retrieved_nodes):
+        texto = " ".join(
+            o["texto"] for o in sorted(elegidas, key=lambda o: o["orden"]) if o["nodo"] == posicion
+        )
+        if not texto:
+            continue
+        metadatos = citas[posicion]
+        empaquetados.append(
+            NodeWithScore(
+                node=TextNode(id_=node.node.node_id, text=texto, metadata=metadatos),
+                score=node.score,
+            )
+        )
+
+    tokens_despues = sum(
+        contar_tokens(node.node.get_content(metadata_mode=MetadataMode.LLM)) for node in empaquetados
+    )
+    return empaquetados, {
+        "tokens_antes": tokens_antes,
+        "tokens_despues": tokens_despues,
+        "oraciones": len(oraciones),
+        "oraciones_elegidas": len(elegidas),
+        "oraciones_repetidas": repetidas,
+        "recortada": recortada,
+    }
@@ -0,0 +1,151 @@
+import re
+
+"""
+    Filtros de metadatos para la búsqueda (despacho, tipo de información y rango de fechas).
+    - fecha_a_numero: convierte la fecha de una sentencia a un entero AAAAMMDD comparable.
+    - parsear_filtros: interpreta los filtros escritos por el usuario.
+    - construir_filtro: traduce los filtros a una cláusula "where" de Chroma.
+    - combinar_filtros: une varias cláusulas "where" con $and.
+    - rango_anios: retorna los años extremos del rango de fechas (para elegir particiones).
+    - cumple_filtro: evalúa una cláusula "where" sobre los metadatos de un nodo.
+"""
+
+# Formatos de fecha: AAAA-MM-DD (con o sin hora) y DD/MM/AAAA
+_PATRON_FECHA_ISO = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+_PATRON_FECHA_DMA = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")
+
+# Nombres aceptados para cada filtro en el texto del usuario
+_ALIAS = {
+    "despacho": "despacho",
+    "tribunal": "despacho",
+    "tipo": "tipo",
+    "desde": "desde",
+    "hasta": "hasta",
+    "anio": "anio",
+    "año": "anio",
+}
+
+
+# Función para convertir una fecha a un entero AAAAMMDD; retorna None si no se reconoce
+def fecha_a_numero(fecha):
+    if fecha is None:
+        return None
+    fecha = str(fecha)
+    coincidencia = _PATRON_FECHA_ISO.search(fecha)
+    if coincidencia:
+        anio, mes, dia = coincidencia.groups()
+    else:
+        coincidencia = _PATRON_FECHA_DMA.search(fecha)
+        if not coincidencia:
+            return None
+        dia, mes, anio = coincidencia.groups()
+    return int(anio) * 10000 + int(mes) * 100 + int(dia)
+
+
+# Función para convertir el límite de un rango (año o fecha completa) a AAAAMMDD
+def _limite_fecha(valor, final=False):
+    valor = str(valor).strip()
+    if re.fullmatch(r"\d{4}", valor):
+        return int(valor) * 10000 + (1231 if final else 101)
+    numero = fecha_a_numero(valor)
+    if numero is None:
+        raise ValueError("Fecha no reconocida: " + valor)
+    return numero
+
+
+# Función para interpretar filtros como "despacho=Sala Constitucional; desde=2015; hasta=2020"
+def parsear_filtros(texto):
+    filtros = {}
+    for parte in texto.split(";"):
+        if not parte.strip():
+            continue
+        if "=" not in parte:
+            raise ValueError("Filtro inválido: " + parte.strip())
+        nombre, valor = (x.strip() for x in parte.split("=", 1))
+        if nombre.lower() not in _ALIAS:
+            raise ValueError("Filtro desconocido: " + nombre)
+        filtros[_ALIAS[nombre.lower()]] = valor
+    # "anio" es un atajo para desde y hasta el mismo año
+    if "anio" in filtros:
+        anio = filtros.pop("anio")
+        filtros.setdefault("desde", anio)
+        filtros.setdefault("hasta", anio)
+    # Se validan las fechas aquí para que un error se reporte al ingresar los filtros
+    desde, hasta = (
+        _limite_fecha(filtros[clave], final=clave == "hasta") if filtros.get(clave) else None
+        for clave in ("desde", "hasta")
+    )
+    if desde is not None and hasta is not None and desde > hasta:
+        raise ValueError("El rango de fechas es inválido: desde es posterior a hasta")
+    return filtros
+
+
+# Función para traducir los filtros a una cláusula "where" de Chroma (None si no hay filtros)
+def construir_filtro(filtros):
+    if not filtros:
+        return None
+    clausulas = []
+    if filtros.get("despacho"):
+        clausulas.append({"Despacho": {"$eq": filtros["despacho"]}})
+    if filtros.get("tipo"):
+        clausulas.append({"Tipo de Información": {"$eq": filtros["tipo"]}})
+    if filtros.get("desde"):
+        clausulas.append({"Fecha_Num": {"$gte": _limite_fecha(filtros["desde"])}})
+    if filtros.get("hasta"):
+        clausulas.append({"Fecha_Num": {"$lte": _limite_fecha(filtros["hasta"], final=True)}})
+    if not clausulas:
+        return None
+    return clausulas[0] if len(clausulas) == 1 else {"$and": clausulas}
+
+
+# Función para obtener los años (desde, hasta) del rango de fechas; None si no está acotado
+def rango_anios(filtros):
+    filtros = filtros or {}
+    desde = _limite_fecha(filtros["desde"]) // 10000 if filtros.get("desde") else None
+    hasta = _limite_fecha(filtros["hasta"], final=True) // 10000 if filtros.get("hasta") else None
+    return desde, hasta
+
+
+# Función para unir cláusulas "where" con $and, ignorando las vacías (None si no queda ninguna)
+def combinar_filtros(*filtros):
+    clausulas = []
+    for filtro in filtros:
+        if not filtro:
+            continue
+        clausulas.extend(filtro["$and"] if "$and" in filtro else [filtro])
+    if not clausulas:
+        return None
+    return clausulas[0] if len(clausulas) == 1 else {"$and": clausulas}
+
+
+# Función para evaluar una cláusula "where" de Chroma sobre unos metadatos
+def cumple_filtro(metadatos, where):
+    if not where:
+        return True
+    if "$and" in where:
+        return all(cumple_filtro(metadatos, clausula) for clausula in where["$and"])
+    if "$or" in where:
+        return any(cumple_filtro(metadatos, clausula) for clausula in where["$or"])
+    for campo, condicion in where.items():
+        valor = metadatos.get(campo)
+        if not isinstance(condicion, dict):
+            condicion = {"$eq": condicion}
+        for operador, esperado in condicion.items():
+            if operador == "$eq" and valor != esperado:
+                return False
+            if operador == "$ne" and valor == esperado:
+                return False
+            if operador == "$in" and valor not in esperado:
+                return False
+            if operador in ("$gt", "$gte", "$lt", "$lte"):
+                if valor is None:
+                    return False
+                if operador == "$gt" and not valor > esperado:
+                    return False
+                if operador == "$gte" and not valor >= esperado:
+                    return False
+                if operador == "$lt" and not valor < esperado:
+                    return False
+                if operador == "$lte" and not valor <= esperado:
+                    return False
+    return True
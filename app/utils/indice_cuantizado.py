@@ -0,0 +1,282 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from .logs import logger
+
+"""
+    Índice de vectores comprimidos para una primera búsqueda aproximada sobre la colección.
+    - IndiceCuantizado: guarda los embeddings normalizados en float16 (2 bytes por dimensión) o
+      en int8 con una escala por vector (1 byte por dimensión) en archivos mapeados en memoria,
+      una copia float32 en disco para repuntuar y un índice SQLite pequeño (posición -> ID).
+    - buscar: puntúa todos los vectores por bloques (similitud coseno aproximada) y retorna los
+      mejores candidatos.
+    - buscar_repuntuado: vuelve a puntuar los candidatos leyendo solo sus filas del archivo
+      float32, sin abrir el segmento de vectores de Chroma.
+    - recall_en_k: compara los resultados aproximados con los de la búsqueda exacta.
+"""
+
+# Tipos de cuantización soportados
+TIPOS = ("float16", "int8")
+
+# Número de vectores que se puntúan a la vez (acota la memoria temporal de la búsqueda)
+TAMANO_BLOQUE = 4096
+
+
+# Función para normalizar vectores por fila (similitud coseno como producto punto)
+def normalizar_filas(vectores):
+    vectores = np.asarray(vectores, dtype=np.float32)
+    normas = np.linalg.norm(vectores, axis=-1, keepdims=True)
+    return vectores / np.where(normas == 0, 1.0, normas)
+
+
+# Función para calcular la fracción de los k resultados exactos que recupera la búsqueda aproximada
+def recall_en_k(exactos, aproximados, k):
+    exactos = set(list(exactos)[:k])
+    return len(exactos & set(list(aproximados)[:k])) / len(exactos) if exactos else 1.0
+
+
+class IndiceCuantizado:
+    def __init__(self, ruta, tipo="int8"):
+        if tipo not in TIPOS:
+            raise ValueError("Tipo de cuantización no soportado: " + str(tipo))
+        self.ruta = ruta
+        self.tipo = tipo
+        self.dimension = None
+        self._vectores = None
+        self._escalas = None
+        self._archivo_completos = None
+        self._cantidad_mapeada = 0
+        self._lock = threading.RLock()
+
+        os.makedirs(ruta, exist_ok=True)
+        self._conexion = sqlite3.connect(os.path.join(ruta, "indice.db"), check_same_thread=False)
+        self._conexion.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS posiciones (
+                posicion INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS meta (nombre TEXT PRIMARY KEY, valor TEXT);
+            """
+        )
+        self._conexion.commit()
+        meta = dict(self._conexion.execute("SELECT nombre, valor FROM meta").fetchall())
+        if "dimension" in meta:
+            if meta["tipo"] != tipo:
+                raise ValueError(
+                    "El índice en " + ruta + " es de tipo " + meta["tipo"] + ", no " + tipo
+                )
+            self.dimension = int(meta["dimension"])
+        self._cantidad = self._conexion.execute("SELECT COUNT(*) FROM posiciones").fetchone()[0]
+        # Se descartan los vectores escritos sin su posición (escritura interrumpida)
+        if self.dimension is not None:
+            self._truncar(self._ruta_vectores(), self._cantidad * self.dimension * self._bytes_elemento())
+            if tipo == "int8":
+                self._truncar(self._ruta_escalas(), self._cantidad * 4)
+            self._truncar(self._ruta_completos(), self._cantidad * self.dimension * 4)
+            # Un índice creado sin la copia float32 se vacía para que se vuelva a sincronizar
+            tamano = os.path.getsize(self._ruta_completos()) if os.path.exists(self._ruta_completos()) else 0
+            if tamano < self._cantidad * self.dimension * 4:
+                logger.warning("El índice en %s no tiene los vectores float32, se reconstruirá", ruta)
+                self._conexion.execute("DELETE FROM posiciones")
+                self._conexion.commit()
+                self._cantidad = 0
+                for archivo in (self._ruta_vectores(), self._ruta_escalas(), self._ruta_completos()):
+                    self._truncar(archivo, 0)
+
+    @staticmethod
+    def _truncar(ruta, tamano):
+        if os.path.exists(ruta) and os.path.getsize(ruta) > tamano:
+            with open(ruta, "r+b") as f:
+                f.truncate(tamano)
+
+    def _ruta_vectores(self):
+        return os.path.join(self.ruta, "vectores." + self.tipo)
+
+    def _ruta_escalas(self):
+        return os.path.join(self.ruta, "escalas.f32")
+
+    def _ruta_completos(self):
+        return os.path.join(self.ruta, "completos.f32")
+
+    def _bytes_elemento(self):
+        return 2 if self.tipo == "float16" else 1
+
+    # Retorna el número de vectores indexados
+    def contar(self):
+        return self._cantidad
+
+    # Retorna los bytes que ocupan los vectores comprimidos
+    def bytes_vectores(self):
+        if self.dimension is None:
+            return 0
+        return self._cantidad * (self.dimension * self._bytes_elemento() + (4 if self.tipo == "int8" else 0))
+
+    # Retorna los IDs ya indexados de una lista de IDs
+    def existentes(self, ids):
+        encontrados = set()
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                lote = ids[i:i + 500]
+                encontrados.update(
+                    fila[0] for fila in self._conexion.execute(
+                        "SELECT id FROM posiciones WHERE id IN (" + ",".join("?" * len(lote)) + ")",
+                        lote,
+                    )
+                )
+        return encontrados
+
+    # Comprime y agrega los embeddings de los IDs que aún no están indexados
+    def agregar(self, ids, embeddings):
+        if not ids:
+            return 0
+        with self._lock:
+            existentes = self.existentes(list(ids))
+            pares = []
+            for id_, embedding in zip(ids, embeddings):
+                if id_ not in existentes:
+                    existentes.add(id_)
+                    pares.append((id_, embedding))
+            if not pares:
+                return 0
+            vectores = normalizar_filas([embedding for _, embedding in pares])
+            if self.dimension is None:
+                self._conexion.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [("dimension", str(vectores.shape[1])), ("tipo", self.tipo)],
+                )
+            # Primero se registran las posiciones (sin confirmar) y luego se escriben los vectores;
+            # si algo falla se deshace la inserción y el archivo no se modifica
+            try:
+                self._conexion.executemany(
+                    "INSERT INTO posiciones VALUES (?, ?)",
+                    [(self._cantidad + i, id_) for i, (id_, _) in enumerate(pares)],
+                )
+                if self.tipo == "float16":
+                    datos_vectores = vectores.astype(np.float16).tobytes()
+                    datos_escalas = None
+                else:
+                    # Cuantización simétrica por vector: el mayor valor absoluto se lleva a 127
+                    escalas = np.abs(vectores).max(axis=1) / 127.0
+                    escalas[escalas == 0] = 1.0
+                    datos_vectores = np.round(vectores / escalas[:, None]).astype(np.int8).tobytes()
+                    datos_escalas = escalas.astype(np.float32).tobytes()
+                with open(self._ruta_vectores(), "ab") as f:
+                    f.write(datos_vectores)
+                if datos_escalas is not None:
+                    with open(self._ruta_escalas(), "ab") as f:
+                        f.write(datos_escalas)
+                with open(self._ruta_completos(), "ab") as f:
+                    f.write(vectores.tobytes())
+                self._conexion.commit()
+            except Exception:
+                self._conexion.rollback()
+                # Se descartan los bytes que alcanzaron a escribirse
+                if self.dimension is not None or os.path.exists(self._ruta_vectores()):
+                    dimension = self.dimension or vectores.shape[1]
+                    self._truncar(self._ruta_vectores(), self._cantidad * dimension * self._bytes_elemento())
+                    if self.tipo == "int8":
+                        self._truncar(self._ruta_escalas(), self._cantidad * 4)
+                    self._truncar(self._ruta_completos(), self._cantidad * dimension * 4)
+                raise
+            self.dimension = vectores.shape[1]
+            self._cantidad += len(pares)
+        return len(pares)
+
+    # Mapea en memoria los archivos de vectores (se vuelve a mapear si se agregaron vectores)
+    def _mapear(self):
+        if self._cantidad_mapeada != self._cantidad:
+            dtype = np.float16 if self.tipo == "float16" else np.int8
+            self._vectores = np.memmap(
+                self._ruta_vectores(), dtype=dtype, mode="r", shape=(self._cantidad, self.dimension)
+            )
+            if self.tipo == "int8":
+                self._escalas = np.memmap(
+                    self._ruta_escalas(), dtype=np.float32, mode="r", shape=(self._cantidad,)
+                )
+            self._cantidad_mapeada = self._cantidad
+        return self._vectores, self._escalas
+
+    # Retorna los IDs de una lista de posiciones
+    def _ids(self, posiciones):
+        with self._lock:
+            return dict(
+                self._conexion.execute(
+                    "SELECT posicion, id FROM posiciones WHERE posicion IN ("
+                    + ",".join("?" * len(posiciones)) + ")",
+                    posiciones,
+                ).fetchall()
+            )
+
+    # Retorna los IDs y las similitudes aproximadas de los top_k vectores más parecidos
+    def buscar(self, embedding, top_k=100):
+        posiciones, puntajes = self._candidatos(normalizar_filas(embedding), top_k)
+        ids = self._ids(posiciones)
+        return [(ids[posicion], puntaje) for posicion, puntaje in zip(posiciones, puntajes)]
+
+    # Lee las filas float32 de unas posiciones con lecturas puntuales; el archivo no se mapea en
+    # memoria para que el sistema no cargue en el proceso páginas de otras filas
+    def _leer_completos(self, posiciones):
+        tamano_fila = self.dimension * 4
+        filas = np.empty((len(posiciones), self.dimension), dtype=np.float32)
+        with self._lock:
+            if self._archivo_completos is None:
+                # Sin búfer, para no leer datos viejos si una escritura fallida se trunca
+                self._archivo_completos = open(self._ruta_completos(), "rb", buffering=0)
+            for i, posicion in enumerate(posiciones):
+                self._archivo_completos.seek(posicion * tamano_fila)
+                filas[i] = np.frombuffer(self._archivo_completos.read(tamano_fila), dtype=np.float32)
+        return filas
+
+    # Retorna los IDs y las similitudes exactas de los candidatos de la búsqueda aproximada,
+    # ordenados de mayor a menor; solo se leen del disco las filas float32 de los candidatos
+    def buscar_repuntuado(self, embedding, candidatos=100):
+        consulta = normalizar_filas(embedding)
+        posiciones, _ = self._candidatos(consulta, candidatos)
+        if not posiciones:
+            return []
+        ids = self._ids(posiciones)
+        # Se leen en orden de posición para recorrer el archivo hacia adelante
+        posiciones = sorted(posiciones)
+        puntajes = self._leer_completos(posiciones) @ consulta
+        return [
+            (ids[posiciones[i]], float(puntajes[i])) for i in np.argsort(-puntajes).tolist()
+        ]
+
+    # Retorna las posiciones y similitudes aproximadas de los top_k vectores más parecidos
+    def _candidatos(self, consulta, top_k):
+        with self._lock:
+            if not self._cantidad:
+                return [], []
+            vectores, escalas = self._mapear()
+        mejores_posiciones = np.empty(0, dtype=np.int64)
+        mejores_puntajes = np.empty(0, dtype=np.float32)
+        for inicio in range(0, len(vectores), TAMANO_BLOQUE):
+            bloque = vectores[inicio:inicio + TAMANO_BLOQUE]
+            puntajes = bloque.astype(np.float32) @ consulta
+            if escalas is not None:
+                puntajes *= escalas[inicio:inicio + TAMANO_BLOQUE]
+            # Se conservan solo los top_k acumulados para no guardar todos los puntajes
+            posiciones = np.arange(inicio, inicio + len(bloque))
+            mejores_posiciones = np.concatenate([mejores_posiciones, posiciones])
+            mejores_puntajes = np.concatenate([mejores_puntajes, puntajes])
+            if len(mejores_puntajes) > top_k:
+                seleccion = np.argpartition(-mejores_puntajes, top_k)[:top_k]
+                mejores_posiciones = mejores_posiciones[seleccion]
+                mejores_puntajes = mejores_puntajes[seleccion]
+        orden = np.argsort(-mejores_puntajes)
+        return mejores_posiciones[orden].tolist(), mejores_puntajes[orden].tolist()
+
+
+# Función para registrar en el log el tamaño del índice frente al float32 original
+def reportar_tamano(indice):
+    if indice.dimension is None:
+        return
+    original = indice.contar() * indice.dimension * 4
+    logger.info(
+        "Índice %s: %d vectores, %.1f MB mapeados en memoria (copia float32 en disco: %.1f MB)",
+        indice.tipo, indice.contar(), indice.bytes_vectores() / 2 ** 20, original / 2 ** 20,
+    )
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+
+import numpy as np
+
+from .logs import logger
+
+"""
+    Índice a nivel de sentencia: un vector por ID_Sentencia, promedio de los embeddings
+    normalizados de sus chunks, guardado en una colección de Chroma aparte.
+    - agregar: incorpora chunks nuevos actualizando el promedio de cada sentencia.
+    - buscar: retorna las sentencias más parecidas a la consulta, para luego buscar y rerankear
+      chunks solo dentro de ellas.
+    - completar: incorpora los chunks de la colección que el índice aún no incluye.
+    - reconstruir: vuelve a calcular todos los promedios desde la colección de chunks.
+    Los IDs de los chunks incorporados y la suma sin normalizar de los vectores de cada sentencia
+    se guardan en un archivo SQLite junto a la base: así no se suma dos veces el mismo chunk y el
+    promedio se actualiza con exactitud (Chroma normaliza los vectores del espacio coseno, por lo
+    que el promedio guardado en la colección no permite recuperar la suma).
+"""
+
+# Metadatos de la sentencia que se copian de sus chunks (permiten aplicar los mismos filtros)
+METADATOS_DOCUMENTO = (
+    "ID_Sentencia", "Despacho", "Expediente", "Tipo de Información", "Fecha", "Fecha_Num",
+)
+
+
+class IndiceDocumentos:
+    def __init__(self, coleccion, ruta_estado):
+        self.coleccion = coleccion
+        self.ruta_estado = ruta_estado
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta_estado, check_same_thread=False)
+        self._conexion.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY)")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS sumas (id_sentencia TEXT PRIMARY KEY, suma BLOB NOT NULL, "
+            "chunks INTEGER NOT NULL)"
+        )
+        self._conexion.commit()
+
+    # Retorna el número de chunks incorporados (para saber si falta sincronizar)
+    def contar_chunks(self):
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    # Retorna el número de sentencias con su suma guardada (un archivo anterior no las tiene)
+    def contar_sumas(self):
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM sumas").fetchone()[0]
+
+    # Retorna los IDs ya incorporados de una lista de IDs de chunks
+    def _incorporados(self, ids):
+        encontrados = set()
+        for i in range(0, len(ids), 500):
+            lote = ids[i:i + 500]
+            encontrados.update(
+                fila[0] for fila in self._conexion.execute(
+                    "SELECT id FROM chunks WHERE id IN (" + ",".join("?" * len(lote)) + ")", lote
+                )
+            )
+        return encontrados
+
+    # Retorna la suma de vectores y el número de chunks guardados de una lista de sentencias
+    def _sumas(self, ids):
+        sumas = {}
+        for i in range(0, len(ids), 500):
+            lote = ids[i:i + 500]
+            for id_sentencia, suma, chunks in self._conexion.execute(
+                "SELECT id_sentencia, suma, chunks FROM sumas WHERE id_sentencia IN ("
+                + ",".join("?" * len(lote)) + ")",
+                lote,
+            ):
+                sumas[id_sentencia] = (np.frombuffer(suma, dtype=np.float32), chunks)
+        return sumas
+
+    # Retorna el número de sentencias indexadas
+    def contar(self):
+        return self.coleccion.count()
+
+    # Incorpora chunks con embedding que aún no estén incluidos: suma sus vectores por sentencia
+    # y actualiza los promedios. Retorna el número de sentencias actualizadas
+    def agregar(self, nodes):
+        with self._lock:
+            return self._agregar(nodes)
+
+    def _agregar(self, nodes):
+        grupos = {}
+        incorporados = self._incorporados([node.node_id for node in nodes])
+        nuevos = []
+        for node in nodes:
+            id_sentencia = node.metadata.get("ID_Sentencia")
+            if id_sentencia is None or node.embedding is None or node.node_id in incorporados:
+                continue
+            incorporados.add(node.node_id)
+            nuevos.append(node.node_id)
+            vector = np.asarray(node.embedding, dtype=np.float32)
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+            if id_sentencia in grupos:
+                grupos[id_sentencia][0] += vector
+                grupos[id_sentencia][1] += 1
+            else:
+                metadatos = {
+                    clave: node.metadata[clave]
+                    for clave in METADATOS_DOCUMENTO if clave in node.metadata
+                }
+                grupos[id_sentencia] = [vector, 1, metadatos]
+        if not grupos:
+            return 0
+
+        ids = [str(id_sentencia) for id_sentencia in grupos]
+        grupos = dict(zip(ids, grupos.values()))
+        # Se parte de la suma sin normalizar guardada, no del promedio de Chroma
+        for id_sentencia, (suma, chunks) in self._sumas(ids).items():
+            grupos[id_sentencia][0] += suma
+            grupos[id_sentencia][1] += chunks
+
+        self.coleccion.upsert(
+            ids=ids,
+            embeddings=[(grupos[i][0] / grupos[i][1]).tolist() for i in ids],
+            metadatas=[dict(grupos[i][2], chunks=grupos[i][1]) for i in ids],
+        )
+        self._conexion.executemany(
+            "INSERT OR REPLACE INTO sumas VALUES (?, ?, ?)",
+            [(i, grupos[i][0].astype(np.float32).tobytes(), grupos[i][1]) for i in ids],
+        )
+        self._conexion.executemany("INSERT INTO chunks VALUES (?)", [(id_,) for id_ in nuevos])
+        self._conexion.commit()
+        return len(ids)
+
+    # Retorna las sentencias (ID, similitud) más parecidas a un embedding de consulta
+    def buscar(self, embedding, top_k=10, filtro=None):
+        if not self.contar():
+            return []
+        resultado = self.coleccion.query(
+            query_embeddings=[list(embedding)],
+            n_results=min(top_k, self.contar()),
+            where=filtro,
+            include=["distances"],
+        )
+        # En el espacio coseno de Chroma la distancia es 1 - similitud
+        return [
+            (id_sentencia, 1.0 - distancia)
+            for id_sentencia, distancia in zip(resultado["ids"][0], resultado["distances"][0])
+        ]
+
+    # Incorpora los chunks de la colección de chunks que el índice aún no incluye
+    def completar(self, client_collection, lote=1000):
+        from llama_index.core.schema import TextNode
+
+        logger.info("Completando el índice de sentencias...")
+        for desplazamiento in range(0, client_collection.count(), lote):
+            resultado = client_collection.get(
+                include=["embeddings", "metadatas"], limit=lote, offset=desplazamiento
+            )
+            self.agregar([
+                TextNode(id_=node_id, text="", metadata=metadatos, embedding=list(embedding))
+                for node_id, embedding, metadatos in zip(
+                    resultado["ids"], resultado["embeddings"], resultado["metadatas"]
+                )
+            ])
+        logger.info("Índice de sentencias completado: %d sentencias", self.contar())
+
+    # Reconstruye el índice a partir de todos los chunks de la colección de chunks
+    def reconstruir(self, client_collection, lote=1000):
+        logger.info("Construyendo el índice de sentencias...")
+        ids = self.coleccion.get(include=[])["ids"]
+        if ids:
+            self.coleccion.delete(ids=ids)
+        with self._lock:
+            self._conexion.execute("DELETE FROM chunks")
+            self._conexion.execute("DELETE FROM sumas")
+            self._conexion.commit()
+        self.completar(client_collection, lote)
+        logger.info("Índice de sentencias construido: %d sentencias", self.contar())
@@ -0,0 +1,263 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+from .filtros import cumple_filtro, fecha_a_numero, rango_anios
+
+"""
+    Índice invertido BM25 persistido en SQLite junto a la colección de Chroma.
+    También mantiene conteos de chunks por despacho, año y tipo de información para
+    estimar la selectividad de los filtros de metadatos.
+    - tokenizar: normaliza el texto y conserva identificadores (artículos, expedientes).
+    - es_identificador: detecta consultas que son solo identificadores exactos.
+    - IndiceBM25: índice incremental con búsqueda BM25.
+    - fusionar_rrf: fusiona listas de resultados con reciprocal rank fusion.
+"""
+
+# Tokens alfanuméricos; se mantienen unidos los identificadores con guiones, puntos o barras
+_PATRON_TOKEN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+# Identificadores exactos: expedientes (23-000123-0007-CO), IDs de sentencia y números con separadores
+_PATRON_IDENTIFICADOR = re.compile(r"^(?=.*\d)[a-z0-9]+(?:[-./][a-z0-9]+)+$")
+
+
+# Función para tokenizar un texto de forma consistente entre indexación y consulta
+def tokenizar(texto):
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _PATRON_TOKEN.findall(texto)
+
+
+# Función para saber si una consulta es solo uno o varios identificadores exactos
+def es_identificador(consulta):
+    tokens = tokenizar(consulta)
+    return (
+        bool(tokens)
+        and len(tokens) == len(consulta.split())
+        and all(_PATRON_IDENTIFICADOR.match(token) for token in tokens)
+    )
+
+
+# Función para fusionar listas ordenadas de NodeWithScore usando reciprocal rank fusion
+def fusionar_rrf(listas, k=60):
+    puntajes = defaultdict(float)
+    nodos = {}
+    for lista in listas:
+        for posicion, node in enumerate(lista):
+            node_id = node.node.node_id
+            puntajes[node_id] += 1.0 / (k + posicion + 1)
+            # Se conserva el primer nodo visto (el de la primera lista)
+            nodos.setdefault(node_id, node)
+    fusionados = []
+    for node_id in sorted(puntajes, key=lambda i: -puntajes[i]):
+        node = nodos[node_id]
+        node.score = puntajes[node_id]
+        fusionados.append(node)
+    return fusionados
+
+
+# Función para obtener la llave (despacho, año, tipo) de los conteos de metadatos
+def _clave_conteo(metadatos):
+    fecha = metadatos.get("Fecha_Num") or fecha_a_numero(metadatos.get("Fecha"))
+    return (
+        str(metadatos.get("Despacho", "")),
+        fecha // 10000 if fecha else 0,
+        str(metadatos.get("Tipo de Información", "")),
+    )
+
+
+class IndiceBM25:
+    def __init__(self, ruta, k1=1.2, b=0.75):
+        self.ruta = ruta
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documentos (
+                id TEXT PRIMARY KEY,
+                texto TEXT NOT NULL,
+                metadatos TEXT NOT NULL,
+                longitud INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                termino TEXT NOT NULL,
+                id TEXT NOT NULL,
+                tf INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_termino ON postings (termino);
+            CREATE TABLE IF NOT EXISTS conteos (
+                despacho TEXT NOT NULL,
+                anio INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                chunks INTEGER NOT NULL,
+                PRIMARY KEY (despacho, anio, tipo)
+            );
+            """
+        )
+        self._conexion.commit()
+        self._reconstruir_conteos()
+
+    # Recalcula los conteos de metadatos si el índice es anterior a ellos
+    def _reconstruir_conteos(self):
+        with self._lock:
+            if self._conexion.execute("SELECT COUNT(*) FROM conteos").fetchone()[0]:
+                return
+            conteos = Counter()
+            for (metadatos,) in self._conexion.execute("SELECT metadatos FROM documentos"):
+                conteos[_clave_conteo(json.loads(metadatos))] += 1
+            self._conexion.executemany(
+                "INSERT INTO conteos VALUES (?, ?, ?, ?)",
+                [(*clave, chunks) for clave, chunks in conteos.items()],
+            )
+            self._conexion.commit()
+
+    # Retorna el número de documentos indexados
+    def contar(self):
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM documentos").fetchone()[0]
+
+    # Retorna los IDs ya indexados de una lista de IDs
+    def existentes(self, ids):
+        encontrados = set()
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                lote = ids[i:i + 500]
+                encontrados.update(
+                    fila[0] for fila in self._conexion.execute(
+                        "SELECT id FROM documentos WHERE id IN (" + ",".join("?" * len(lote)) + ")",
+                        lote,
+                    )
+                )
+        return encontrados
+
+    # Agrega los nodos que aún no estén indexados
+    def agregar(self, nodes):
+        existentes = self.existentes([node.node_id for node in nodes])
+        documentos = []
+        postings = []
+        conteos = Counter()
+        for node in nodes:
+            if node.node_id in existentes:
+                continue
+            existentes.add(node.node_id)
+            # Los identificadores de la sentencia también se indexan para búsquedas exactas
+            tokens = tokenizar(
+                node.text + " " + str(node.metadata.get("Expediente", ""))
+                + " " + str(node.metadata.get("ID_Sentencia", ""))
+            )
+            documentos.append(
+                (node.node_id, node.text, json.dumps(node.metadata), len(tokens))
+            )
+            postings.extend(
+                (termino, node.node_id, tf) for termino, tf in Counter(tokens).items()
+            )
+            conteos[_clave_conteo(node.metadata)] += 1
+        with self._lock:
+            self._conexion.executemany("INSERT INTO documentos VALUES (?, ?, ?, ?)", documentos)
+            self._conexion.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+            self._conexion.executemany(
+                "INSERT INTO conteos VALUES (?, ?, ?, ?) ON CONFLICT (despacho, anio, tipo) "
+                "DO UPDATE SET chunks = chunks + excluded.chunks",
+                [(*clave, chunks) for clave, chunks in conteos.items()],
+            )
+            self._conexion.commit()
+        return len(documentos)
+
+    # Estima cuántos chunks cumplen los filtros (a nivel de año para el rango de fechas)
+    def estimar(self, filtros):
+        condiciones = []
+        valores = []
+        if filtros.get("despacho"):
+            condiciones.append("despacho = ?")
+            valores.append(filtros["despacho"])
+        if filtros.get("tipo"):
+            condiciones.append("tipo = ?")
+            valores.append(filtros["tipo"])
+        desde, hasta = rango_anios(filtros)
+        if desde is not None:
+            condiciones.append("anio >= ?")
+            valores.append(desde)
+        if hasta is not None:
+            condiciones.append("anio <= ?")
+            valores.append(hasta)
+        consulta = "SELECT COALESCE(SUM(chunks), 0) FROM conteos"
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        with self._lock:
+            return self._conexion.execute(consulta, valores).fetchone()[0]
+
+    # Retorna el resumen de chunks por despacho y año
+    def resumen_metadatos(self):
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT despacho, anio, SUM(chunks) FROM conteos "
+                "GROUP BY despacho, anio ORDER BY despacho, anio"
+            ).fetchall()
+
+    # Busca los documentos con mayor puntaje BM25 para la consulta
+    def buscar(self, consulta, top_k=10, filtro=None):
+        terminos = list(dict.fromkeys(tokenizar(consulta)))
+        if not terminos:
+            return []
+        puntajes = defaultdict(float)
+        with self._lock:
+            total, promedio = self._conexion.execute(
+                "SELECT COUNT(*), AVG(longitud) FROM documentos"
+            ).fetchone()
+            if not total:
+                return []
+            for termino in terminos:
+                filas = self._conexion.execute(
+                    "SELECT p.id, p.tf, d.longitud FROM postings p "
+                    "JOIN documentos d ON d.id = p.id WHERE p.termino = ?",
+                    (termino,),
+                ).fetchall()
+                if not filas:
+                    continue
+                idf = math.log(1 + (total - len(filas) + 0.5) / (len(filas) + 0.5))
+                for node_id, tf, longitud in filas:
+                    puntajes[node_id] += idf * tf * (self.k1 + 1) / (
+                        tf + self.k1 * (1 - self.b + self.b * longitud / promedio)
+                    )
+        mejores = sorted(puntajes.items(), key=lambda par: -par[1])
+        if filtro is None:
+            return self._a_nodos(mejores[:top_k])
+        # Con filtro, se revisan los candidatos en orden hasta completar top_k
+        nodos = []
+        for i in range(0, len(mejores), 200):
+            candidatos = self._a_nodos(mejores[i:i + 200])
+            nodos.extend(node for node in candidatos if cumple_filtro(node.node.metadata, filtro))
+            if len(nodos) >= top_k:
+                break
+        return nodos[:top_k]
+
+    # Construye los NodeWithScore a partir de los documentos guardados
+    def _a_nodos(self, mejores):
+        from llama_index.core.schema import NodeWithScore, TextNode
+
+        if not mejores:
+            return []
+        ids = [node_id for node_id, _ in mejores]
+        with self._lock:
+            filas = {
+                fila[0]: fila for fila in self._conexion.execute(
+                    "SELECT id, texto, metadatos FROM documentos WHERE id IN ("
+                    + ",".join("?" * len(ids)) + ")",
+                    ids,
+                )
+            }
+        return [
+            NodeWithScore(
+                node=TextNode(
+                    id_=node_id, text=filas[node_id][1], metadata=json.loads(filas[node_id][2])
+                ),
+                score=puntaje,
+            )
+            for node_id, puntaje in mejores
+        ]
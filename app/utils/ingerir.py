@@ -1,52 +1,78 @@
+import hashlib
 import os
 import sys
-import uuid
-import openai
-
-import chromadb
-import keybert
-from llama_index.core.indices.vector_store import VectorStoreIndex, VectorIndexRetriever
-from llama_index.core.postprocessor import SentenceTransformerRerank
-from llama_index.core.prompts import PromptTemplate
-from llama_index.core.response_synthesizers import get_response_synthesizer, ResponseMode, Accumulate
-from llama_index.core.schema import TextNode
-from llama_index.core.storage import StorageContext
-from llama_index.core.settings import Settings
-from llama_index.legacy import QueryBundle, ServiceContext
-from llama_index.embeddings.ollama import OllamaEmbedding
-from llama_index.llms.ollama import Ollama
-from llama_index.vector_stores.chroma import ChromaVectorStore
-
-from .consulta_nexus import consulta_nexus
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .consulta_nexus import cosechar_nexus, cosechar_subconsultas
+from .filtros import combinar_filtros, construir_filtro, fecha_a_numero
+from .indice_lexico import IndiceBM25, es_identificador, fusionar_rrf
 from .logs import logger
-from .preprocesar import split
+from .metricas import metricas
+from .reranker import obtener_reranker
+
+# Las dependencias pesadas (chromadb, keybert, llama_index, openai) y los clientes de los
+# modelos se importan y crean en el primer uso para que la aplicación inicie rápido
 
 """
     Este script contiene las funciones necesarias para extraer, indexar y buscar nodos de jurisprudencia de NEXUS PJ.
     - extractor: extrae jurisprudencia de NEXUS PJ, la parte en chunks y lo transforma en nodos de tipo TextNode según el esquema de LlamaIndex.
-    - indexar: indexa los nodos.
-    - buscar_nodos: realiza una búsqueda semántica de los nodos indexados conjuntamente con un reranker.
+    - indexar: indexa los nodos nuevos, omitiendo los que ya existen en la colección.
+    - buscar_nodos: realiza una búsqueda semántica (o híbrida con BM25) de los nodos indexados conjuntamente con un reranker.
+    - buscar_particiones: busca en paralelo en las particiones por año o despacho, si están habilitadas.
+    - buscar_instantanea: busca en la instantánea de solo lectura de la colección, sin abrir Chroma.
     - imprimir_nodos: imprime los resultados de la búsqueda.
-    - guardar_nodos: guarda los resultados de la búsqueda en un archivo de texto.
+    - guardar_nodos: guarda los resultados de la búsqueda en el almacén de resultados.
     - sintetizador_respuesta: sintetiza una respuesta con base en la consulta y los nodos extraídos.
+    - transmitir_respuesta: muestra una respuesta en streaming y mide su tiempo al primer token.
+    - buscar_respuesta_cacheada / guardar_respuesta_cacheada: caché semántica de respuestas.
+    - precalentar / iniciar_precalentamiento: cargan los modelos en segundo plano.
 """
 
 # Define la llave de la API de OpenAI
 os.environ["OPENAI_API_KEY"] = "nokey"
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # Define el nombre del modelo
 modelo = "llama3.2"
 
-# Crea una instancia del modelo de embeddings
-embedding_model = OllamaEmbedding(model_name="nomic-embed-text")
+# Define la ruta de la base de datos vectorial y el nombre de la colección
+RUTA_CHROMA = "./app/chroma_db"
+NOMBRE_COLECCION = "sentencias"
+
+# Define el particionado de la base vectorial ("anio", "despacho" o vacío para usar una sola
+# colección); con particiones, cada una es una base de Chroma aparte en RUTA_PARTICIONES
+CRITERIO_PARTICION = os.getenv("NEXUSPJLLM_PARTICION", "")
+
+# Define la ruta de la instantánea de solo lectura de la colección y si las opciones de
+# búsqueda la usan en lugar de Chroma (se crea con app/instantanea.py)
+RUTA_INSTANTANEA = os.path.join(RUTA_CHROMA, "instantanea")
+USAR_INSTANTANEA = os.getenv("NEXUSPJLLM_INSTANTANEA", "") == "1"
+
+# Define si la consulta a NEXUS PJ se hace con subconsultas de palabras clave en lugar del
+# texto completo de la consulta
+USAR_PALABRAS_CLAVE = os.getenv("NEXUSPJLLM_PALABRAS_CLAVE", "") == "1"
 
-# Configure global settings
-Settings.embed_model = embedding_model
-Settings.chunk_size = 512
+# Define el índice de vectores comprimidos para la primera búsqueda ("int8", "float16" o
+# vacío para buscar directamente en Chroma) y cuántos candidatos se repuntúan por resultado
+TIPO_CUANTIZADO = os.getenv("NEXUSPJLLM_CUANTIZADO", "")
+SOBREMUESTREO_CUANTIZADO = 4
 
-# Crea una instancia del modelo de lenguaje
-llm = Ollama(model=modelo, request_timeout=120.0)
+# Define cuántas sentencias se preseleccionan en la búsqueda en dos etapas y cuántos chunks
+# de una misma sentencia pasan al reranking
+DOCUMENTOS_TOP_K = 10
+MAX_CHUNKS_POR_DOCUMENTO = 2
+
+# Define el presupuesto de tokens del contexto que se envía al LLM (None para no podarlo)
+PRESUPUESTO_CONTEXTO = 512
+
+# Define el tamaño de los lotes de embeddings y cuántos lotes se calculan a la vez
+TAMANO_LOTE_EMBEDDINGS = 32
+LOTES_EN_VUELO = 4
+
+# Define cuánto tiempo mantiene Ollama el modelo de lenguaje cargado tras precalentarlo
+KEEP_ALIVE_LLM = "30m"
 
 # Define un nuevo prompt en español
 qa_prompt_tmpl_es_str = """\
@@ -60,70 +86,475 @@ qa_prompt_tmpl_es_str = """\
     Respuesta: \
     """
 
-# Crear un Prompt Template con el prompt en español
-qa_prompt_tmpl_es = PromptTemplate(qa_prompt_tmpl_es_str)
+# Versión del prompt: si el prompt o el presupuesto del contexto cambian, las respuestas en
+# caché dejan de ser válidas
+VERSION_PROMPT = hashlib.sha256(
+    (qa_prompt_tmpl_es_str + "\npresupuesto=" + str(PRESUPUESTO_CONTEXTO)).encode("utf-8")
+).hexdigest()[:12]
+
+# Define los modelos, el prompt y la caché de respuestas (se crean en el primer uso)
+_embedding_model = None
+_llm = None
+_qa_prompt_tmpl_es = None
+_cache_respuestas = None
+_almacen_resultados = None
+_lock_modelos = threading.RLock()
+
+
+# Función para obtener el modelo de embeddings, con caché persistente para no recalcular
+# los chunks ni las consultas repetidas
+def obtener_embedding_model():
+    global _embedding_model
+    with _lock_modelos:
+        if _embedding_model is None:
+            from llama_index.core.settings import Settings
+            from llama_index.embeddings.ollama import OllamaEmbedding
+
+            from .cache_embeddings import CacheEmbeddings, EmbeddingCacheado
+
+            _embedding_model = EmbeddingCacheado(
+                OllamaEmbedding(model_name="nomic-embed-text"), CacheEmbeddings()
+            )
+            # Configure global settings
+            Settings.embed_model = _embedding_model
+            Settings.chunk_size = 512
+    return _embedding_model
+
 
+# Función para obtener el modelo de lenguaje
+def obtener_llm():
+    global _llm
+    with _lock_modelos:
+        if _llm is None:
+            import openai
+            from llama_index.llms.ollama import Ollama
 
-# Función para extraer nodos de jurisprudencia de NEXUS PJ
-def extractor(consulta, embedding_model, use_keybert=False) -> list:
+            openai.api_key = os.getenv("OPENAI_API_KEY")
+            _llm = Ollama(model=modelo, request_timeout=120.0)
+    return _llm
+
+
+# Función para obtener el Prompt Template con el prompt en español
+def obtener_prompt():
+    global _qa_prompt_tmpl_es
+    with _lock_modelos:
+        if _qa_prompt_tmpl_es is None:
+            from llama_index.core.prompts import PromptTemplate
+
+            _qa_prompt_tmpl_es = PromptTemplate(qa_prompt_tmpl_es_str)
+    return _qa_prompt_tmpl_es
+
+
+# Función para crear el contexto de servicio con los modelos de la aplicación
+def obtener_contexto_servicio():
+    from llama_index.legacy import ServiceContext
+
+    return ServiceContext.from_defaults(
+        llm=obtener_llm(),
+        embed_model=obtener_embedding_model()
+    )
+
+
+# Función para precargar los modelos mientras el usuario elige una opción
+def precalentar(con_reranker=True):
+    inicio = time.perf_counter()
     try:
-        # Preprocesa la consulta
-        consulta = consulta.lower()
-        consulta = consulta.replace("¿", "")
-        consulta = consulta.replace("?", "")
-        consulta = consulta.replace("¡", "")
-        consulta = consulta.replace("!", "")
-        consulta = consulta.replace("á", "a")
-        consulta = consulta.replace("é", "e")
-        consulta = consulta.replace("í", "i")
-        consulta = consulta.replace("ó", "o")
-        consulta = consulta.replace("ú", "u")
-        consulta = consulta.replace("ü", "u")
-        consulta = consulta.replace("ñ", "n")
-        consulta = consulta.replace("  ", " ")
-        consulta = consulta.replace(",", " ")
-        consulta = consulta.replace(".", " ")
-        consulta = consulta.strip()
+        # Se usa el modelo sin caché para que Ollama cargue el modelo de embeddings
+        obtener_embedding_model().modelo_base.get_query_embedding("precalentamiento")
+    except Exception as e:
+        logger.warning("No se pudo precalentar el modelo de embeddings: " + str(e))
+    try:
+        import ollama
+
+        obtener_llm()
+        obtener_prompt()
+        # Un prompt vacío carga el modelo en memoria sin generar texto
+        ollama.generate(model=modelo, prompt="", keep_alive=KEEP_ALIVE_LLM)
+    except Exception as e:
+        logger.warning("No se pudo precalentar el modelo de lenguaje: " + str(e))
+    if con_reranker:
+        try:
+            obtener_reranker()
+        except Exception as e:
+            logger.warning("No se pudo precalentar el reranker: " + str(e))
+    logger.info(f"Modelos precalentados en {time.perf_counter() - inicio:.2f} segundos")
+
+
+# Función para precalentar los modelos en un hilo en segundo plano
+def iniciar_precalentamiento(con_reranker=True):
+    hilo = threading.Thread(
+        target=precalentar, args=(con_reranker,), name="precalentamiento", daemon=True
+    )
+    hilo.start()
+    return hilo
+
+
+# Función para generar el ID de un nodo a partir de la sentencia y el texto del chunk
+def id_nodo(id_sentencia, texto):
+    # El mismo chunk de la misma sentencia siempre produce el mismo ID
+    return hashlib.sha256((id_sentencia + "\n" + texto).encode("utf-8")).hexdigest()
+
+
+# Función para obtener la colección de sentencias
+def obtener_coleccion():
+    import chromadb
+
+    client = chromadb.PersistentClient(path=RUTA_CHROMA)
+    return client.get_or_create_collection(NOMBRE_COLECCION)
+
+
+# Define el índice léxico BM25 (se abre en el primer uso)
+_indice_lexico = None
 
-        # Extrae las palabras clave de la consulta si use_keybert es True
-        if use_keybert == True:
-            # Informa que la extracción de palabras clave ha iniciado
-            logger.info("Extracción de palabras clave iniciada")
 
-            # Asigna el modelo de embeddings a la instancia de KeyBERT
-            kw_modelo = keybert.KeyBERT(model=embedding_model)
+# Función para obtener el índice léxico persistido junto a la colección
+def obtener_indice_lexico():
+    global _indice_lexico
+    if _indice_lexico is None:
+        os.makedirs(RUTA_CHROMA, exist_ok=True)
+        _indice_lexico = IndiceBM25(os.path.join(RUTA_CHROMA, "bm25.db"))
+    return _indice_lexico
 
-            # Genera las palabras clave con base en la consulta
-            palabras_clave = kw_modelo.extract_keywords(
-                consulta, keyphrase_ngram_range=(1, 2), top_n=2
+
+# Función para crear un TextNode a partir de un registro de la colección de Chroma
+def nodo_desde_chroma(node_id, texto, metadatos):
+    from llama_index.core.schema import TextNode
+
+    return TextNode(
+        id_=node_id,
+        text=texto,
+        # Se descartan los campos internos que agrega LlamaIndex
+        metadata={
+            clave: valor for clave, valor in metadatos.items()
+            if not clave.startswith("_") and clave not in ("document_id", "doc_id", "ref_doc_id")
+        },
+        excluded_embed_metadata_keys=["Fecha_Num"],
+        excluded_llm_metadata_keys=["Fecha_Num"],
+    )
+
+
+# Función para agregar al índice léxico los chunks de la colección que aún no tiene
+def sincronizar_indice_lexico(client_collection, lote=1000):
+    indice_lexico = obtener_indice_lexico()
+    if indice_lexico.contar() >= client_collection.count():
+        return
+    logger.info("Sincronizando índice léxico con la colección...")
+    agregados = 0
+    for desplazamiento in range(0, client_collection.count(), lote):
+        resultado = client_collection.get(
+            include=["documents", "metadatas"], limit=lote, offset=desplazamiento
+        )
+        nodes = [
+            nodo_desde_chroma(node_id, texto, metadatos)
+            for node_id, texto, metadatos in zip(
+                resultado["ids"], resultado["documents"], resultado["metadatas"]
             )
+        ]
+        agregados += indice_lexico.agregar(nodes)
+    logger.info("Índice léxico sincronizado: " + str(agregados) + " chunks agregados")
+
+
+# Define el índice de sentencias (un vector por ID_Sentencia, se abre en el primer uso)
+_indice_documentos = None
+
+
+# Función para obtener el índice de sentencias, guardado en una colección aparte
+def obtener_indice_documentos():
+    global _indice_documentos
+    if _indice_documentos is None:
+        import chromadb
+
+        from .indice_documentos import IndiceDocumentos
+
+        client = chromadb.PersistentClient(path=RUTA_CHROMA)
+        coleccion = client.get_or_create_collection(
+            NOMBRE_COLECCION + "_documentos", metadata={"hnsw:space": "cosine"}
+        )
+        _indice_documentos = IndiceDocumentos(
+            coleccion, os.path.join(RUTA_CHROMA, "documentos.db")
+        )
+    return _indice_documentos
+
+
+# Función para agregar al índice de sentencias los chunks de la colección que no incluye
+def sincronizar_indice_documentos(client_collection):
+    indice_documentos = obtener_indice_documentos()
+    # Sin las sumas de cada sentencia no se pueden actualizar los promedios, así que se reconstruyen
+    if indice_documentos.contar() and not indice_documentos.contar_sumas():
+        indice_documentos.reconstruir(client_collection)
+    elif indice_documentos.contar_chunks() < client_collection.count():
+        indice_documentos.completar(client_collection)
 
-            # Genera las palabras clave con base en la consulta
-            palabras_clave = keybert.extract_keywords(
-                consulta, keyphrase_ngram_range=(1, 2), top_n=2
+
+# Función para dejar como máximo n chunks por sentencia, conservando el orden
+def limitar_por_documento(nodes, maximo):
+    conteos = {}
+    limitados = []
+    for node in nodes:
+        id_sentencia = node.node.metadata.get("ID_Sentencia")
+        conteos[id_sentencia] = conteos.get(id_sentencia, 0) + 1
+        if conteos[id_sentencia] <= maximo:
+            limitados.append(node)
+    return limitados
+
+
+# Define el índice de vectores comprimidos (se abre en el primer uso si está habilitado)
+_indice_cuantizado = None
+
+
+# Función para obtener el índice de vectores comprimidos, o None si no está habilitado
+def obtener_indice_cuantizado():
+    global _indice_cuantizado
+    if not TIPO_CUANTIZADO:
+        return None
+    if _indice_cuantizado is None:
+        from .indice_cuantizado import IndiceCuantizado
+
+        _indice_cuantizado = IndiceCuantizado(
+            os.path.join(RUTA_CHROMA, "cuantizado_" + TIPO_CUANTIZADO), TIPO_CUANTIZADO
+        )
+    return _indice_cuantizado
+
+
+# Función para agregar al índice comprimido los vectores de la colección que aún no tiene
+def sincronizar_indice_cuantizado(client_collection, lote=1000):
+    from .indice_cuantizado import reportar_tamano
+
+    indice_cuantizado = obtener_indice_cuantizado()
+    if indice_cuantizado is None:
+        return
+    if indice_cuantizado.contar() < client_collection.count():
+        logger.info("Sincronizando índice cuantizado con la colección...")
+        agregados = 0
+        for desplazamiento in range(0, client_collection.count(), lote):
+            resultado = client_collection.get(include=["embeddings"], limit=lote, offset=desplazamiento)
+            agregados += indice_cuantizado.agregar(resultado["ids"], resultado["embeddings"])
+        logger.info("Índice cuantizado sincronizado: %d vectores agregados", agregados)
+    reportar_tamano(indice_cuantizado)
+
+
+# Función para buscar con el índice comprimido y repuntuar los candidatos con su copia float32 en
+# disco; de Chroma solo se leen los textos y metadatos, nunca el segmento de vectores (el filtro
+# se aplica después sobre los candidatos; buscar_nodos solo la usa sin filtros)
+def buscar_cuantizado(consulta, top_k, filtro=None, sobremuestreo=SOBREMUESTREO_CUANTIZADO):
+    from llama_index.core.schema import NodeWithScore
+
+    embedding = obtener_embedding_model().get_query_embedding(consulta)
+    repuntuados = obtener_indice_cuantizado().buscar_repuntuado(embedding, top_k * sobremuestreo)
+    if not repuntuados:
+        return []
+    # Los filtros de metadatos se aplican al traer los textos de los candidatos
+    resultado = obtener_coleccion().get(
+        ids=[node_id for node_id, _ in repuntuados], where=filtro, include=["documents", "metadatas"]
+    )
+    registros = {
+        node_id: (texto, metadatos)
+        for node_id, texto, metadatos in zip(
+            resultado["ids"], resultado["documents"], resultado["metadatas"]
+        )
+    }
+    return [
+        NodeWithScore(node=nodo_desde_chroma(node_id, *registros[node_id]), score=puntaje)
+        for node_id, puntaje in repuntuados if node_id in registros
+    ][:top_k]
+
+
+# Define las particiones de la base vectorial (se abren en el primer uso si están habilitadas)
+_particiones = None
+
+
+# Función para obtener las particiones por año o despacho, o None si no están habilitadas
+def obtener_particiones():
+    global _particiones
+    if not CRITERIO_PARTICION:
+        return None
+    if _particiones is None:
+        from .particiones import RUTA_PARTICIONES, Particiones
+
+        _particiones = Particiones(RUTA_PARTICIONES, CRITERIO_PARTICION, NOMBRE_COLECCION)
+    return _particiones
+
+
+# Función para buscar en paralelo en las particiones que pueden cumplir los filtros
+def buscar_particiones(consulta, top_k, filtro=None, filtros=None):
+    from llama_index.core.schema import NodeWithScore
+
+    particiones = obtener_particiones()
+    nombres = particiones.relevantes(filtros)
+    logger.debug("Particiones consultadas: %s", nombres)
+    embedding = obtener_embedding_model().get_query_embedding(consulta)
+    return [
+        NodeWithScore(node=nodo_desde_chroma(node_id, texto, metadatos), score=puntaje)
+        for node_id, texto, metadatos, puntaje in particiones.buscar(embedding, top_k, filtro, nombres)
+    ]
+
+
+# Define la instantánea de solo lectura (se abre en el primer uso si está habilitada; False si
+# no existe, para no volver a buscarla en cada consulta)
+_instantanea = None
+
+
+# Función para obtener la instantánea de la colección, o None si no está habilitada o no existe
+def obtener_instantanea():
+    global _instantanea
+    if not USAR_INSTANTANEA:
+        return None
+    if _instantanea is None:
+        from .instantanea import Instantanea
+
+        if not os.path.exists(os.path.join(RUTA_INSTANTANEA, "meta.json")):
+            logger.warning("No existe la instantánea en " + RUTA_INSTANTANEA + ", se usará Chroma")
+            _instantanea = False
+            return None
+        _instantanea = Instantanea(RUTA_INSTANTANEA)
+        logger.info("Instantánea abierta: %d chunks", _instantanea.contar())
+        # El índice léxico se actualiza en cada ingesta, así que sirve para detectar una
+        # instantánea que no se volvió a exportar
+        indexados = obtener_indice_lexico().contar()
+        if _instantanea.contar() < indexados:
+            logger.warning(
+                "La instantánea tiene %d chunks y el índice léxico %d; vuelva a exportarla con "
+                "app/instantanea.py", _instantanea.contar(), indexados,
             )
-            # Extrae las palabras clave de la lista de palabras clave generadas
-            palabras_clave = [
-                palabra_clave[0] for palabra_clave in palabras_clave if palabra_clave[1]
-            ]
+    return _instantanea or None
+
+
+# Función para buscar los top_k chunks en una instantánea de solo lectura
+def buscar_instantanea(instantanea, consulta, top_k, filtro=None):
+    from llama_index.core.schema import NodeWithScore
+
+    embedding = obtener_embedding_model().get_query_embedding(consulta)
+    return [
+        NodeWithScore(node=nodo_desde_chroma(node_id, texto, metadatos), score=puntaje)
+        for node_id, texto, metadatos, puntaje in instantanea.buscar(embedding, top_k, filtro)
+    ]
+
+
+# Función para insertar un lote de nodos con embedding en Chroma (o en su partición) y en el
+# índice comprimido
+def insertar_vectores(lote, vector_store):
+    if obtener_particiones() is not None:
+        obtener_particiones().agregar(lote)
+        return
+    vector_store.add(lote)
+    if obtener_indice_cuantizado() is not None:
+        obtener_indice_cuantizado().agregar(
+            [node.node_id for node in lote], [node.embedding for node in lote]
+        )
 
-            # Informa que la extracción de palabras clave ha finalizado
-            logger.info("Extracción de palabras clave finalizada")
 
-            # Muestra en logs las palabras clave extraídas
-            logger.info("Palabras clave extraídas: " + str(palabras_clave))
+# Función para filtrar los nodos cuyo ID ya existe en la colección
+def filtrar_nodos_nuevos(nodes, client_collection, lote=500):
+    # Se eliminan los duplicados dentro de los mismos nodos
+    unicos = {}
+    for node in nodes:
+        unicos.setdefault(node.id_, node)
+    ids = list(unicos)
+    # Se consultan los IDs existentes por lotes (en su partición, si están habilitadas)
+    existentes = set()
+    if obtener_particiones() is not None:
+        existentes = obtener_particiones().existentes(list(unicos.values()), lote)
+    else:
+        for i in range(0, len(ids), lote):
+            existentes.update(client_collection.get(ids=ids[i:i + lote], include=[])["ids"])
+    return [node for node_id, node in unicos.items() if node_id not in existentes]
+
+
+# Función para preprocesar la consulta antes de enviarla a NEXUS PJ
+def normalizar_consulta(consulta):
+    consulta = consulta.lower()
+    consulta = consulta.replace("¿", "")
+    consulta = consulta.replace("?", "")
+    consulta = consulta.replace("¡", "")
+    consulta = consulta.replace("!", "")
+    consulta = consulta.replace("á", "a")
+    consulta = consulta.replace("é", "e")
+    consulta = consulta.replace("í", "i")
+    consulta = consulta.replace("ó", "o")
+    consulta = consulta.replace("ú", "u")
+    consulta = consulta.replace("ü", "u")
+    consulta = consulta.replace("ñ", "n")
+    consulta = consulta.replace("  ", " ")
+    consulta = consulta.replace(",", " ")
+    consulta = consulta.replace(".", " ")
+    consulta = consulta.strip()
+    return consulta
+
+
+# Función para crear los TextNode de los chunks de un hit de NEXUS PJ
+def crear_nodos(hit, chunks):
+    from llama_index.core.schema import TextNode
+
+    # Asociamos a cada chunk el "idDocument", el "despacho", el "expediente", el "tipoInformacion" y el "date"
+    metadata = {
+        "ID_Sentencia": hit["idDocument"],
+        "Despacho": hit["despacho"],
+        "Expediente": hit["expediente"],
+        "Tipo de Información": hit["tipoInformacion"],
+        "Fecha": hit["date"],
+    }
+    # La fecha numérica (AAAAMMDD) permite filtrar por rango en Chroma; no se embebe ni
+    # se envía al LLM
+    fecha_num = fecha_a_numero(hit["date"])
+    if fecha_num is not None:
+        metadata["Fecha_Num"] = fecha_num
+    return [
+        TextNode(
+            id_=id_nodo(hit["idDocument"], chunk),
+            text=chunk,
+            metadata=dict(metadata),
+            excluded_embed_metadata_keys=["Fecha_Num"],
+            excluded_llm_metadata_keys=["Fecha_Num"],
+        )
+        for chunk in chunks
+    ]
 
-            # Concatena las palabras clave en una cadena de texto separado por un espacio en blanco y un AND (&)
-            palabras_clave = " & ".join(palabras_clave)
 
-            # Mostramos en logs la consulta a NEXUS PJ
-            logger.info("Consulta a NEXUS PJ: " + palabras_clave)
+# Define el extractor de palabras clave (se crea en el primer uso y se reutiliza)
+_extractor_palabras_clave = None
+
+
+# Función para obtener el extractor de palabras clave, que usa el modelo de embeddings ya cargado
+def obtener_extractor_palabras_clave(embedding_model=None):
+    global _extractor_palabras_clave
+    with _lock_modelos:
+        if _extractor_palabras_clave is None:
+            from .palabras_clave import ExtractorPalabrasClave
 
-            # Realiza la consulta a la API de NEXUS PJ
-            response = consulta_nexus(palabras_clave)
+            _extractor_palabras_clave = ExtractorPalabrasClave(
+                embedding_model or obtener_embedding_model()
+            )
+    return _extractor_palabras_clave
+
+
+# Función para consultar NEXUS PJ con subconsultas de palabras clave de una consulta normalizada
+def cosechar_palabras_clave(consulta, embedding_model=None, paginas=1, max_hits=None):
+    from .palabras_clave import construir_subconsultas
+
+    # Se reutiliza el extractor de palabras clave (y su caché) entre consultas
+    palabras_clave = obtener_extractor_palabras_clave(embedding_model).extraer(consulta)
+
+    # Las subconsultas se envían a NEXUS PJ a la vez y sus hits se unen sin repetir
+    # sentencias; si no hay palabras clave se consulta el texto completo
+    subconsultas = construir_subconsultas(palabras_clave) or [consulta]
+    logger.info("Consultas a NEXUS PJ: " + str(subconsultas))
+    return cosechar_subconsultas(subconsultas, paginas=paginas, max_hits=max_hits)
+
+
+# Función para extraer nodos de jurisprudencia de NEXUS PJ
+def extractor(consulta, embedding_model, use_keybert=False, paginas=1, max_hits=None) -> list:
+    from .preprocesar import split_varios
+
+    try:
+        # Preprocesa la consulta
+        consulta = normalizar_consulta(consulta)
+
+        # Extrae las palabras clave de la consulta si use_keybert es True
+        if use_keybert == True:
+            hits = cosechar_palabras_clave(consulta, embedding_model, paginas, max_hits)
         else:
             # Realiza la consulta directa a la API de NEXUS PJ
-            response = consulta_nexus(consulta)
+            hits = cosechar_nexus(consulta, paginas=paginas, max_hits=max_hits)
 
             # Mostramos en logs la consulta a NEXUS PJ
             logger.info("Consulta a NEXUS PJ: " + consulta)
@@ -131,29 +562,21 @@ def extractor(consulta, embedding_model, use_keybert=False) -> list:
         # Creamos una lista vacía para almacenar todos los nodos
         nodes = []
 
-        for hit in response["hits"]:
-            # Extrae el valor de "content"
-            content = hit["content"]
-            # Llamamos a la función "split" para partir el contenido en chunks
-            chunks = split(content)
-            # Agregamos los chunks como un objeto TextNode a una lista a la que le asociamos el "idDocument", el "despacho", el "expediente", el "tipoInformacion" y el "date"
-            chunks = [
-                TextNode(
-                    text=chunk,
-                    metadata={
-                        "ID_Sentencia": hit["idDocument"],
-                        "Despacho": hit["despacho"],
-                        "Expediente": hit["expediente"],
-                        "Tipo de Información": hit["tipoInformacion"],
-                        "Fecha": hit["date"],
-                    },
-                )
-                for chunk in chunks
-            ]
-            # Agregamos los TextNodes a la lista "nodes"
-            nodes.extend(chunks)
+        # Esperamos todas las páginas de NEXUS PJ
+        with metricas.span("fetch_total") as span:
+            hits = list(hits)
+            span["hits"] = len(hits)
+        # Partimos el contenido de todos los hits en chunks (en paralelo si son muchos)
+        with metricas.span("split", hits=len(hits)) as span:
+            chunks_por_hit = split_varios(hit["content"] for hit in hits)
+            span["chunks"] = sum(len(chunks) for chunks in chunks_por_hit)
+        metricas.incrementar("chunks_extraidos", span["chunks"])
+
+        for hit, chunks in zip(hits, chunks_por_hit):
+            # Agregamos los chunks como objetos TextNode a la lista "nodes"
+            nodes.extend(crear_nodos(hit, chunks))
             # Agregamos información de depuración para ver el progreso
-            logger.info("Procesando nodos...")
+            logger.debug("Nodos procesados de la sentencia %s", hit["idDocument"])
     except:
         # Agregamos información de error
         logger.error("Error: " + str(sys.exc_info()[0]))
@@ -168,28 +591,83 @@ def extractor(consulta, embedding_model, use_keybert=False) -> list:
         return nodes
 
 
+# Función para calcular los embeddings de un lote de nodos
+def embeber_lote(lote):
+    from llama_index.core.schema import MetadataMode
+
+    # Se usa el mismo texto que embebe VectorStoreIndex (contenido + metadatos)
+    textos = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in lote]
+    with metricas.span("embed", chunks=len(lote)):
+        embeddings = obtener_embedding_model().get_text_embedding_batch(textos)
+    for node, embedding in zip(lote, embeddings):
+        node.embedding = embedding
+    return lote
+
+
+# Función para calcular los embeddings de los nodos por lotes, con varios lotes en paralelo
+def embeber_por_lotes(nodes, tamano_lote=TAMANO_LOTE_EMBEDDINGS, lotes_en_vuelo=LOTES_EN_VUELO):
+    lotes = [nodes[i:i + tamano_lote] for i in range(0, len(nodes), tamano_lote)]
+    with ThreadPoolExecutor(max_workers=lotes_en_vuelo) as executor:
+        # Se mantiene una ventana acotada de lotes en vuelo y se retornan en orden
+        pendientes = deque()
+        for lote in lotes:
+            pendientes.append(executor.submit(embeber_lote, lote))
+            if len(pendientes) > lotes_en_vuelo:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
+
 # Función para indexar los nodos
-def indexar(nodes):
+def indexar(nodes, tamano_lote=TAMANO_LOTE_EMBEDDINGS, lotes_en_vuelo=LOTES_EN_VUELO):
+    from llama_index.core.indices.vector_store import VectorStoreIndex
+    from llama_index.core.storage import StorageContext
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+
     # Informamos que el índice está siendo creado
     logger.info("Creando índice...")
     # Creamos un cliente y una nueva colección
-    client = chromadb.PersistentClient(path="./app/chroma_db")
-    client_collection = client.get_or_create_collection("sentencias")
+    client_collection = obtener_coleccion()
+    # Descartamos los nodos que ya fueron indexados previamente
+    nuevos = filtrar_nodos_nuevos(nodes, client_collection)
+    logger.info(
+        "Chunks insertados: " + str(len(nuevos))
+        + ", omitidos por estar indexados: " + str(len(nodes) - len(nuevos))
+    )
     # Creamos el vector store
     vector_store = ChromaVectorStore(chroma_collection=client_collection)
     storage_context = StorageContext.from_defaults(vector_store=vector_store)
-    service_context = ServiceContext.from_defaults(
-        llm=llm,
-        embed_model=embedding_model
-    )
+    service_context = obtener_contexto_servicio()
+
+    # El índice de sentencias debe incluir los chunks ya indexados antes de agregar los nuevos
+    sincronizar_indice_documentos(client_collection)
+
+    # Calculamos los embeddings por lotes y los insertamos en Chroma mientras
+    # los siguientes lotes se siguen calculando
+    inicio = time.perf_counter()
+    insertados = 0
+    for lote in embeber_por_lotes(nuevos, tamano_lote, lotes_en_vuelo):
+        with metricas.span("upsert", chunks=len(lote)):
+            insertar_vectores(lote, vector_store)
+            obtener_indice_documentos().agregar(lote)
+        insertados += len(lote)
+        metricas.incrementar("chunks_indexados", len(lote))
+        logger.debug("Chunks embebidos e insertados: %d/%d", insertados, len(nuevos))
+    duracion = time.perf_counter() - inicio
+    # Agregamos los mismos chunks al índice léxico
+    with metricas.span("upsert_lexico", chunks=len(nuevos)):
+        obtener_indice_lexico().agregar(nuevos)
+    if insertados:
+        logger.info(
+            f"Embeddings: {insertados} chunks en {duracion:.2f} s "
+            f"({insertados / duracion:.1f} chunks/s, lote={tamano_lote}, en vuelo={lotes_en_vuelo})"
+        )
 
-    # Creamos el índice
-    index = VectorStoreIndex(
-        nodes=nodes,
-        storage_context=storage_context,
+    # Creamos el índice sobre el vector store ya poblado
+    index = VectorStoreIndex.from_vector_store(
+        vector_store=vector_store,
         service_context=service_context,
-        llm=None,
-        show_progress=True,
+        storage_context=storage_context,
     )
     # Informamos que el índice ha sido creado
     logger.info("Índice creado")
@@ -199,105 +677,265 @@ def indexar(nodes):
 
 # Función para buscar nodos
 def buscar_nodos(
-        consulta, index, vector_top_k=int, reranker_top_n=None, with_reranker_sbert=False
+        consulta, index, vector_top_k=int, reranker_top_n=None, with_reranker_sbert=False,
+        lexico_top_k=0, filtros=None, documentos_top_k=None, max_por_documento=None, instantanea=None
 ):
+    from llama_index.core.indices.vector_store import VectorIndexRetriever
+    from llama_index.legacy import QueryBundle
+
     # Informamos que la búsqueda ha iniciado
     logger.info("Iniciando búsqueda...")
     
     # Create query bundle using the core QueryBundle
     query = QueryBundle(query_str=consulta)
+
+    # Los filtros de metadatos (despacho, tipo, fechas) se envían a Chroma como cláusula "where"
+    filtro = construir_filtro(filtros)
+    if filtro is not None:
+        # Se estima cuántos chunks cumplen los filtros para no pedir más de los que existen
+        estimados = obtener_indice_lexico().estimar(filtros)
+        logger.info("Filtros: " + str(filtros) + ", chunks estimados: " + str(estimados))
+        if estimados == 0:
+            return []
+        vector_top_k = min(vector_top_k, estimados)
+
+    # Si la consulta es solo un identificador (expediente, artículo, ID de sentencia),
+    # se resuelve con el índice léxico sin calcular el embedding de la consulta
+    if lexico_top_k and es_identificador(consulta):
+        logger.info("Consulta por identificador exacto, búsqueda léxica")
+        with metricas.span("retrieve", tipo="identificador"):
+            retrieved_nodes = obtener_indice_lexico().buscar(consulta, top_k=lexico_top_k, filtro=filtro)
+        if retrieved_nodes:
+            return retrieved_nodes[:reranker_top_n] if reranker_top_n else retrieved_nodes
+
+    # Búsqueda en dos etapas: primero las sentencias más parecidas y luego los chunks
+    # solo dentro de ellas (el índice de sentencias está en Chroma, no en la instantánea)
+    if documentos_top_k and instantanea is None:
+        with metricas.span("retrieve", tipo="documentos", top_k=documentos_top_k):
+            documentos = obtener_indice_documentos().buscar(
+                obtener_embedding_model().get_query_embedding(consulta), documentos_top_k, filtro
+            )
+        if documentos:
+            filtro = combinar_filtros(
+                filtro, {"ID_Sentencia": {"$in": [id_sentencia for id_sentencia, _ in documentos]}}
+            )
     
-    # Se configura el retriever
-    retriever = VectorIndexRetriever(
-        index=index,
-        similarity_top_k=vector_top_k
-    )
-    
-    # Retrieve nodes using query string directly
-    retrieved_nodes = retriever.retrieve(str(consulta))
+    # Retrieve nodes using query string directly (en la instantánea, en las particiones o con
+    # el índice comprimido si están habilitados)
+    if instantanea is not None:
+        with metricas.span("retrieve", tipo="instantanea", top_k=vector_top_k):
+            retrieved_nodes = buscar_instantanea(instantanea, consulta, vector_top_k, filtro)
+    elif obtener_particiones() is not None:
+        with metricas.span("retrieve", tipo="particiones", top_k=vector_top_k):
+            retrieved_nodes = buscar_particiones(consulta, vector_top_k, filtro, filtros)
+    elif obtener_indice_cuantizado() is not None and filtro is None:
+        # Con filtros se busca en Chroma: el índice comprimido no conoce los metadatos y
+        # filtrar sus candidatos después descartaría la mayoría
+        with metricas.span("retrieve", tipo="cuantizado", top_k=vector_top_k):
+            retrieved_nodes = buscar_cuantizado(consulta, vector_top_k, filtro)
+    else:
+        # Se configura el retriever
+        retriever = VectorIndexRetriever(
+            index=index,
+            similarity_top_k=vector_top_k,
+            vector_store_kwargs={"where": filtro} if filtro is not None else {},
+        )
+        with metricas.span("retrieve", tipo="vectorial", top_k=vector_top_k):
+            retrieved_nodes = retriever.retrieve(str(consulta))
+
+    # Se fusionan los resultados vectoriales con los de BM25 (reciprocal rank fusion)
+    if lexico_top_k:
+        with metricas.span("retrieve", tipo="lexico", top_k=lexico_top_k):
+            nodos_lexicos = obtener_indice_lexico().buscar(consulta, top_k=lexico_top_k, filtro=filtro)
+        retrieved_nodes = fusionar_rrf([retrieved_nodes, nodos_lexicos])
+
+    # Se limita el número de chunks de una misma sentencia antes del reranking
+    if max_por_documento:
+        retrieved_nodes = limitar_por_documento(retrieved_nodes, max_por_documento)
     
-    # Se configura el reranker
+    # Se obtiene el reranker ya cargado (solo se carga en la primera consulta)
     if with_reranker_sbert:
-        reranker = SentenceTransformerRerank(
-            top_n=reranker_top_n,
-            model="cross-encoder/ms-marco-MiniLM-L-2-v2"
-        )
-        retrieved_nodes = reranker.postprocess_nodes(
-            retrieved_nodes,
-            query_bundle=query
-        )
+        reranker = obtener_reranker()
+        with metricas.span("rerank", candidatos=len(retrieved_nodes)):
+            retrieved_nodes = reranker.rerankear(
+                query.query_str,
+                retrieved_nodes,
+                top_n=reranker_top_n
+            )
     
     return retrieved_nodes
 
 
 # Función para imprimir los nodos
 def imprimir_nodos(retrieved_nodes):
-    # Imprimimos los nodos como logs
+    # Los nodos se muestran al usuario en consola; en el log solo queda un resumen por nodo
+    # y el texto completo únicamente con el nivel DEBUG
     for node in retrieved_nodes:
-        logger.info("--------------------------------------------------")
-        logger.info("Chunk: " + node.text)
-        logger.info("ID del Chunk: " + node.id_)
-        logger.info("ID de la Sentencia: " + node.metadata["ID_Sentencia"])
-        logger.info("Despacho: " + node.metadata["Despacho"])
-        logger.info("Expediente: " + node.metadata["Expediente"])
-        logger.info("Tipo de información: " + node.metadata["Tipo de Información"])
-        logger.info("Fecha: " + node.metadata["Fecha"])
-        logger.info("--------------------------------------------------")
-        logger.info("")
-
-
-# Función para guardar los nodos en un archivo de texto
-def guardar_nodos(retrieved_nodes):
-    # Crea un nombre para el archivo de texto con un identificador único
-    nombre_archivo = "chunks/chunks" + str(uuid.uuid4()) + ".txt"
-    # Si no existe el directorio "chunks", lo crea
-    if not os.path.exists("chunks"):
-        os.makedirs("chunks")
-    # Guarda la estructura del print en el archivo de texto
-    with open(nombre_archivo, "w") as f:
-        for node in retrieved_nodes:
-            f.write("--------------------------------------------------" + "\n")
-            f.write("Chunk: " + node.text + "\n")
-            f.write("ID del Chunk: " + node.id_ + "\n")
-            f.write("ID de la Sentencia: " + node.metadata["ID_Sentencia"] + "\n")
-            f.write("Despacho: " + node.metadata["Despacho"] + "\n")
-            f.write("Expediente: " + node.metadata["Expediente"] + "\n")
-            f.write(
-                "Tipo de información: " + node.metadata["Tipo de Información"] + "\n"
-            )
-            f.write("Fecha: " + node.metadata["Fecha"] + "\n")
-            f.write("--------------------------------------------------" + "\n")
-            f.write("\n")
+        print("--------------------------------------------------")
+        print("Chunk: " + node.text)
+        print("ID del Chunk: " + node.id_)
+        print("ID de la Sentencia: " + node.metadata["ID_Sentencia"])
+        print("Despacho: " + node.metadata["Despacho"])
+        print("Expediente: " + node.metadata["Expediente"])
+        print("Tipo de información: " + node.metadata["Tipo de Información"])
+        print("Fecha: " + node.metadata["Fecha"])
+        print("--------------------------------------------------")
+        print("")
+        logger.info(
+            "Nodo %s (sentencia %s, %s, score %s)",
+            node.id_, node.metadata["ID_Sentencia"], node.metadata["Despacho"], node.score,
+        )
+        logger.debug("Chunk %s: %s", node.id_, node.text)
+
+
+# Función para obtener el almacén de resultados de búsqueda
+def obtener_almacen_resultados():
+    global _almacen_resultados
+    if _almacen_resultados is None:
+        from .resultados import AlmacenResultados
+
+        _almacen_resultados = AlmacenResultados()
+    return _almacen_resultados
+
+
+# Función para guardar los nodos de una búsqueda en el almacén de resultados
+# (exportables al formato de texto con app/exportar_resultados.py)
+def guardar_nodos(retrieved_nodes, consulta=""):
+    id_registro = obtener_almacen_resultados().guardar(consulta, retrieved_nodes)
+    logger.info("Resultados guardados en el registro %d", id_registro)
+    return id_registro
+
+
+def sintetizador_respuesta(consulta, retrieved_nodes, streaming=False, presupuesto_tokens=PRESUPUESTO_CONTEXTO):
+    from llama_index.core.response_synthesizers import get_response_synthesizer, ResponseMode
 
+    from .contexto import empaquetar_contexto
 
-def sintetizador_respuesta(consulta, retrieved_nodes):
+    # Se podan los nodos a las oraciones más relevantes para reducir la evaluación del prompt
+    if presupuesto_tokens:
+        with metricas.span("empaquetar", presupuesto=presupuesto_tokens) as span:
+            retrieved_nodes, reporte = empaquetar_contexto(consulta, retrieved_nodes, presupuesto_tokens)
+            span.update(reporte)
+        metricas.incrementar("tokens_contexto_antes", reporte["tokens_antes"])
+        metricas.incrementar("tokens_contexto_despues", reporte["tokens_despues"])
+        logger.info(
+            "Contexto empaquetado: %d -> %d tokens (%d de %d oraciones, %d repetidas)",
+            reporte["tokens_antes"], reporte["tokens_despues"], reporte["oraciones_elegidas"],
+            reporte["oraciones"], reporte["oraciones_repetidas"],
+        )
+
+    qa_prompt_tmpl_es = obtener_prompt()
     # Se configura el sintetizador de respuestas
     response_synthesizer = get_response_synthesizer(
-        llm=llm,
+        llm=obtener_llm(),
         text_qa_template=qa_prompt_tmpl_es,
         response_mode=ResponseMode.COMPACT,
+        streaming=streaming,
     )
     # Se actualiza el prompt
     response_synthesizer.update_prompts({"text_qa_template": qa_prompt_tmpl_es})
-    # Se configura la respuesta
-    respuesta = response_synthesizer.synthesize(query=consulta, nodes=retrieved_nodes, use_async=False, streaming=False)
+    # Se configura la respuesta (en streaming se retorna un StreamingResponse y la
+    # generación se mide en transmitir_respuesta)
+    with metricas.span("synthesize", nodos=len(retrieved_nodes), streaming=streaming):
+        respuesta = response_synthesizer.synthesize(query=consulta, nodes=retrieved_nodes, use_async=False, streaming=streaming)
     # Retornamos la respuesta
     return respuesta
 
 
+# Función para obtener la caché semántica de respuestas
+def obtener_cache_respuestas():
+    global _cache_respuestas
+    if _cache_respuestas is None:
+        from .cache_respuestas import CacheRespuestas
+
+        _cache_respuestas = CacheRespuestas()
+    return _cache_respuestas
+
+
+# Función para buscar una respuesta ya generada para una consulta similar y los mismos nodos
+def buscar_respuesta_cacheada(consulta, retrieved_nodes):
+    cache_respuestas = obtener_cache_respuestas()
+    firma = cache_respuestas.firma(
+        [node.node.node_id for node in retrieved_nodes], VERSION_PROMPT
+    )
+    # El embedding de la consulta ya fue calculado por el retriever y está en caché
+    embedding = obtener_embedding_model().get_query_embedding(consulta)
+    respuesta = cache_respuestas.obtener(firma, embedding)
+    metricas.incrementar("cache_respuestas_" + ("aciertos" if respuesta is not None else "fallos"))
+    return respuesta
+
+
+# Función para guardar una respuesta generada en la caché semántica
+def guardar_respuesta_cacheada(consulta, retrieved_nodes, respuesta):
+    cache_respuestas = obtener_cache_respuestas()
+    firma = cache_respuestas.firma(
+        [node.node.node_id for node in retrieved_nodes], VERSION_PROMPT
+    )
+    embedding = obtener_embedding_model().get_query_embedding(consulta)
+    cache_respuestas.guardar(firma, consulta, embedding, respuesta)
+
+
+# Función para mostrar una respuesta en streaming conforme el LLM genera los tokens
+def transmitir_respuesta(respuesta, inicio=None, escribir=None):
+    if inicio is None:
+        inicio = time.perf_counter()
+    if escribir is None:
+        escribir = lambda token: print(token, end="", flush=True)
+
+    tokens = []
+    ttft = None
+    cancelada = False
+    with metricas.span("generate") as span:
+        try:
+            for token in respuesta.response_gen:
+                # Se registra el tiempo al primer token
+                if ttft is None:
+                    ttft = time.perf_counter() - inicio
+                tokens.append(token)
+                escribir(token)
+        except KeyboardInterrupt:
+            # El usuario canceló con Ctrl+C; al cerrar el generador se corta la conexión con Ollama
+            respuesta.response_gen.close()
+            cancelada = True
+            logger.info("Generación cancelada por el usuario")
+        span.update(tokens=len(tokens), cancelada=cancelada)
+
+    duracion = time.perf_counter() - inicio
+    generacion = duracion - ttft if ttft is not None else 0.0
+    if ttft is not None:
+        metricas.observar("ttft", ttft)
+    if generacion > 0 and tokens:
+        metricas.observar("tokens_por_segundo", len(tokens) / generacion)
+    metricas.incrementar("tokens_generados", len(tokens))
+    return {
+        "texto": "".join(tokens),
+        "ttft": ttft,
+        "tokens": len(tokens),
+        "tokens_por_segundo": len(tokens) / generacion if generacion > 0 else 0.0,
+        "duracion": duracion,
+        "cancelada": cancelada,
+    }
+
+
 # Obtener el índice
 def get_index():
+    from llama_index.core.indices.vector_store import VectorStoreIndex
+    from llama_index.core.storage import StorageContext
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+
     # Creamos o obtenemos un cliente y una nueva colección
-    client = chromadb.PersistentClient(path="./app/chroma_db")
-    client_collection = client.get_or_create_collection("sentencias")
+    client_collection = obtener_coleccion()
+
+    # Agregamos al índice léxico (y al comprimido, si está habilitado) los chunks indexados
+    # antes de que existieran
+    sincronizar_indice_lexico(client_collection)
+    sincronizar_indice_cuantizado(client_collection)
+    sincronizar_indice_documentos(client_collection)
 
     # Creamos el vector store
     vector_store = ChromaVectorStore(chroma_collection=client_collection)
     storage_context = StorageContext.from_defaults(vector_store=vector_store)
-    service_context = ServiceContext.from_defaults(
-        llm=llm,
-        embed_model=embedding_model
-    )
+    service_context = obtener_contexto_servicio()
 
     # Cargamos el índice
     index = VectorStoreIndex.from_vector_store(
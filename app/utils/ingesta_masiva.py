@@ -0,0 +1,253 @@
+import os
+import queue
+import threading
+import time
+
+from .consulta_nexus import cosechar_nexus
+from .ingerir import (
+    TAMANO_LOTE_EMBEDDINGS,
+    USAR_PALABRAS_CLAVE,
+    cosechar_palabras_clave,
+    crear_nodos,
+    embeber_lote,
+    filtrar_nodos_nuevos,
+    insertar_vectores,
+    normalizar_consulta,
+    obtener_coleccion,
+    obtener_indice_documentos,
+    obtener_indice_lexico,
+)
+from .logs import logger
+from .metricas import metricas
+
+"""
+    Ingesta masiva y no interactiva de temas a la base de datos vectorial.
+    Cada tema pasa por un pipeline en streaming: consulta -> split -> embeddings -> inserción.
+    Cada etapa tiene su propia cola acotada y su número de trabajadores; los temas terminados
+    se registran en un archivo de checkpoint para poder reanudar tras una caída.
+"""
+
+# Define la ruta por defecto del checkpoint de la ingesta
+RUTA_CHECKPOINT = "./app/ingesta_checkpoint.txt"
+
+# Marca de fin para los trabajadores de cada etapa
+_FIN = object()
+
+
+class Etapa:
+    def __init__(self, nombre, funcion, trabajadores, entrada, salida=None):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.trabajadores = trabajadores
+        self.entrada = entrada
+        self.salida = salida
+        self.siguiente = None
+        self.procesados = 0
+        self.producidos = 0
+        self.tiempo_ocupado = 0.0
+        self.tiempo_bloqueado = 0.0
+        self.tiempo_esperando = 0.0
+        self.errores = 0
+        self._lock = threading.Lock()
+        self._hilos = []
+
+    def iniciar(self):
+        for i in range(self.trabajadores):
+            hilo = threading.Thread(
+                target=self._trabajar, name=f"{self.nombre}-{i}", daemon=True
+            )
+            hilo.start()
+            self._hilos.append(hilo)
+
+    # Espera a los trabajadores y avisa a la siguiente etapa que no hay más elementos
+    def esperar(self):
+        for hilo in self._hilos:
+            hilo.join()
+        if self.siguiente is not None:
+            for _ in range(self.siguiente.trabajadores):
+                self.salida.put(_FIN)
+
+    def _trabajar(self):
+        while True:
+            inicio = time.perf_counter()
+            elemento = self.entrada.get()
+            esperando = time.perf_counter() - inicio
+            if elemento is _FIN:
+                break
+            bloqueado = 0.0
+            producidos = 0
+            inicio = time.perf_counter()
+            try:
+                for resultado in self.funcion(elemento):
+                    # El tiempo bloqueado en put indica contrapresión de la etapa siguiente
+                    inicio_put = time.perf_counter()
+                    if self.salida is not None:
+                        self.salida.put(resultado)
+                    bloqueado += time.perf_counter() - inicio_put
+                    producidos += 1
+            except Exception as e:
+                with self._lock:
+                    self.errores += 1
+                logger.error(f"Error en la etapa {self.nombre}: {str(e)}")
+            ocupado = time.perf_counter() - inicio - bloqueado
+            with self._lock:
+                self.procesados += 1
+                self.producidos += producidos
+                self.tiempo_ocupado += ocupado
+                self.tiempo_bloqueado += bloqueado
+                self.tiempo_esperando += esperando
+
+    # Resume las métricas de la etapa para el tiempo transcurrido
+    def resumen(self, duracion):
+        total = (self.tiempo_ocupado + self.tiempo_bloqueado + self.tiempo_esperando) or 1.0
+        return (
+            f"{self.nombre}: procesados={self.procesados} ({self.procesados / duracion:.2f}/s) "
+            f"producidos={self.producidos} cola={self.entrada.qsize()}/{self.entrada.maxsize} "
+            f"ocupado={100 * self.tiempo_ocupado / total:.0f}% "
+            f"bloqueado={100 * self.tiempo_bloqueado / total:.0f}% "
+            f"esperando={100 * self.tiempo_esperando / total:.0f}% "
+            f"errores={self.errores}"
+        )
+
+
+# Función para leer los temas ya terminados del checkpoint
+def leer_checkpoint(ruta_checkpoint):
+    if not os.path.exists(ruta_checkpoint):
+        return set()
+    with open(ruta_checkpoint, encoding="utf-8") as f:
+        return {linea.rstrip("\n") for linea in f if linea.strip()}
+
+
+# Función para ingerir una lista de temas con un pipeline por etapas
+def ingerir_temas(
+        temas,
+        ruta_checkpoint=RUTA_CHECKPOINT,
+        paginas=3,
+        tamano_lote=TAMANO_LOTE_EMBEDDINGS,
+        trabajadores_consulta=2,
+        trabajadores_split=2,
+        trabajadores_embeddings=4,
+        tamano_cola=8,
+        intervalo_reporte=30.0,
+        palabras_clave=USAR_PALABRAS_CLAVE,
+):
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+
+    from .preprocesar import split
+
+    # Se omiten los temas terminados en una ejecución anterior
+    terminados = leer_checkpoint(ruta_checkpoint)
+    pendientes = []
+    for tema in temas:
+        tema = tema.strip()
+        if tema and tema not in terminados:
+            terminados.add(tema)
+            pendientes.append(tema)
+    logger.info(
+        f"Ingesta masiva: {len(pendientes)} temas pendientes, "
+        f"{len(terminados) - len(pendientes)} ya terminados"
+    )
+    if not pendientes:
+        return 0
+
+    client_collection = obtener_coleccion()
+    vector_store = ChromaVectorStore(chroma_collection=client_collection)
+    indice_lexico = obtener_indice_lexico()
+    indice_documentos = obtener_indice_documentos()
+
+    # Lotes que faltan por insertar de cada tema, para registrar el checkpoint al terminar
+    lotes_faltantes = {}
+    insertados = 0
+    lock_checkpoint = threading.Lock()
+    checkpoint = open(ruta_checkpoint, "a", encoding="utf-8")
+
+    # Etapa 1: consulta a NEXUS PJ
+    def consultar(tema):
+        if palabras_clave:
+            hits = list(cosechar_palabras_clave(normalizar_consulta(tema), paginas=paginas))
+        else:
+            hits = list(cosechar_nexus(normalizar_consulta(tema), paginas=paginas))
+        yield tema, hits
+
+    # Etapa 2: split, creación de nodos, descarte de los ya indexados y agrupación en lotes
+    def partir(elemento):
+        tema, hits = elemento
+        nodes = []
+        for hit in hits:
+            nodes.extend(crear_nodos(hit, split(hit["content"])))
+        nodes = filtrar_nodos_nuevos(nodes, client_collection)
+        lotes = [nodes[i:i + tamano_lote] for i in range(0, len(nodes), tamano_lote)] or [[]]
+        with lock_checkpoint:
+            lotes_faltantes[tema] = len(lotes)
+        for lote in lotes:
+            yield tema, lote
+
+    # Etapa 3: embeddings
+    def embeber(elemento):
+        tema, lote = elemento
+        yield tema, embeber_lote(lote) if lote else lote
+
+    # Etapa 4: inserción en Chroma y en el índice léxico (un solo trabajador)
+    def insertar(elemento):
+        nonlocal insertados
+        tema, lote = elemento
+        if lote:
+            with metricas.span("upsert", chunks=len(lote)):
+                insertar_vectores(lote, vector_store)
+                indice_lexico.agregar(lote)
+                indice_documentos.agregar(lote)
+            metricas.incrementar("chunks_indexados", len(lote))
+        with lock_checkpoint:
+            insertados += len(lote)
+            lotes_faltantes[tema] -= 1
+            if lotes_faltantes[tema] == 0:
+                del lotes_faltantes[tema]
+                checkpoint.write(tema + "\n")
+                checkpoint.flush()
+                logger.info("Tema terminado: " + tema)
+        yield len(lote)
+
+    colas = [queue.Queue(maxsize=tamano_cola) for _ in range(4)]
+    etapas = [
+        Etapa("consulta", consultar, trabajadores_consulta, colas[0], colas[1]),
+        Etapa("split", partir, trabajadores_split, colas[1], colas[2]),
+        Etapa("embeddings", embeber, trabajadores_embeddings, colas[2], colas[3]),
+        Etapa("insercion", insertar, 1, colas[3]),
+    ]
+    for etapa, siguiente in zip(etapas, etapas[1:]):
+        etapa.siguiente = siguiente
+
+    inicio = time.perf_counter()
+    for etapa in etapas:
+        etapa.iniciar()
+
+    # Reporte periódico de las métricas de cada etapa
+    detener_reporte = threading.Event()
+
+    def reportar():
+        while not detener_reporte.wait(intervalo_reporte):
+            duracion = time.perf_counter() - inicio
+            for etapa in etapas:
+                logger.info(etapa.resumen(duracion))
+
+    threading.Thread(target=reportar, name="reporte-ingesta", daemon=True).start()
+
+    try:
+        # Se alimenta la primera etapa; la cola acotada frena la lectura de temas
+        for tema in pendientes:
+            colas[0].put(tema)
+        for _ in range(etapas[0].trabajadores):
+            colas[0].put(_FIN)
+        for etapa in etapas:
+            etapa.esperar()
+    finally:
+        detener_reporte.set()
+        checkpoint.close()
+
+    duracion = time.perf_counter() - inicio
+    logger.info(f"Ingesta masiva finalizada en {duracion:.2f} segundos")
+    for etapa in etapas:
+        logger.info(etapa.resumen(duracion))
+    logger.info(f"Chunks insertados: {insertados} ({insertados / duracion:.1f} chunks/s)")
+    metricas.exportar_prometheus()
+    return insertados
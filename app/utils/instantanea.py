@@ -0,0 +1,158 @@
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+import numpy as np
+
+from .filtros import cumple_filtro
+from .indice_cuantizado import normalizar_filas
+from .logs import logger
+
+"""
+    Instantáneas de solo lectura de la colección de sentencias para búsquedas sin abrir Chroma.
+    - exportar_instantanea: congela una o varias colecciones (la colección única o todas las
+      particiones) en un archivo plano de vectores float32 normalizados (vectores.f32) y una
+      tabla SQLite compacta con el ID, el texto y los metadatos de cada chunk (registros.db).
+    - Instantanea: mapea el archivo de vectores en memoria (los procesos que la abren comparten
+      la caché de páginas del sistema) y busca los top_k con un solo producto matricial de NumPy.
+"""
+
+
+# Función para exportar una lista de colecciones a una instantánea; reemplaza la anterior al terminar
+def exportar_instantanea(colecciones, ruta, lote=1000):
+    inicio = time.perf_counter()
+    temporal = ruta + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    conexion = sqlite3.connect(os.path.join(temporal, "registros.db"))
+    conexion.execute(
+        """
+        CREATE TABLE registros (
+            posicion INTEGER PRIMARY KEY,
+            id TEXT NOT NULL,
+            texto TEXT NOT NULL,
+            metadatos TEXT NOT NULL
+        )
+        """
+    )
+    cantidad = 0
+    dimension = None
+    with open(os.path.join(temporal, "vectores.f32"), "wb") as f:
+        for client_collection in colecciones:
+            for desplazamiento in range(0, client_collection.count(), lote):
+                resultado = client_collection.get(
+                    include=["embeddings", "documents", "metadatas"], limit=lote, offset=desplazamiento
+                )
+                if not resultado["ids"]:
+                    break
+                vectores = normalizar_filas(resultado["embeddings"])
+                if dimension is not None and vectores.shape[1] != dimension:
+                    raise ValueError(
+                        "Las colecciones tienen dimensiones distintas: "
+                        + str(dimension) + " y " + str(vectores.shape[1])
+                    )
+                dimension = vectores.shape[1]
+                f.write(vectores.tobytes())
+                conexion.executemany(
+                    "INSERT INTO registros VALUES (?, ?, ?, ?)",
+                    [
+                        (cantidad + i, node_id, texto or "", json.dumps(metadatos or {}, ensure_ascii=False))
+                        for i, (node_id, texto, metadatos) in enumerate(
+                            zip(resultado["ids"], resultado["documents"], resultado["metadatas"])
+                        )
+                    ],
+                )
+                cantidad += len(resultado["ids"])
+    conexion.commit()
+    conexion.close()
+    with open(os.path.join(temporal, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"cantidad": cantidad, "dimension": dimension, "creada": time.time()}, f)
+
+    # Los procesos que tienen abierta la instantánea anterior siguen leyendo sus archivos
+    if os.path.exists(ruta):
+        antigua = ruta + ".antigua"
+        shutil.rmtree(antigua, ignore_errors=True)
+        os.rename(ruta, antigua)
+        os.rename(temporal, ruta)
+        shutil.rmtree(antigua, ignore_errors=True)
+    else:
+        os.rename(temporal, ruta)
+    logger.info(
+        "Instantánea exportada en %s: %d chunks en %.2f s", ruta, cantidad, time.perf_counter() - inicio
+    )
+    return cantidad
+
+
+class Instantanea:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(os.path.join(ruta, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.cantidad = meta["cantidad"]
+        self.dimension = meta["dimension"]
+        self.creada = meta["creada"]
+        self._vectores = None
+        if self.cantidad:
+            self._vectores = np.memmap(
+                os.path.join(ruta, "vectores.f32"), dtype=np.float32, mode="r",
+                shape=(self.cantidad, self.dimension),
+            )
+        # immutable=1: SQLite no toma bloqueos ni revisa cambios, la tabla nunca se modifica
+        self._conexion = sqlite3.connect(
+            "file:" + os.path.abspath(os.path.join(ruta, "registros.db")) + "?mode=ro&immutable=1",
+            uri=True,
+            check_same_thread=False,
+        )
+
+    # Retorna el número de chunks de la instantánea
+    def contar(self):
+        return self.cantidad
+
+    # Retorna (id, texto, metadatos) de las posiciones pedidas
+    def _registros(self, posiciones):
+        filas = {}
+        for i in range(0, len(posiciones), 500):
+            lote = posiciones[i:i + 500]
+            for posicion, node_id, texto, metadatos in self._conexion.execute(
+                "SELECT posicion, id, texto, metadatos FROM registros WHERE posicion IN ("
+                + ",".join("?" * len(lote)) + ")",
+                lote,
+            ):
+                filas[posicion] = (node_id, texto, json.loads(metadatos))
+        return filas
+
+    # Retorna (id, texto, metadatos, similitud) de los top_k chunks que cumplen el filtro
+    def buscar(self, embedding, top_k=10, filtro=None):
+        if not self.cantidad:
+            return []
+        puntajes = self._vectores @ normalizar_filas(embedding)
+        if filtro is None:
+            posiciones = _mejores(puntajes, top_k).tolist()
+            filas = self._registros(posiciones)
+            return [filas[posicion] + (float(puntajes[posicion]),) for posicion in posiciones]
+
+        # Con filtros se revisan los candidatos por ventanas crecientes hasta completar top_k
+        resultados = []
+        revisados, ventana = 0, top_k * 4
+        while len(resultados) < top_k and revisados < self.cantidad:
+            posiciones = _mejores(puntajes, ventana)[revisados:].tolist()
+            filas = self._registros(posiciones)
+            for posicion in posiciones:
+                if cumple_filtro(filas[posicion][2], filtro):
+                    resultados.append(filas[posicion] + (float(puntajes[posicion]),))
+                    if len(resultados) == top_k:
+                        break
+            revisados = ventana
+            ventana *= 4
+        return resultados
+
+
+# Función para obtener las posiciones de los k mayores puntajes, ordenadas de mayor a menor
+def _mejores(puntajes, k):
+    if k >= len(puntajes):
+        return np.argsort(-puntajes)
+    seleccion = np.argpartition(-puntajes, k)[:k]
+    return seleccion[np.argsort(-puntajes[seleccion])]
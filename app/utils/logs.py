@@ -1,13 +1,23 @@
+import atexit
 import logging
+import logging.handlers
 import os
-import traceback
+import queue
+import sys
 from datetime import date
 import colorlog
 
+# Nivel mínimo de los logs; con DEBUG se registra además el texto completo de los chunks
+NIVEL_LOG = os.getenv("NEXUSPJLLM_LOG_NIVEL", "INFO").upper()
+
+# Tamaño máximo de cada archivo de log antes de rotarlo y cuántos archivos rotados se conservan
+MAX_BYTES_LOG = 10 * 1024 * 1024
+RESPALDOS_LOG = 5
+
 class Logger:
-    def __init__(self, name):
+    def __init__(self, name, nivel=NIVEL_LOG):
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.DEBUG)
+        self.logger.setLevel(nivel)
 
         console_formatter = colorlog.ColoredFormatter(
             "%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -31,27 +41,42 @@ class Logger:
         self.console_handler = colorlog.StreamHandler()
         self.console_handler.setLevel(logging.DEBUG)
         self.console_handler.setFormatter(console_formatter)
-        self.logger.addHandler(self.console_handler)
 
-        self.file_handler = logging.FileHandler(f"logs/{date.today()}.log")
+        self.file_handler = logging.handlers.RotatingFileHandler(
+            f"logs/{date.today()}.log",
+            maxBytes=MAX_BYTES_LOG,
+            backupCount=RESPALDOS_LOG,
+            encoding="utf-8",
+        )
         self.file_handler.setLevel(logging.DEBUG)
         self.file_handler.setFormatter(file_formatter)
-        self.logger.addHandler(self.file_handler)
 
-    def info(self, message):
-        self.logger.info(message)
+        # Quien registra solo encola el mensaje; la consola y el archivo se escriben en otro hilo
+        cola = queue.SimpleQueue()
+        self.logger.addHandler(logging.handlers.QueueHandler(cola))
+        self.listener = logging.handlers.QueueListener(
+            cola, self.console_handler, self.file_handler, respect_handler_level=True
+        )
+        self.listener.start()
+        # Se vacía la cola antes de terminar el proceso
+        atexit.register(self.listener.stop)
+
+    # Los mensajes aceptan argumentos al estilo de logging ("%s"), que solo se formatean
+    # si el nivel está habilitado
+    def info(self, message, *args):
+        self.logger.info(message, *args)
 
-    def error(self, message):
-        exc_info = traceback.format_exc()
-        self.logger.error(f"{message}\n{exc_info}")
+    def error(self, message, *args):
+        # El traceback solo se adjunta si se está manejando una excepción
+        self.logger.error(message, *args, exc_info=sys.exc_info()[0] is not None)
 
-    def debug(self, message):
-        self.logger.debug(message)
+    def debug(self, message, *args):
+        self.logger.debug(message, *args)
 
-    def warning(self, msg):
-        self.logger.warning(msg)
+    def warning(self, msg, *args):
+        self.logger.warning(msg, *args)
 
-    def critical(self, msg):
-        self.logger.critical(msg)
+    def critical(self, msg, *args):
+        self.logger.critical(msg, *args)
 
-logger = Logger("NexusPJLLM")
\ No newline at end of file
+logger = Logger("NexusPJLLM")
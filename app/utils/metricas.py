@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from .logs import logger
+
+"""
+    Instrumentación de latencias por etapa y contadores del pipeline.
+    - span: mide una etapa (fetch, split, embed, upsert, retrieve, rerank, synthesize) y la
+      registra como una línea JSON con su traza, su etapa padre y sus atributos.
+    - observar: registra una latencia medida fuera de un span (por ejemplo, el primer token).
+    - incrementar: suma a un contador (chunks, tokens, aciertos de caché, ...).
+    - percentiles / resumen: percentiles p50, p95 y p99 sobre una ventana de las últimas muestras.
+    - texto_prometheus / exportar_prometheus: construye las métricas en formato de texto de
+      Prometheus o las escribe en un archivo.
+"""
+
+# Define las rutas por defecto de las trazas y de las métricas exportadas
+RUTA_TRAZAS = "./app/metricas/trazas.jsonl"
+RUTA_PROMETHEUS = "./app/metricas/nexuspjllm.prom"
+
+# Percentiles que se reportan y exportan
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class Metricas:
+    def __init__(self, ruta_trazas=RUTA_TRAZAS, ventana=1000):
+        self.ruta_trazas = ruta_trazas
+        self.ventana = ventana
+        self._muestras = defaultdict(lambda: deque(maxlen=self.ventana))
+        self._sumas = defaultdict(float)
+        self._cuentas = defaultdict(int)
+        self._contadores = defaultdict(float)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._archivo = None
+
+    # Mide una etapa; los atributos pueden completarse dentro del bloque
+    @contextmanager
+    def span(self, nombre, **atributos):
+        pila = getattr(self._local, "pila", None)
+        if pila is None:
+            pila = self._local.pila = []
+        # Las etapas anidadas comparten la traza de la etapa raíz
+        traza = pila[-1][1] if pila else uuid.uuid4().hex[:16]
+        padre = pila[-1][0] if pila else None
+        pila.append((nombre, traza))
+        inicio = time.perf_counter()
+        error = None
+        try:
+            yield atributos
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            pila.pop()
+            if error is not None:
+                atributos["error"] = error
+            self.observar(nombre, duracion, traza=traza, padre=padre, **atributos)
+
+    # Registra una latencia en la ventana de la etapa y en el archivo de trazas
+    def observar(self, nombre, segundos, **atributos):
+        registro = {"ts": time.time(), "span": nombre, "duracion": segundos}
+        registro.update(atributos)
+        with self._lock:
+            self._muestras[nombre].append(segundos)
+            self._sumas[nombre] += segundos
+            self._cuentas[nombre] += 1
+            self._escribir(registro)
+
+    # Suma un valor a un contador
+    def incrementar(self, nombre, valor=1):
+        with self._lock:
+            self._contadores[nombre] += valor
+
+    # Escribe una línea en el archivo de trazas (se abre en el primer uso)
+    def _escribir(self, registro):
+        if not self.ruta_trazas:
+            return
+        try:
+            if self._archivo is None:
+                os.makedirs(os.path.dirname(self.ruta_trazas) or ".", exist_ok=True)
+                self._archivo = open(self.ruta_trazas, "a", encoding="utf-8")
+            self._archivo.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+            self._archivo.flush()
+        except OSError as e:
+            # Las métricas nunca deben interrumpir la aplicación
+            logger.warning("No se pudo escribir la traza: " + str(e))
+            self.ruta_trazas = None
+
+    # Calcula los percentiles de la ventana de una etapa (rango más cercano)
+    def percentiles(self, nombre):
+        with self._lock:
+            muestras = sorted(self._muestras.get(nombre, ()))
+        if not muestras:
+            return {}
+        return {
+            p: muestras[min(len(muestras) - 1, max(0, round(p * len(muestras)) - 1))]
+            for p in PERCENTILES
+        }
+
+    # Retorna los contadores acumulados
+    def contadores(self):
+        with self._lock:
+            return dict(self._contadores)
+
+    # Resume las latencias y los contadores en un texto para el log
+    def resumen(self):
+        with self._lock:
+            nombres = sorted(self._muestras)
+            cuentas = dict(self._cuentas)
+        lineas = []
+        for nombre in nombres:
+            percentiles = self.percentiles(nombre)
+            lineas.append(
+                f"{nombre}: n={cuentas[nombre]} "
+                + " ".join(f"p{int(p * 100)}={valor:.3f}s" for p, valor in percentiles.items())
+            )
+        lineas.extend(f"{nombre}={valor:g}" for nombre, valor in sorted(self.contadores().items()))
+        return "\n".join(lineas)
+
+    # Construye las métricas en formato de texto de Prometheus
+    def texto_prometheus(self):
+        with self._lock:
+            nombres = sorted(self._muestras)
+            sumas = dict(self._sumas)
+            cuentas = dict(self._cuentas)
+            contadores = dict(self._contadores)
+        lineas = [
+            "# HELP nexuspjllm_etapa_segundos Latencia de cada etapa del pipeline",
+            "# TYPE nexuspjllm_etapa_segundos summary",
+        ]
+        for nombre in nombres:
+            for p, valor in self.percentiles(nombre).items():
+                lineas.append(f'nexuspjllm_etapa_segundos{{etapa="{nombre}",quantile="{p}"}} {valor}')
+            lineas.append(f'nexuspjllm_etapa_segundos_sum{{etapa="{nombre}"}} {sumas[nombre]}')
+            lineas.append(f'nexuspjllm_etapa_segundos_count{{etapa="{nombre}"}} {cuentas[nombre]}')
+        for nombre, valor in sorted(contadores.items()):
+            lineas.append(f"# TYPE nexuspjllm_{nombre}_total counter")
+            lineas.append(f"nexuspjllm_{nombre}_total {valor:g}")
+        return "\n".join(lineas) + "\n"
+
+    # Escribe las métricas en formato de texto de Prometheus (para el textfile collector)
+    def exportar_prometheus(self, ruta=RUTA_PROMETHEUS):
+        texto = self.texto_prometheus()
+        # Se escribe a un archivo temporal y se reemplaza para que nunca se lea a medias
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(temporal, ruta)
+        return ruta
+
+
+# Instancia compartida por todo el proceso
+metricas = Metricas()
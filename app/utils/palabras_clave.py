@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .logs import logger
+from .metricas import metricas
+
+"""
+    Extracción de palabras clave de una consulta para buscar en NEXUS PJ.
+    - ExtractorPalabrasClave: instancia de KeyBERT que se crea una sola vez y calcula los
+      embeddings con el modelo de embeddings ya cargado (y su caché), con una caché en memoria
+      de las palabras clave de cada consulta normalizada.
+    - construir_subconsultas: convierte las palabras clave en varias subconsultas para NEXUS PJ.
+"""
+
+# Palabras vacías en español (sin tildes, como quedan tras normalizar_consulta)
+PALABRAS_VACIAS = (
+    "a al algo ante como con contra cual cuando de del desde donde durante e el ella ellos en "
+    "entre es esa ese esta este fue ha hay la las le les lo los mas me mi muy ni no nos o para "
+    "pero por que quien se segun ser si sin sobre su sus tiene un una uno y ya"
+).split()
+
+
+class ExtractorPalabrasClave:
+    def __init__(self, embedding_model, max_consultas=1024):
+        from keybert import KeyBERT
+        from keybert.backend import BaseEmbedder
+
+        # KeyBERT usa el modelo de embeddings de la aplicación en lugar de cargar el suyo
+        class EmbedderAplicacion(BaseEmbedder):
+            def embed(self, documents, verbose=False):
+                return np.asarray(
+                    embedding_model.get_text_embedding_batch(list(documents)), dtype=np.float32
+                )
+
+        self._modelo = KeyBERT(model=EmbedderAplicacion())
+        self._cache = OrderedDict()
+        self._max_consultas = max_consultas
+        self._lock = threading.Lock()
+
+    # Retorna las palabras clave (frases de uno o dos términos) de una consulta normalizada
+    def extraer(self, consulta, top_n=3, diversidad=0.5):
+        clave = (consulta, top_n, diversidad)
+        with self._lock:
+            if clave in self._cache:
+                self._cache.move_to_end(clave)
+                metricas.incrementar("cache_palabras_clave_aciertos")
+                return list(self._cache[clave])
+        metricas.incrementar("cache_palabras_clave_fallos")
+
+        with metricas.span("palabras_clave"):
+            # MMR evita que las palabras clave sean variantes de la misma frase
+            resultado = self._modelo.extract_keywords(
+                consulta,
+                keyphrase_ngram_range=(1, 2),
+                stop_words=PALABRAS_VACIAS,
+                top_n=top_n,
+                use_mmr=True,
+                diversity=diversidad,
+            )
+        palabras_clave = [palabra_clave for palabra_clave, puntaje in resultado if puntaje > 0]
+
+        with self._lock:
+            self._cache[clave] = palabras_clave
+            if len(self._cache) > self._max_consultas:
+                self._cache.popitem(last=False)
+        logger.info("Palabras clave extraídas: " + str(palabras_clave))
+        return list(palabras_clave)
+
+
+# Función para convertir las palabras clave en subconsultas: todas juntas (con AND, la más
+# precisa) y cada una por separado (para mejorar el recall)
+def construir_subconsultas(palabras_clave):
+    subconsultas = []
+    if len(palabras_clave) > 1:
+        subconsultas.append(" & ".join(palabras_clave))
+    for palabra_clave in palabras_clave:
+        if palabra_clave not in subconsultas:
+            subconsultas.append(palabra_clave)
+    return subconsultas
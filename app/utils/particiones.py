@@ -0,0 +1,230 @@
+import json
+import os
+import re
+import shutil
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from .filtros import fecha_a_numero, rango_anios
+from .logs import logger
+
+"""
+    Particionado de la base vectorial por año o por despacho.
+    Cada partición es una base de Chroma independiente en su propia carpeta, de modo que
+    agregar sentencias nuevas solo escribe en la partición que les corresponde y las
+    particiones históricas no se tocan.
+    - Particiones.agregar: envía cada chunk a la partición de su año (o despacho).
+    - Particiones.buscar: consulta en paralelo las particiones relevantes para los filtros y
+      fusiona los top_k por similitud.
+    - Particiones.compactar: reescribe una partición en una base nueva y puede sellarla;
+      las particiones selladas solo se abren para lectura. Los chunks nuevos de una partición
+      sellada van a su partición de desborde (<partición>_nuevas), que se consulta junto con ella.
+"""
+
+# Define la ruta de las particiones y los criterios de particionado soportados
+RUTA_PARTICIONES = "./app/chroma_particiones"
+CRITERIOS = ("anio", "despacho")
+
+# Sufijo de la partición que recibe los chunks nuevos de una partición sellada
+SUFIJO_DESBORDE = "_nuevas"
+
+
+# Función para convertir un texto en un nombre válido de carpeta y colección
+def _slug(texto):
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", "_", texto).strip("_") or "sin_valor"
+
+
+# Función para obtener el nombre de la partición de un chunk según sus metadatos
+def nombre_particion(metadatos, criterio):
+    if criterio == "anio":
+        fecha = metadatos.get("Fecha_Num") or fecha_a_numero(metadatos.get("Fecha"))
+        return "anio_" + (str(fecha // 10000) if fecha else "sin_fecha")
+    return "despacho_" + _slug(metadatos.get("Despacho", ""))
+
+
+# Función para obtener la partición base de una partición de desborde
+def particion_base(nombre):
+    return nombre[:-len(SUFIJO_DESBORDE)] if nombre.endswith(SUFIJO_DESBORDE) else nombre
+
+
+class Particiones:
+    def __init__(self, ruta=RUTA_PARTICIONES, criterio="anio", nombre_coleccion="sentencias", max_concurrencia=4):
+        if criterio not in CRITERIOS:
+            raise ValueError("Criterio de particionado no soportado: " + str(criterio))
+        self.ruta = ruta
+        self.criterio = criterio
+        self.nombre_coleccion = nombre_coleccion
+        self.max_concurrencia = max_concurrencia
+        self._colecciones = {}
+        self._lock = threading.RLock()
+
+        os.makedirs(ruta, exist_ok=True)
+        self._ruta_manifiesto = os.path.join(ruta, "particiones.json")
+        self._manifiesto = {"criterio": criterio, "particiones": {}}
+        if os.path.exists(self._ruta_manifiesto):
+            with open(self._ruta_manifiesto, encoding="utf-8") as f:
+                self._manifiesto = json.load(f)
+            if self._manifiesto["criterio"] != criterio:
+                raise ValueError(
+                    "Las particiones en " + ruta + " son por " + self._manifiesto["criterio"]
+                    + ", no por " + criterio
+                )
+
+    def _guardar_manifiesto(self):
+        temporal = self._ruta_manifiesto + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self._manifiesto, f, indent=2)
+        os.replace(temporal, self._ruta_manifiesto)
+
+    # Retorna los nombres de las particiones existentes
+    def nombres(self):
+        return sorted(self._manifiesto["particiones"])
+
+    def sellada(self, nombre):
+        return self._manifiesto["particiones"].get(nombre, {}).get("sellada", False)
+
+    # Abre (o crea) la colección de una partición, cada una con su propia base de Chroma
+    def coleccion(self, nombre):
+        with self._lock:
+            if nombre not in self._colecciones:
+                import chromadb
+
+                client = chromadb.PersistentClient(path=os.path.join(self.ruta, nombre))
+                self._colecciones[nombre] = client.get_or_create_collection(
+                    self.nombre_coleccion, metadata={"hnsw:space": "cosine"}
+                )
+                if nombre not in self._manifiesto["particiones"]:
+                    self._manifiesto["particiones"][nombre] = {"sellada": False}
+                    self._guardar_manifiesto()
+            return self._colecciones[nombre]
+
+    # Agrupa los nodos por partición base (sin considerar el desborde)
+    def agrupar(self, nodes):
+        grupos = {}
+        for node in nodes:
+            grupos.setdefault(nombre_particion(node.metadata, self.criterio), []).append(node)
+        return grupos
+
+    # Retorna los IDs de los nodos que ya existen en su partición o en su desborde
+    def existentes(self, nodes, lote=500):
+        encontrados = set()
+        for nombre, grupo in self.agrupar(nodes).items():
+            ids = [node.node_id for node in grupo]
+            for particion in (nombre, nombre + SUFIJO_DESBORDE):
+                if particion not in self._manifiesto["particiones"]:
+                    continue
+                for i in range(0, len(ids), lote):
+                    encontrados.update(
+                        self.coleccion(particion).get(ids=ids[i:i + lote], include=[])["ids"]
+                    )
+        return encontrados
+
+    # Inserta nodos con embedding en la partición que les corresponde; si está sellada, en su
+    # partición de desborde. Retorna el número de nodos insertados
+    def agregar(self, nodes):
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        for nombre, grupo in self.agrupar(nodes).items():
+            if self.sellada(nombre):
+                logger.info("Partición %s sellada, %d chunks van a su desborde", nombre, len(grupo))
+                nombre += SUFIJO_DESBORDE
+            ChromaVectorStore(chroma_collection=self.coleccion(nombre)).add(grupo)
+        return len(nodes)
+
+    # Retorna las particiones que pueden tener resultados para los filtros
+    def relevantes(self, filtros=None):
+        nombres = self.nombres()
+        filtros = filtros or {}
+        if self.criterio == "despacho" and filtros.get("despacho"):
+            return [n for n in nombres if particion_base(n) == "despacho_" + _slug(filtros["despacho"])]
+        if self.criterio == "anio":
+            desde, hasta = rango_anios(filtros)
+            if desde is not None or hasta is not None:
+                seleccion = []
+                for nombre in nombres:
+                    anio = particion_base(nombre)[len("anio_"):]
+                    # Los chunks sin fecha nunca cumplen un filtro de fechas
+                    if not anio.isdigit():
+                        continue
+                    if (desde is None or int(anio) >= desde) and (hasta is None or int(anio) <= hasta):
+                        seleccion.append(nombre)
+                return seleccion
+        return nombres
+
+    # Consulta una partición y retorna (id, texto, metadatos, similitud)
+    def _buscar_en(self, nombre, embedding, top_k, filtro):
+        coleccion = self.coleccion(nombre)
+        cantidad = coleccion.count()
+        if not cantidad:
+            return []
+        resultado = coleccion.query(
+            query_embeddings=[list(embedding)],
+            n_results=min(top_k, cantidad),
+            where=filtro,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            (node_id, texto, metadatos, 1.0 - distancia)
+            for node_id, texto, metadatos, distancia in zip(
+                resultado["ids"][0], resultado["documents"][0],
+                resultado["metadatas"][0], resultado["distances"][0],
+            )
+        ]
+
+    # Consulta en paralelo las particiones y fusiona los top_k por similitud
+    def buscar(self, embedding, top_k=10, filtro=None, nombres=None):
+        nombres = self.nombres() if nombres is None else nombres
+        if not nombres:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrencia, len(nombres))) as executor:
+            parciales = executor.map(
+                lambda nombre: self._buscar_en(nombre, embedding, top_k, filtro), nombres
+            )
+            resultados = [resultado for parcial in parciales for resultado in parcial]
+        return sorted(resultados, key=lambda resultado: -resultado[3])[:top_k]
+
+    # Reescribe una partición en una base nueva (sin espacio de registros borrados) y la sella.
+    # Detiene todos los clientes de Chroma del proceso, incluida la colección principal, por lo
+    # que solo debe usarse desde app/particiones.py y no con la aplicación atendiendo consultas
+    def compactar(self, nombre, sellar=True, lote=1000):
+        import chromadb
+        from chromadb.api.client import SharedSystemClient
+
+        if nombre not in self._manifiesto["particiones"]:
+            raise ValueError("No existe la partición " + nombre)
+        if sellar and nombre.endswith(SUFIJO_DESBORDE):
+            raise ValueError("La partición de desborde " + nombre + " no se puede sellar")
+        with self._lock:
+            origen = self.coleccion(nombre)
+            ruta_nueva = os.path.join(self.ruta, nombre + ".compactando")
+            shutil.rmtree(ruta_nueva, ignore_errors=True)
+            destino = chromadb.PersistentClient(path=ruta_nueva).get_or_create_collection(
+                self.nombre_coleccion, metadata={"hnsw:space": "cosine"}
+            )
+            total = origen.count()
+            for desplazamiento in range(0, total, lote):
+                resultado = origen.get(
+                    include=["embeddings", "documents", "metadatas"], limit=lote, offset=desplazamiento
+                )
+                destino.add(
+                    ids=resultado["ids"],
+                    embeddings=resultado["embeddings"],
+                    documents=resultado["documents"],
+                    metadatas=resultado["metadatas"],
+                )
+            # Se cierran los clientes en caché antes de reemplazar la carpeta; las demás
+            # particiones se vuelven a abrir en su próximo uso
+            self._colecciones.clear()
+            SharedSystemClient.clear_system_cache()
+            ruta = os.path.join(self.ruta, nombre)
+            ruta_antigua = ruta + ".antigua"
+            os.rename(ruta, ruta_antigua)
+            os.rename(ruta_nueva, ruta)
+            shutil.rmtree(ruta_antigua, ignore_errors=True)
+            self._manifiesto["particiones"][nombre] = {"sellada": sellar, "chunks": total}
+            self._guardar_manifiesto()
+        logger.info("Partición %s compactada: %d chunks%s", nombre, total, " (sellada)" if sellar else "")
+        return total
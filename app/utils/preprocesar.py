@@ -1,39 +1,77 @@
 import re
+from concurrent.futures import ProcessPoolExecutor
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 """
     Funciones para partir texto en chunks y preprocesarlos
+    - split: parte un documento en chunks limpios.
+    - split_varios: parte varios documentos, en paralelo con varios procesos si son muchos.
 """
 
+# Instancia única del splitter, reutilizada por todas las llamadas
+_splitter = RecursiveCharacterTextSplitter(
+    separators=[", ", ". ", " (", ") ", ": ", " - ", "\n"],
+    chunk_size=1024,
+    chunk_overlap=15,
+    length_function=len,
+    is_separator_regex=False,
+)
 
-# Función para partir texto en chunks
-def split(content):
-    # Crea una instancia del splitter
-    splitter = RecursiveCharacterTextSplitter(
-        separators=[", ", ". ", " (", ") ", ": ", " - ", "\n"],
-        chunk_size=1024,
-        chunk_overlap=15,
-        length_function=len,
-        is_separator_regex=False,
-    )
-    # Partimos el contenido en chunks
-    chunks = splitter.split_text(content)
-    # Unimos los saltos de línea de cada chunk en una sola línea
-    chunks = ["".join(chunk.splitlines()) for chunk in chunks]
-    # Removemos los puntos y comas al inicio de cada chunk
-    chunks = [re.sub(r"^[,.]", "", chunk) for chunk in chunks]
+# Patrón precompilado de correos electrónicos
+_PATRON_CORREO = re.compile(r"[\w\.-]+@[\w\.-]+")
+
+# Patrón de saltos de línea (los mismos caracteres que separa str.splitlines)
+_PATRON_SALTOS = re.compile("[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]+")
+
+# Patrón de caracteres de control ASCII
+_PATRON_CONTROL = re.compile("[\x00-\x1f\x7f]+")
+
+# Número mínimo de documentos para usar varios procesos
+MIN_DOCUMENTOS_PROCESOS = 32
+
+
+# Función para limpiar un chunk en una sola pasada; retorna None si es muy corto.
+# Cada paso solo se ejecuta si el chunk contiene algo que limpiar (saltos, "@", viñetas
+# o caracteres no imprimibles), en el mismo orden que la limpieza original.
+def _limpiar(chunk):
+    imprimible = chunk.isprintable()
+    # Unimos los saltos de línea del chunk en una sola línea
+    if not imprimible:
+        chunk = _PATRON_SALTOS.sub("", chunk)
+    # Removemos el punto o la coma al inicio del chunk
+    if chunk[:1] in (",", "."):
+        chunk = chunk[1:]
     # Eliminamos los correos electrónicos y lo sustituimos por la palabra "[Correo]"
-    chunks = [re.sub(r"[\w\.-]+@[\w\.-]+", "[Correo]", chunk) for chunk in chunks]
+    if "@" in chunk:
+        chunk = _PATRON_CORREO.sub("[Correo]", chunk)
     # Removemos bullet-points
-    chunks = [re.sub(r"•", "", chunk) for chunk in chunks]
-    # Chequear si el caracter es imprimible, si no, lo removemos
-    chunks = [
-        "".join([char for char in chunk if char.isprintable()]) for chunk in chunks
-    ]
+    if "•" in chunk:
+        chunk = chunk.replace("•", "")
+    # Removemos los caracteres de control y, si aún quedan, los demás no imprimibles
+    if not imprimible:
+        chunk = _PATRON_CONTROL.sub("", chunk)
+        if not chunk.isprintable():
+            chunk = "".join([char for char in chunk if char.isprintable()])
     # Si el chunk es menor a 100 caracteres, lo removemos
-    chunks = [chunk for chunk in chunks if len(chunk) > 100]
-    # Removemos los espacio en blanco al inicio y al final de cada chunk
-    chunks = [chunk.strip() for chunk in chunks]
+    if len(chunk) <= 100:
+        return None
+    # Removemos los espacio en blanco al inicio y al final del chunk
+    return chunk.strip()
+
+
+# Función para partir texto en chunks
+def split(content):
+    # Partimos el contenido en chunks y los limpiamos en una sola pasada
+    chunks = (_limpiar(chunk) for chunk in _splitter.split_text(content))
     # Retornamos los chunks
-    return chunks
+    return [chunk for chunk in chunks if chunk is not None]
+
+
+# Función para partir varios documentos, usando varios procesos cuando son muchos
+def split_varios(contenidos, procesos=None):
+    contenidos = list(contenidos)
+    if len(contenidos) < MIN_DOCUMENTOS_PROCESOS or procesos == 1:
+        return [split(content) for content in contenidos]
+    with ProcessPoolExecutor(max_workers=procesos) as executor:
+        return list(executor.map(split, contenidos, chunksize=8))
@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+from .logs import logger
+from .metricas import metricas
+
+"""
+    Registro de rerankers (cross-encoders) compartido por todo el proceso.
+    - obtener_reranker: carga cada cross-encoder una sola vez y lo reutiliza entre consultas.
+    - Reranker: puntúa los pares (consulta, chunk) por lotes, con caché LRU opcional de puntajes.
+"""
+
+# Define el modelo de reranking por defecto
+MODELO_RERANKER = "cross-encoder/ms-marco-MiniLM-L-2-v2"
+
+# Registro de rerankers cargados por modelo
+_rerankers = {}
+_lock = threading.Lock()
+
+
+class Reranker:
+    def __init__(self, modelo=MODELO_RERANKER, tamano_lote=32, max_cache=10_000):
+        # Se importa aquí para no cargar sentence_transformers hasta que se necesite
+        from sentence_transformers import CrossEncoder
+
+        logger.info("Cargando reranker " + modelo + "...")
+        self.modelo = modelo
+        self.tamano_lote = tamano_lote
+        self.max_cache = max_cache
+        self._cross_encoder = CrossEncoder(modelo, max_length=512)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        logger.info("Reranker cargado")
+
+    # Puntúa los pares (consulta, chunk) que no estén en caché
+    def puntuar(self, consulta, nodes):
+        puntajes = [None] * len(nodes)
+        faltantes = []
+        with self._lock:
+            for i, node in enumerate(nodes):
+                clave = (consulta, node.node.node_id)
+                if clave in self._cache:
+                    self._cache.move_to_end(clave)
+                    puntajes[i] = self._cache[clave]
+                else:
+                    faltantes.append(i)
+
+        if faltantes:
+            from llama_index.core.schema import MetadataMode
+
+            pares = [
+                (consulta, nodes[i].node.get_content(metadata_mode=MetadataMode.EMBED))
+                for i in faltantes
+            ]
+            nuevos = self._cross_encoder.predict(
+                pares, batch_size=self.tamano_lote, show_progress_bar=False
+            )
+            with self._lock:
+                for i, puntaje in zip(faltantes, nuevos):
+                    puntajes[i] = float(puntaje)
+                    if self.max_cache:
+                        self._cache[(consulta, nodes[i].node.node_id)] = puntajes[i]
+                # Se desalojan los puntajes usados hace más tiempo
+                while len(self._cache) > self.max_cache:
+                    self._cache.popitem(last=False)
+
+        metricas.incrementar("cache_reranker_aciertos", len(nodes) - len(faltantes))
+        metricas.incrementar("cache_reranker_fallos", len(faltantes))
+        logger.debug(
+            "Reranker: %d puntajes en caché, %d calculados", len(nodes) - len(faltantes), len(faltantes)
+        )
+        return puntajes
+
+    # Reordena los nodos según el cross-encoder y retorna los top_n
+    def rerankear(self, consulta, nodes, top_n=None):
+        if not nodes:
+            return []
+        for node, puntaje in zip(nodes, self.puntuar(consulta, nodes)):
+            node.score = puntaje
+        nodes = sorted(nodes, key=lambda node: -node.score)
+        return nodes[:top_n] if top_n is not None else nodes
+
+
+# Función para obtener un reranker ya cargado o cargarlo la primera vez
+def obtener_reranker(modelo=MODELO_RERANKER, tamano_lote=32, max_cache=10_000):
+    with _lock:
+        if modelo not in _rerankers:
+            _rerankers[modelo] = Reranker(modelo, tamano_lote, max_cache)
+        return _rerankers[modelo]
@@ -0,0 +1,238 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .logs import logger
+
+"""
+    Almacén de resultados de búsqueda de solo anexado, en lugar de un archivo por consulta.
+    - Cada búsqueda se agrega como una línea JSON (consulta, fecha, IDs, scores, texto y
+      metadatos de los nodos) al segmento actual; al superar su tamaño máximo se abre uno nuevo.
+    - Un índice SQLite guarda el segmento y el offset de cada registro, para buscar por consulta
+      o por ID_Sentencia sin recorrer los segmentos. Si se pierde, se reconstruye desde ellos.
+    - formatear_texto / exportar_texto: producen el formato de texto de los antiguos archivos
+      chunks/chunks<uuid>.txt.
+"""
+
+# Define la ruta por defecto del almacén y el tamaño máximo de cada segmento
+RUTA_RESULTADOS = "./app/resultados"
+MAX_BYTES_SEGMENTO = 64 * 1024 * 1024
+
+
+# Función para normalizar una consulta para buscarla en el índice
+def normalizar(consulta):
+    return " ".join(consulta.lower().split())
+
+
+# Función para formatear los nodos de un registro con el formato de texto de guardar_nodos
+def formatear_texto(nodos):
+    lineas = []
+    for nodo in nodos:
+        metadatos = nodo["metadatos"]
+        lineas.extend([
+            "--------------------------------------------------",
+            "Chunk: " + nodo["texto"],
+            "ID del Chunk: " + nodo["id"],
+            "ID de la Sentencia: " + metadatos["ID_Sentencia"],
+            "Despacho: " + metadatos["Despacho"],
+            "Expediente: " + metadatos["Expediente"],
+            "Tipo de información: " + metadatos["Tipo de Información"],
+            "Fecha: " + metadatos["Fecha"],
+            "--------------------------------------------------",
+            "",
+        ])
+    return "".join(linea + "\n" for linea in lineas)
+
+
+class AlmacenResultados:
+    def __init__(self, ruta=RUTA_RESULTADOS, max_bytes_segmento=MAX_BYTES_SEGMENTO):
+        self.ruta = ruta
+        self.max_bytes_segmento = max_bytes_segmento
+        self._lock = threading.Lock()
+
+        os.makedirs(ruta, exist_ok=True)
+        self._conexion = sqlite3.connect(os.path.join(ruta, "indice.db"), check_same_thread=False)
+        self._conexion.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS registros (
+                id INTEGER PRIMARY KEY,
+                segmento INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                longitud INTEGER NOT NULL,
+                consulta TEXT NOT NULL,
+                fecha REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_consulta ON registros (consulta);
+            CREATE TABLE IF NOT EXISTS sentencias (
+                id_sentencia TEXT NOT NULL,
+                registro INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sentencia ON sentencias (id_sentencia);
+            """
+        )
+        self._conexion.commit()
+
+        segmentos = self._segmentos()
+        self._segmento = segmentos[-1] if segmentos else 1
+        if segmentos:
+            self._descartar_linea_incompleta(segmentos[-1])
+        self._reconstruir_indice(segmentos)
+
+    def _ruta_segmento(self, segmento):
+        return os.path.join(self.ruta, f"segmento-{segmento:06d}.jsonl")
+
+    # Retorna los números de los segmentos existentes, en orden
+    def _segmentos(self):
+        return sorted(
+            int(os.path.basename(ruta)[len("segmento-"):-len(".jsonl")])
+            for ruta in glob.glob(os.path.join(self.ruta, "segmento-*.jsonl"))
+        )
+
+    # Trunca el segmento activo tras su último salto de línea, para que una escritura
+    # interrumpida no quede pegada al siguiente registro
+    def _descartar_linea_incompleta(self, segmento, bloque=65536):
+        ruta = self._ruta_segmento(segmento)
+        with open(ruta, "r+b") as f:
+            tamano = f.seek(0, os.SEEK_END)
+            fin = tamano
+            while fin > 0:
+                inicio = max(0, fin - bloque)
+                f.seek(inicio)
+                posicion = f.read(fin - inicio).rfind(b"\n")
+                if posicion != -1:
+                    fin = inicio + posicion + 1
+                    break
+                fin = inicio
+            if fin < tamano:
+                f.truncate(fin)
+                logger.warning(
+                    "Almacén de resultados: se descartaron %d bytes incompletos de %s", tamano - fin, ruta
+                )
+
+    # Indexa los registros de los segmentos que no estén en el índice
+    def _reconstruir_indice(self, segmentos):
+        with self._lock:
+            ultimo = self._conexion.execute(
+                "SELECT segmento, offset + longitud FROM registros ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+            agregados = 0
+            for segmento in segmentos:
+                if ultimo is not None and segmento < ultimo[0]:
+                    continue
+                inicio = ultimo[1] if ultimo is not None and segmento == ultimo[0] else 0
+                with open(self._ruta_segmento(segmento), "rb") as f:
+                    f.seek(inicio)
+                    offset = inicio
+                    for linea in f:
+                        # Una última línea incompleta (escritura interrumpida) se ignora
+                        if not linea.endswith(b"\n"):
+                            break
+                        self._indexar(json.loads(linea), segmento, offset, len(linea))
+                        offset += len(linea)
+                        agregados += 1
+            self._conexion.commit()
+        if agregados:
+            logger.info("Almacén de resultados: %d registros reindexados", agregados)
+
+    def _indexar(self, registro, segmento, offset, longitud):
+        self._conexion.execute(
+            "INSERT INTO registros VALUES (?, ?, ?, ?, ?, ?)",
+            (registro["id"], segmento, offset, longitud, normalizar(registro["consulta"]), registro["fecha"]),
+        )
+        self._conexion.executemany(
+            "INSERT INTO sentencias VALUES (?, ?)",
+            [(id_sentencia, registro["id"]) for id_sentencia in
+             {nodo["metadatos"].get("ID_Sentencia") for nodo in registro["nodos"]} if id_sentencia],
+        )
+
+    # Agrega los resultados de una búsqueda y retorna el ID del registro
+    def guardar(self, consulta, retrieved_nodes):
+        with self._lock:
+            id_registro = (self._conexion.execute("SELECT MAX(id) FROM registros").fetchone()[0] or 0) + 1
+            registro = {
+                "id": id_registro,
+                "fecha": time.time(),
+                "consulta": consulta,
+                "nodos": [
+                    {
+                        "id": node.node.node_id,
+                        "score": node.score,
+                        "texto": node.node.get_content(),
+                        "metadatos": node.node.metadata,
+                    }
+                    for node in retrieved_nodes
+                ],
+            }
+            linea = (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8")
+            ruta = self._ruta_segmento(self._segmento)
+            if os.path.exists(ruta) and os.path.getsize(ruta) >= self.max_bytes_segmento:
+                self._segmento += 1
+                ruta = self._ruta_segmento(self._segmento)
+            with open(ruta, "ab") as f:
+                offset = f.tell()
+                f.write(linea)
+            self._indexar(registro, self._segmento, offset, len(linea))
+            self._conexion.commit()
+        return id_registro
+
+    # Lee los registros de una lista de filas (segmento, offset, longitud)
+    def _leer(self, filas):
+        registros = []
+        for segmento, offset, longitud in filas:
+            with open(self._ruta_segmento(segmento), "rb") as f:
+                f.seek(offset)
+                registros.append(json.loads(f.read(longitud)))
+        return registros
+
+    # Retorna un registro por su ID (None si no existe)
+    def obtener(self, id_registro):
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT segmento, offset, longitud FROM registros WHERE id = ?", (id_registro,)
+            ).fetchall()
+        registros = self._leer(filas)
+        return registros[0] if registros else None
+
+    # Retorna los registros de una consulta, del más reciente al más antiguo
+    def buscar_por_consulta(self, consulta, limite=None):
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT segmento, offset, longitud FROM registros WHERE consulta = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (normalizar(consulta), limite if limite is not None else -1),
+            ).fetchall()
+        return self._leer(filas)
+
+    # Retorna los registros en los que aparece una sentencia, del más reciente al más antiguo
+    def buscar_por_sentencia(self, id_sentencia, limite=None):
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT r.segmento, r.offset, r.longitud FROM registros r "
+                "JOIN sentencias s ON s.registro = r.id WHERE s.id_sentencia = ? "
+                "ORDER BY r.id DESC LIMIT ?",
+                (id_sentencia, limite if limite is not None else -1),
+            ).fetchall()
+        return self._leer(filas)
+
+    # Retorna todos los registros en orden de guardado
+    def recorrer(self):
+        for segmento in self._segmentos():
+            with open(self._ruta_segmento(segmento), "rb") as f:
+                for linea in f:
+                    if linea.endswith(b"\n"):
+                        yield json.loads(linea)
+
+
+# Función para exportar registros al formato de texto, un archivo por registro
+def exportar_texto(registros, directorio="chunks"):
+    os.makedirs(directorio, exist_ok=True)
+    rutas = []
+    for registro in registros:
+        ruta = os.path.join(directorio, f"chunks{registro['id']}.txt")
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write(formatear_texto(registro["nodos"]))
+        rutas.append(ruta)
+    return rutas
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .filtros import construir_filtro, parsear_filtros
+from .ingerir import (
+    DOCUMENTOS_TOP_K,
+    MAX_CHUNKS_POR_DOCUMENTO,
+    buscar_nodos,
+    buscar_respuesta_cacheada,
+    get_index,
+    guardar_respuesta_cacheada,
+    obtener_instantanea,
+    sintetizador_respuesta,
+)
+from .logs import logger
+from .metricas import metricas
+
+"""
+    Servicio HTTP de consultas sobre un índice compartido y ya cargado en memoria.
+    - Coalescedor: las consultas idénticas en curso comparten un solo cálculo.
+    - ServicioConsultas: búsqueda (opción 3) y respuesta (opción 2) en un pool acotado de hilos.
+    - crear_aplicacion: aplicación aiohttp con los endpoints /buscar, /responder, /salud y /metricas.
+      Los filtros se reciben como texto ("despacho=Sala Constitucional; anio=2018") o como
+      diccionario ({"despacho": "Sala Constitucional", "anio": "2018"}); se validan al leer la
+      petición y uno mal formado responde 400.
+"""
+
+# Define el número de hilos para el reranking y la generación, y cuántos cálculos pueden esperar
+TRABAJADORES = 2
+MAX_PENDIENTES = 16
+
+
+class Coalescedor:
+    def __init__(self):
+        self._en_curso = {}
+        self.compartidas = 0
+
+    # Ejecuta la corrutina de la fábrica, o espera la que ya está en curso con la misma llave
+    async def ejecutar(self, clave, fabrica):
+        tarea = self._en_curso.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(fabrica())
+            self._en_curso[clave] = tarea
+            tarea.add_done_callback(lambda _: self._en_curso.pop(clave, None))
+        else:
+            self.compartidas += 1
+            metricas.incrementar("consultas_compartidas")
+        # shield evita que un cliente que se desconecta cancele el cálculo de los demás
+        return await asyncio.shield(tarea)
+
+
+# Función para convertir los nodos recuperados en diccionarios serializables
+def nodos_a_dict(retrieved_nodes):
+    return [
+        {
+            "id": node.node.node_id,
+            "score": node.score,
+            "texto": node.node.get_content(),
+            "metadatos": node.node.metadata,
+        }
+        for node in retrieved_nodes
+    ]
+
+
+class ServicioConsultas:
+    def __init__(self, trabajadores=TRABAJADORES, max_pendientes=MAX_PENDIENTES):
+        self.index = None
+        self.instantanea = None
+        self._executor = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="servicio")
+        self._pendientes = asyncio.Semaphore(max_pendientes)
+        self._coalescedor = Coalescedor()
+
+    # Carga el índice una sola vez al iniciar el servidor (o abre la instantánea, si está habilitada)
+    async def iniciar(self):
+        self.instantanea = await self._en_pool(obtener_instantanea)
+        if self.instantanea is None:
+            self.index = await self._en_pool(get_index)
+        logger.info("Índice cargado, servicio de consultas listo")
+
+    # Indica si el servicio ya puede atender consultas
+    def listo(self):
+        return self.index is not None or self.instantanea is not None
+
+    def cerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # Ejecuta una función bloqueante en el pool acotado
+    async def _en_pool(self, funcion, *args):
+        async with self._pendientes:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, funcion, *args)
+
+    def _recuperar(self, consulta, filtros):
+        return buscar_nodos(
+            consulta,
+            self.index,
+            vector_top_k=10,
+            reranker_top_n=3,
+            with_reranker_sbert=True,
+            lexico_top_k=10,
+            filtros=filtros,
+            documentos_top_k=DOCUMENTOS_TOP_K,
+            max_por_documento=MAX_CHUNKS_POR_DOCUMENTO,
+            instantanea=self.instantanea,
+        )
+
+    def _responder(self, consulta, filtros):
+        retrieved_nodes = self._recuperar(consulta, filtros)
+        # Si una consulta similar ya se respondió con los mismos nodos, se reutiliza
+        respuesta = buscar_respuesta_cacheada(consulta, retrieved_nodes)
+        cache = respuesta is not None
+        if not cache:
+            respuesta = str(sintetizador_respuesta(consulta, retrieved_nodes))
+            guardar_respuesta_cacheada(consulta, retrieved_nodes, respuesta)
+        return {"respuesta": respuesta, "cache": cache, "nodos": nodos_a_dict(retrieved_nodes)}
+
+    # Llave de una consulta: mismo tipo, mismo texto (sin espacios extra) y mismos filtros
+    @staticmethod
+    def _clave(tipo, consulta, filtros):
+        return tipo, " ".join(consulta.split()), json.dumps(filtros or {}, sort_keys=True)
+
+    # Los spans de metricas son por hilo, así que en el event loop se mide con observar
+    async def _medir(self, nombre, funcion, *args):
+        inicio = time.perf_counter()
+        try:
+            return await self._en_pool(funcion, *args)
+        finally:
+            metricas.observar(nombre, time.perf_counter() - inicio)
+
+    async def buscar(self, consulta, filtros=None):
+        async def calcular():
+            nodos = await self._medir("servicio_buscar", self._recuperar, consulta, filtros)
+            return {"nodos": nodos_a_dict(nodos)}
+
+        return await self._coalescedor.ejecutar(self._clave("buscar", consulta, filtros), calcular)
+
+    async def responder(self, consulta, filtros=None):
+        async def calcular():
+            return await self._medir("servicio_responder", self._responder, consulta, filtros)
+
+        return await self._coalescedor.ejecutar(self._clave("responder", consulta, filtros), calcular)
+
+
+# Función para leer la consulta y los filtros del cuerpo JSON de una petición
+async def _leer_peticion(request):
+    from aiohttp import web
+
+    try:
+        cuerpo = await request.json()
+        consulta = cuerpo["consulta"].strip()
+        filtros = cuerpo.get("filtros") or {}
+        # Los filtros pueden enviarse como diccionario o con la misma sintaxis del menú; en ambos
+        # casos se validan aquí para responder 400 ante un filtro mal formado
+        if isinstance(filtros, str):
+            filtros = parsear_filtros(filtros)
+        elif isinstance(filtros, dict):
+            filtros = parsear_filtros("; ".join(f"{nombre}={valor}" for nombre, valor in filtros.items()))
+        else:
+            raise TypeError("los filtros deben ser un texto o un diccionario")
+        construir_filtro(filtros)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise web.HTTPBadRequest(
+            text=json.dumps({"error": "Petición inválida: " + str(e)}), content_type="application/json"
+        )
+    if not consulta:
+        raise web.HTTPBadRequest(
+            text=json.dumps({"error": "La consulta está vacía"}), content_type="application/json"
+        )
+    return consulta, filtros
+
+
+# Función para crear la aplicación aiohttp con el servicio de consultas
+def crear_aplicacion(trabajadores=TRABAJADORES, max_pendientes=MAX_PENDIENTES):
+    from aiohttp import web
+
+    # Los errores del cliente se detectan en _leer_peticion; los del servidor responden 500
+    async def buscar(request):
+        consulta, filtros = await _leer_peticion(request)
+        return web.json_response(await request.app["servicio"].buscar(consulta, filtros))
+
+    async def responder(request):
+        consulta, filtros = await _leer_peticion(request)
+        return web.json_response(await request.app["servicio"].responder(consulta, filtros))
+
+    async def salud(request):
+        return web.json_response({"estado": "ok", "indice": request.app["servicio"].listo()})
+
+    # El texto se construye en memoria para no bloquear el event loop con lecturas de disco
+    async def exportar_metricas(request):
+        return web.Response(text=metricas.texto_prometheus(), content_type="text/plain")
+
+    # El servicio se crea dentro del event loop del servidor
+    async def al_iniciar(app):
+        app["servicio"] = ServicioConsultas(trabajadores, max_pendientes)
+        await app["servicio"].iniciar()
+
+    async def al_cerrar(app):
+        app["servicio"].cerrar()
+
+    app = web.Application()
+    app.router.add_post("/buscar", buscar)
+    app.router.add_post("/responder", responder)
+    app.router.add_get("/salud", salud)
+    app.router.add_get("/metricas", exportar_metricas)
+    app.on_startup.append(al_iniciar)
+    app.on_cleanup.append(al_cerrar)
+    return app